@@ -0,0 +1,56 @@
+# encoding: utf8
+"""
+bench_json.py
+@author Meng.yangyang
+@description Benchmark response JSON decoding, stdlib vs installed fast codecs
+@created Sun Oct 18 2026 21:52:07 GMT+0800 (CST)
+
+python benchmarks/bench_json.py
+"""
+
+import os
+import sys
+import json
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hack12306.codec import get_codec, available_codecs
+from benchmarks.bench_left_tickets import left_ticket_row
+
+
+def left_tickets_content(rows):
+    return json.dumps({
+        'status': True,
+        'httpstatus': 200,
+        'data': {
+            'flag': '1',
+            'result': [left_ticket_row(i) for i in range(rows)],
+            'map': {'VNP': u'北京南', 'AOH': u'上海虹桥'},
+        },
+        'messages': [],
+        'validateMessages': {},
+    }, ensure_ascii=False).encode('utf8')
+
+
+def main(rows=200, repeat=500):
+    content = left_tickets_content(rows)
+    expected = json.loads(content)
+
+    funcs = [('json.loads(resp.text)', lambda: json.loads(content.decode('utf8'))),
+             ('json.loads(resp.content)', lambda: json.loads(content))]
+    for name in available_codecs():
+        funcs.append(('%s codec' % name, lambda loads=get_codec(name).loads: loads(content)))
+
+    print 'rows: %s bytes: %s repeat: %s' % (rows, len(content), repeat)
+    print 'codecs: %s' % ', '.join(available_codecs())
+    results = []
+    for name, func in funcs:
+        assert func() == expected
+        elapsed = min(timeit.repeat(func, number=repeat, repeat=3))
+        results.append(elapsed)
+        print '%-28s %8.2f us/response %6.1fx' % (name, elapsed / repeat * 1e6, results[0] / elapsed)
+
+
+if __name__ == '__main__':
+    main()
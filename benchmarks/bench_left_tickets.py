@@ -0,0 +1,90 @@
+# encoding: utf8
+"""
+bench_left_tickets.py
+@author Meng.yangyang
+@description Benchmark left tickets parsing, dict vs compact LeftTicket records
+@created Sun Oct 18 2026 11:02:15 GMT+0800 (CST)
+
+python benchmarks/bench_left_tickets.py
+"""
+
+import os
+import sys
+import gc
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hack12306 import constants
+from hack12306.query import _parse_left_tickets
+
+
+def left_ticket_row(i):
+    row = [''] * 36
+    row[0] = ('Wia8aV2XsNnWeXH9ZRGFD1cyDHy0Pf8lb8H1rIgxVRtTUkTCpvaaWv8%2BjvrM%2BT5NhyF8iFFrNqXjVl3Cc'
+              'Bv1NGXOzM0XiR1PoWYmIBg1n8B1shaLlTxQ7DcCKuyUQVfrOGqdwLuu3GXyaQRk%2BGAkBGlJ5f6Zlu0y%2F'
+              'ZtRqD%2BOkt6F0nBjGtvRN5UwHnlyJMTTOxGGxBcBPqXbKb2jzXKR8L8q4d0DENzsNYNRBcIjR4TLRYwdfnqQ')
+    row[1] = u'预订'
+    row[2] = '2400000G%03d0C' % (i % 1000)
+    row[3] = 'G%d' % i
+    row[4], row[5], row[6], row[7] = 'VNP', 'AOH', 'VNP', 'AOH'
+    row[8], row[9], row[10] = '07:00', '11:29', '04:29'
+    row[11], row[12], row[13] = 'Y', 'C6%2FZ3sPzYwWd8qVsoNN2bQ', '20190201'
+    row[23], row[24], row[26], row[28], row[29] = '', '', u'无', '', ''
+    row[30], row[31], row[32] = u'有', '%d' % (i % 20), u'无'
+    row[34], row[35] = 'O0M090', 'OM9'
+    return u'|'.join(row)
+
+
+def deep_sizeof(obj, seen=None):
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum([deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items()])
+    elif isinstance(obj, (list, tuple)):
+        size += sum([deep_sizeof(item, seen) for item in obj])
+    elif hasattr(obj, '__slots__'):
+        size += sum([deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__])
+    return size
+
+
+def main(rows=200, repeat=200):
+    resp = {
+        'status': True,
+        'data': {
+            'result': [left_ticket_row(i) for i in range(rows)],
+            'map': {'VNP': u'北京南', 'AOH': u'上海虹桥'},
+        }
+    }
+
+    def parse_dict():
+        return _parse_left_tickets(resp)
+
+    def parse_compact():
+        return _parse_left_tickets(resp, compact=True)
+
+    def parse_compact_access():
+        result = _parse_left_tickets(resp, compact=True)
+        for train in result['trains']:
+            train[constants.SEAT_TYPE_SECONDE_SEAT]
+        return result
+
+    print 'rows per response: %s, repeat: %s' % (rows, repeat)
+    for name, func in (('dict', parse_dict),
+                       ('compact', parse_compact),
+                       ('compact + seat access', parse_compact_access)):
+        gc.collect()
+        elapsed = min(timeit.repeat(func, number=repeat, repeat=3))
+        # 原始数据行由响应持有，不计入记录内存
+        seen = set([id(row) for row in resp['data']['result']])
+        size = deep_sizeof(func()['trains'], seen)
+        print '%-24s parse: %8.2f us/response  memory: %8d bytes/response' % (
+            name, elapsed / repeat * 1e6, size)
+
+
+if __name__ == '__main__':
+    main()
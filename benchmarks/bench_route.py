@@ -0,0 +1,68 @@
+# encoding: utf8
+"""
+bench_route.py
+@author Meng.yangyang
+@description Benchmark transfer route planning on a synthetic national-size timetable
+@created Sun Oct 18 2026 23:52:40 GMT+0800 (CST)
+
+python benchmarks/bench_route.py
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hack12306.route import RoutePlanner
+from hack12306.timetable import TimetableStore
+
+
+def synthetic_timetable(store, stations=600, trains=8000, stops=14, seed=12306):
+    rng = random.Random(seed)
+    names = [u'车站%d' % i for i in range(stations)]
+    for n in range(trains):
+        # 沿一条“线路”行驶，相邻车站间隔 20-60 分钟
+        start = rng.randrange(stations)
+        step = rng.choice([1, -1]) * rng.randint(1, 5)
+        minutes = rng.randrange(5 * 60, 22 * 60)
+        train_stops = []
+        for i in range(rng.randint(4, stops)):
+            arrive = None if i == 0 else '%02d:%02d' % divmod(minutes % 1440, 60)
+            minutes += 0 if i == 0 else 2
+            depart = '%02d:%02d' % divmod(minutes % 1440, 60)
+            train_stops.append({'station_no': i + 1, 'station_name': names[(start + i * step) % stations],
+                                'arrive_time': arrive or '----', 'start_time': depart})
+            minutes += rng.randint(20, 60)
+        train_stops[-1]['start_time'] = train_stops[-1]['arrive_time']
+        store.save_train({'train_no': 'X%07d' % n, 'train_code': 'G%d' % n}, train_stops)
+    return names
+
+
+def main(queries=50):
+    store = TimetableStore(':memory:')
+    names = synthetic_timetable(store)
+
+    start = time.time()
+    planner = RoutePlanner(store)
+    print 'load: %.0f ms' % ((time.time() - start) * 1000)
+
+    rng = random.Random(0)
+    pairs = [tuple(rng.sample(names, 2)) for _ in range(queries)]
+    for max_transfers in (0, 1, 2):
+        found = 0
+        start = time.time()
+        for from_station, to_station in pairs:
+            found += bool(planner.plan(from_station, to_station, max_transfers=max_transfers))
+        elapsed = (time.time() - start) / queries
+        print 'max_transfers %d: %6.1f ms/query, %d/%d with routes' % (max_transfers, elapsed * 1000, found, queries)
+
+    start = time.time()
+    for from_station, to_station in pairs:
+        store.trains_between(from_station, to_station)
+    print 'sqlite trains_between: %.2f ms/query' % ((time.time() - start) / queries * 1000)
+
+
+if __name__ == '__main__':
+    main()
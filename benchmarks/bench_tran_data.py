@@ -0,0 +1,105 @@
+# encoding: utf8
+"""
+bench_tran_data.py
+@author Meng.yangyang
+@description Benchmark pay_check_new tranData parsing, per-field regexes + deepcopy vs single scan
+@created Sun Oct 18 2026 15:20:44 GMT+0800 (CST)
+
+python benchmarks/bench_tran_data.py
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import base64
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hack12306.pay import _parse_tran_data
+from hack12306.mockserver import TRAN_DATA_XML
+
+
+def legacy_parse_tran_data(tran_data):
+    xml_data = base64.b64decode(tran_data)
+    result = {}
+    for key, pattern, flags in (
+            ('interface_version', r'<interfaceVersion>([0-9, \.]+)</interfaceVersion>', 0),
+            ('interface_name', r'<interfaceName>(.+)</interfaceName>', 0),
+            ('order_date', r'<orderDate>(.+)</orderDate>', 0),
+            ('order_timeout_date', r'<orderTimeoutDate>(.+)</orderTimeoutDate>', 0),
+            ('order_id', r'<orderId>(.+)</orderId>', 0),
+            ('amount', r'<amount>(\d+)</amount>', 0),
+            ('app_id', r'<appId>(\d+)</appId>', 0),
+            ('cur_type', r'<curType>(\d+)</curType>', 0),
+            ('mer_url', r'<merURL>(.+)</merURL>', re.DOTALL),
+            ('app_url', r'<appURL>(.+)</appURL>', re.DOTALL),
+            ('inner_url', r'<innerURL>(.+)</innerURL>', re.DOTALL),
+            ('mer_var', r'<merVAR>(.+)</merVAR>', re.DOTALL),
+            ('trans_type', r'<transType>(\d+)</transType>', 0)):
+        result[key] = re.compile(pattern, flags).search(xml_data).group(1)
+    return result
+
+
+def pay_check_new_resp():
+    tran_data = TRAN_DATA_XML % {
+        'order_date': '20190201100000',
+        'order_timeout_date': '20190201103000',
+        'order_id': 'E729662637',
+        'amount': 55300,
+    }
+    return json.loads(json.dumps({
+        'validateMessagesShowId': '_validatorMessage',
+        'status': True,
+        'httpstatus': 200,
+        'data': {
+            'flag': True,
+            'payForm': {
+                'tranData': base64.b64encode(tran_data.encode('utf8')),
+                'merSignMsg': base64.b64encode(os.urandom(256)),
+                'transType': '01',
+                'channelId': '1',
+                'appId': '0001',
+                'merCustomIp': '221.219.218.131',
+                'orderTimeoutDate': '20190201103000',
+                'paymentType': '0',
+                'bankId': '',
+                'businessType': '1',
+                'interfaceName': 'PAY_SERVLET',
+                'interfaceVersion': 'PAY_SERVLET',
+                'epayurl': 'https://epay.12306.cn/pay/payGateway',
+            },
+        },
+        'messages': [],
+        'validateMessages': {},
+    }))
+
+
+def main(repeat=5000):
+    resp = pay_check_new_resp()
+
+    def legacy():
+        data = copy.deepcopy(resp['data'])
+        data['payForm']['tranDataParsed'] = legacy_parse_tran_data(data['payForm']['tranData'])
+        return data
+
+    def single_scan():
+        data = resp['data']
+        data['payForm']['tranDataParsed'] = _parse_tran_data(data['payForm']['tranData'])
+        return data
+
+    assert legacy()['payForm']['tranDataParsed'] == single_scan()['payForm']['tranDataParsed']
+
+    print 'repeat: %s' % repeat
+    results = []
+    for name, func in (('regex per field + deepcopy', legacy), ('single scan', single_scan)):
+        elapsed = min(timeit.repeat(func, number=repeat, repeat=3))
+        results.append(elapsed)
+        print '%-28s %8.2f us/response' % (name, elapsed / repeat * 1e6)
+    print 'speedup: %.1fx' % (results[0] / results[1])
+
+
+if __name__ == '__main__':
+    main()
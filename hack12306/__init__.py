@@ -7,8 +7,13 @@ __init__.py
 @created Wed Dec 26 2018 23:28:09 GMT+0800 (CST)
 """
 
+from .base import TrainClient
 from .pay import TrainPayAPI
-from .auth import TrainAuthAPI
+from .auth import TrainAuthAPI, login_trusted
 from .order import TrainOrderAPI
 from .query import TrainInfoQueryAPI
 from .user import TrainUserAPI, TrainMemberAPI, check_login
+from .station import StationRegistry, station_registry
+from .monitor import LeftTicketMonitor
+from .order import BookingPipeline
+from .session import SessionPool
@@ -0,0 +1,404 @@
+# encoding: utf8
+"""
+aio.py
+@author Meng.yangyang
+@description Asynchronous API based on tornado coroutines
+@created Sun Oct 18 2026 10:12:37 GMT+0800 (CST)
+"""
+
+import json
+import logging
+import functools
+
+import requests
+from concurrent import futures
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.httpclient import HTTPRequest, HTTPError
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+
+from . import settings
+from . import exceptions
+from .base import TrainBaseAPI, resolve_url, _Request
+from .cache import default_cache, default_resource_cache
+from .codec import default_codec
+from .metrics import request_tracker, parse_timer
+from .ratelimit import default_rate_limiter
+from .transport import _prepare_request
+from .auth import TrainAuthAPI, login_state_cache, _trusted
+from .query import TrainInfoQueryAPI, _parse_stations, _iter_trains
+from .order import TrainOrderAPI
+from .pay import TrainPayAPI
+from .user import TrainUserAPI
+from .station import station_registry
+
+try:
+    from tornado.curl_httpclient import CurlAsyncHTTPClient as _HTTPClient
+except ImportError:
+    _HTTPClient = SimpleAsyncHTTPClient
+
+__all__ = ('AsyncTrainClient', 'AsyncTrainAuthAPI', 'AsyncTrainInfoQueryAPI', 'AsyncTrainOrderAPI',
+           'AsyncTrainPayAPI', 'AsyncTrainUserAPI', 'async_check_login',)
+
+_logger = logging.getLogger('hack12306')
+
+
+class AsyncResponse(object):
+    """
+    Tornado 响应，提供与 requests.Response 相同的常用属性
+    """
+
+    def __init__(self, response):
+        self.raw = response
+        self.request = response.request
+        self.status_code = response.code
+        self.content = response.body or ''
+        self.headers = response.headers
+        self.url = response.effective_url
+        self.history = [response.request.url] if response.effective_url != response.request.url else []
+
+    def iter_content(self, chunk_size=1):
+        # 响应已完整读取，按块返回以兼容流式解析
+        for i in xrange(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return '<Response [%s]>' % self.status_code
+
+
+class AsyncTrainClient(object):
+    """
+    12306 异步 HTTP 客户端，一个 IOLoop 内的所有请求共享并发连接。
+    安装 pycurl 时使用 CurlAsyncHTTPClient，支持 Keep-Alive 连接复用。
+    指定传输层时请求通过传输层发送，阻塞的传输层（如 HTTP2Transport）在线程池中调用。
+    """
+
+    def __init__(self, max_clients=None, base_url=None, transport=None, **defaults):
+        """
+        :param max_clients 最大并发请求数，默认为 settings.ASYNC_HTTP_MAX_CLIENTS
+        :param base_url 替换 12306 接口地址，默认为 settings.BASE_URL
+        :param transport 传输层，同 TrainClient，默认使用 tornado HTTP 客户端
+        :param defaults tornado HTTPRequest 默认参数
+        """
+        self.base_url = base_url
+        self.max_clients = max_clients or settings.ASYNC_HTTP_MAX_CLIENTS
+        self.transport = transport
+        self.defaults = defaults
+        self._http_client = None
+        self._executor = None
+
+    @property
+    def http_client(self):
+        # 在首次请求时创建，绑定当前 IOLoop
+        if self._http_client is None:
+            self._http_client = _HTTPClient(force_instance=True, max_clients=self.max_clients,
+                                            defaults=self.defaults)
+        return self._http_client
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(max_workers=self.max_clients)
+        return self._executor
+
+    @gen.coroutine
+    def request(self, method, url, params=None, data=None, json=None, headers=None, cookies=None,
+                timeout=None, allow_redirects=True, stream=False):
+        url = resolve_url(url, self.base_url)
+        if self.transport is not None:
+            request = functools.partial(self.transport.request, method, url, params=params, data=data, json=json,
+                                        headers=headers, cookies=cookies, timeout=timeout,
+                                        allow_redirects=allow_redirects, stream=stream)
+            if self.transport.blocking:
+                resp = yield IOLoop.current().run_in_executor(self.executor, request)
+            else:
+                resp = request()
+            raise gen.Return(resp)
+
+        url, headers, body = _prepare_request(method, url, params, data, json, headers, cookies)
+        request = HTTPRequest(url, method=method, headers=headers, body=body, follow_redirects=allow_redirects,
+                              connect_timeout=timeout, request_timeout=timeout)
+        response = yield self.http_client.fetch(request, raise_error=False)
+        if response.code == 599:
+            response.rethrow()
+
+        raise gen.Return(AsyncResponse(response))
+
+    def close(self):
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.transport is not None:
+            self.transport.close()
+
+
+_default_async_client = None
+
+
+def default_async_client():
+    """
+    进程内默认的 12306 异步 HTTP 客户端
+    """
+    global _default_async_client
+
+    if _default_async_client is None:
+        _default_async_client = AsyncTrainClient()
+    return _default_async_client
+
+
+def async_check_login(f):
+    """
+    异步用户登录检查装饰器
+    """
+
+    @functools.wraps(f)
+    @gen.coroutine
+    def wrapper(*args, **kwargs):
+        assert isinstance(args[0], AsyncTrainBaseAPI), 'decorated function must be AsyncTrainBaseAPI method'
+        cookies = kwargs.get('cookies', None)
+        if not cookies:
+            raise exceptions.TrainUserNotLogin()
+
+        if not getattr(_trusted, 'depth', 0) and not login_state_cache.is_login(cookies):
+            is_login = yield AsyncTrainAuthAPI(client=args[0].client).auth_check_login(**kwargs)
+            if not is_login:
+                login_state_cache.invalidate(cookies)
+                raise exceptions.TrainUserNotLogin()
+            login_state_cache.set_login(cookies)
+
+        try:
+            result = yield f(*args, **kwargs)
+        except exceptions.TrainUserNotLogin:
+            login_state_cache.invalidate(cookies)
+            raise
+
+        raise gen.Return(result)
+
+    return wrapper
+
+
+class AsyncTrainBaseAPI(TrainBaseAPI):
+    """
+    12306 Train API，异步版本。
+    与同步 API 方法相同，返回 tornado Future，例如：
+
+        trains = yield AsyncTrainInfoQueryAPI().info_query_left_tickets('2019-02-01', 'BJP', 'SHH')
+    """
+
+    def __init__(self, client=None, cache=None, rate_limiter=None, codec=None):
+        """
+        :param client AsyncTrainClient 实例，默认使用进程内共享的客户端
+        :param cache 响应缓存，同 TrainBaseAPI
+        :param rate_limiter 限流器，同 TrainBaseAPI，等待令牌时不阻塞 IOLoop
+        :param codec JSON 编解码，同 TrainBaseAPI
+        """
+        self.client = client or default_async_client()
+        self.cache = default_cache() if cache is None else (None if cache is False else cache)
+        self.rate_limiter = default_rate_limiter() if rate_limiter is None else (None if rate_limiter is False else rate_limiter)
+        self.codec = codec or default_codec()
+
+    @gen.coroutine
+    def submit(self, url, params=None, method='POST', format='form', parse_resp=True, cache=True, **kwargs):
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('train async request. url:%s method:%s params:%s' % (url, method, json.dumps(params)))
+
+        tracker = request_tracker(url, method)
+        if tracker is None:
+            result = yield self._submit(url, params, method, format, parse_resp, cache, None, **kwargs)
+        else:
+            with tracker:
+                result = yield self._submit(url, params, method, format, parse_resp, cache, tracker, **kwargs)
+        raise gen.Return(result)
+
+    @gen.coroutine
+    def _submit(self, url, params, method, format, parse_resp, cache, tracker, **kwargs):
+        cache_ttl, key, content_json = self._cache_lookup(url, params, method, parse_resp, cache, tracker)
+        if content_json is not None:
+            raise gen.Return(content_json)
+
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve(url, kwargs.get('cookies'))
+            if wait > 0:
+                yield gen.sleep(wait)
+        if tracker is not None:
+            tracker.sent()
+
+        resp = yield self.client.request(method, url, **self._request_kwargs(params, method, format, kwargs))
+        raise gen.Return(self._handle_resp(url, resp, parse_resp, tracker, cache_ttl, key, kwargs.get('stream', False)))
+
+    @gen.coroutine
+    def _perform(self, request):
+        if not isinstance(request, _Request):
+            raise gen.Return(request)
+
+        resp = yield self.submit(request.url, request.params, **request.kwargs)
+        raise gen.Return(request.handle(resp))
+
+
+def _async(method):
+    """
+    由同步 API 的接口方法生成异步方法：复用方法中的参数检查、请求参数和响应解析，只异步发送请求
+    :param method 使用 _endpoint 装饰的同步 API 方法
+    """
+    build = method.build
+
+    @functools.wraps(build)
+    @gen.coroutine
+    def wrapper(self, *args, **kwargs):
+        result = yield self._perform(build(self, *args, **kwargs))
+        raise gen.Return(result)
+
+    if getattr(method, 'login_required', False):
+        return async_check_login(wrapper)
+    return wrapper
+
+
+class AsyncTrainAuthAPI(AsyncTrainBaseAPI):
+    """
+    认证
+    """
+
+    auth_check_login = _async(TrainAuthAPI.auth_check_login)
+
+
+class AsyncTrainInfoQueryAPI(AsyncTrainBaseAPI):
+    """
+    信息查询
+    """
+
+    def __init__(self, client=None, cache=None, rate_limiter=None, codec=None, resource_cache=None):
+        """
+        :param resource_cache 静态资源缓存，同 TrainInfoQueryAPI
+        """
+        super(AsyncTrainInfoQueryAPI, self).__init__(client, cache, rate_limiter, codec)
+        self.resource_cache = default_resource_cache() if resource_cache is None else \
+            (None if resource_cache is False else resource_cache)
+
+    _left_tickets = TrainInfoQueryAPI._left_tickets.im_func
+    _resource_request = TrainInfoQueryAPI._resource_request.im_func
+    _resource_chunks = TrainInfoQueryAPI._resource_chunks.im_func
+    info_query_left_tickets_v2 = _async(TrainInfoQueryAPI.info_query_left_tickets_v2)
+    info_query_left_tickets = _async(TrainInfoQueryAPI.info_query_left_tickets)
+    info_query_station_trains = _async(TrainInfoQueryAPI.info_query_station_trains)
+    info_query_train_no = _async(TrainInfoQueryAPI.info_query_train_no)
+    info_query_ticket_price = _async(TrainInfoQueryAPI.info_query_ticket_price)
+    info_query_train_search = _async(TrainInfoQueryAPI.info_query_train_search)
+    info_query_dishonest = _async(TrainInfoQueryAPI.info_query_dishonest)
+    info_query_dishonest_getone = _async(TrainInfoQueryAPI.info_query_dishonest_getone)
+
+    @gen.coroutine
+    def info_query_station_list(self, station_version=None, **kwargs):
+        """
+        信息查询-车站列表
+        :param station_version 版本号
+        :return JSON 数组
+        """
+        url = 'https://kyfw.12306.cn/otn/resources/js/framework/station_name.js'
+        params = {
+            'station_version': station_version or '',
+        }
+        chunks = yield self._fetch_resource(url, params, **kwargs)
+        with parse_timer(url, 'GET'):
+            stations = _parse_stations(''.join(chunks))
+        raise gen.Return(stations)
+
+    @gen.coroutine
+    def info_query_trains(self, train_date=None, train_class=None, chunk_size=None, **kwargs):
+        """
+        信息查询-车次列表，与 TrainInfoQueryAPI.info_query_trains_iter 相同按块解析
+        :param train_date 日期或日期列表，默认为全部
+        :param train_class 车次类型或类型列表（如 G、D），默认为全部
+        :param chunk_size 读取响应的分块大小
+        :return JSON 数组
+        """
+        url = 'https://kyfw.12306.cn/otn/resources/js/query/train_list.js'
+        chunks = yield self._fetch_resource(url, chunk_size=chunk_size, **kwargs)
+        with parse_timer(url, 'GET'):
+            trains = list(_iter_trains(chunks, train_date=train_date, train_class=train_class,
+                                       loads=self.codec.loads))
+        raise gen.Return(trains)
+
+    @gen.coroutine
+    def _fetch_resource(self, url, params=None, chunk_size=None, cache=True, **kwargs):
+        """
+        下载静态资源，条件请求及本地副本同 TrainInfoQueryAPI._iter_resource。
+        tornado 客户端读取完整响应后返回，解析和本地副本的读写在 IOLoop 线程中进行
+        :return 分块迭代器
+        """
+        resource, key, meta = self._resource_request(url, params, cache, kwargs)
+        try:
+            resp = yield self.submit(url, params, method='GET', parse_resp=False, stream=True, **kwargs)
+        except (requests.RequestException, HTTPError, IOError) as e:
+            if not meta:
+                raise
+            _logger.warning('fetch %s error, use local copy. %s' % (url, e))
+            resp = None
+
+        raise gen.Return(self._resource_chunks(url, resp, resource, key, meta, chunk_size))
+
+    @gen.coroutine
+    def _ensure_stations(self, station_version=None, **kwargs):
+        if not station_registry.is_loaded(station_version):
+            stations = yield self.info_query_station_list(station_version, **kwargs)
+            station_registry.update(stations, station_version)
+
+    @gen.coroutine
+    def info_query_station_by_name(self, station_name, station_version=None, **kwargs):
+        """
+        信息查询-按名称查询车站，车站列表按版本号缓存
+        """
+        yield self._ensure_stations(station_version, **kwargs)
+        raise gen.Return(station_registry.get_by_name(station_name))
+
+    @gen.coroutine
+    def info_query_station_by_code(self, station_code, station_version=None, **kwargs):
+        """
+        信息查询-按电报码查询车站，车站列表按版本号缓存
+        """
+        yield self._ensure_stations(station_version, **kwargs)
+        raise gen.Return(station_registry.get_by_code(station_code))
+
+
+class AsyncTrainOrderAPI(AsyncTrainBaseAPI):
+    """
+    订单
+    """
+
+    order_submit_order = _async(TrainOrderAPI.order_submit_order)
+    order_confirm_passenger = _async(TrainOrderAPI.order_confirm_passenger)
+    order_confirm_passenger_check_order = _async(TrainOrderAPI.order_confirm_passenger_check_order)
+    order_confirm_passenger_get_queue_count = _async(TrainOrderAPI.order_confirm_passenger_get_queue_count)
+    order_confirm_passenger_confirm_single_for_queue = _async(
+        TrainOrderAPI.order_confirm_passenger_confirm_single_for_queue)
+    order_confirm_passenger_query_order = _async(TrainOrderAPI.order_confirm_passenger_query_order)
+    order_confirm_passenger_result_order = _async(TrainOrderAPI.order_confirm_passenger_result_order)
+    order_query = _async(TrainOrderAPI.order_query)
+    order_query_no_complete = _async(TrainOrderAPI.order_query_no_complete)
+
+
+class AsyncTrainPayAPI(AsyncTrainBaseAPI):
+    """
+    支付
+    """
+
+    pay_no_complete_order = _async(TrainPayAPI.pay_no_complete_order)
+    pay_init = _async(TrainPayAPI.pay_init)
+    pay_check_new = _async(TrainPayAPI.pay_check_new)
+    pay_gateway = _async(TrainPayAPI.pay_gateway)
+    pay_web_business = _async(TrainPayAPI.pay_web_business)
+
+
+class AsyncTrainUserAPI(AsyncTrainBaseAPI):
+    """
+    用户
+    """
+
+    user_info = _async(TrainUserAPI.user_info)
+    user_passengers = _async(TrainUserAPI.user_passengers)
+    user_addresses = _async(TrainUserAPI.user_addresses)
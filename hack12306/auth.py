@@ -7,12 +7,23 @@ auth.py
 """
 
 import re
-import json
+import time
+import threading
+import functools
+import contextlib
 
-from .base import TrainBaseAPI
+from .base import TrainBaseAPI, _Request, _endpoint
+from . import settings
 from . import exceptions
 
-__all__ = ('TrainAuthAPI', 'check_login',)
+__all__ = ('TrainAuthAPI', 'LoginStateCache', 'login_state_cache', 'login_trusted', 'check_login',)
+
+
+def _parse_is_login(resp):
+    if resp['data']['is_login'] == 'Y':
+        return True
+    else:
+        return False
 
 
 class TrainAuthAPI(TrainBaseAPI):
@@ -20,6 +31,7 @@ class TrainAuthAPI(TrainBaseAPI):
     认证
     """
 
+    @_endpoint
     def auth_check_login(self, cookies=None, **kwargs):
         """
         用户-检查是否登录
@@ -32,11 +44,7 @@ class TrainAuthAPI(TrainBaseAPI):
         assert isinstance(cookies, dict)
 
         url = 'https://kyfw.12306.cn/otn/login/conf'
-        resp = self.submit(url, method='POST', cookies=cookies)
-        if resp['data']['is_login'] == 'Y':
-            return True
-        else:
-            return False
+        return _Request(url, handler=_parse_is_login, method='POST', cookies=cookies)
 
     def auth_init(self, **kwargs):
         """
@@ -72,7 +80,7 @@ class TrainAuthAPI(TrainBaseAPI):
         resp = self.submit(url, params, method='POST', parse_resp=False, **kwargs)
         if resp.status_code != 200:
             raise exceptions.TrainRequestException(str(resp))
-        return json.loads(resp.content)
+        return self.codec.loads(resp.content)
 
     def auth_qr_check(self, uuid, **kwargs):
         """
@@ -91,7 +99,7 @@ class TrainAuthAPI(TrainBaseAPI):
         if resp.status_code != 200:
             raise exceptions.TrainRequestException()
 
-        return json.loads(resp.content)
+        return self.codec.loads(resp.content)
 
     def auth_uamtk(self, uamtk, **kwargs):
         """
@@ -108,7 +116,7 @@ class TrainAuthAPI(TrainBaseAPI):
         if resp.status_code != 200:
             raise exceptions.TrainRequestException()
 
-        return json.loads(resp.content)
+        return self.codec.loads(resp.content)
 
     def auth_uamauth(self, apptk, **kwargs):
         """
@@ -123,7 +131,83 @@ class TrainAuthAPI(TrainBaseAPI):
         resp = self.submit(url, params, method='POST', parse_resp=False, **kwargs)
         if resp.status_code != 200:
             raise exceptions.TrainRequestException()
-        return json.loads(resp.content)
+        return self.codec.loads(resp.content)
+
+
+class LoginStateCache(object):
+    """
+    登录状态缓存，按用户 Session Cookies 缓存登录检查结果
+    """
+
+    def __init__(self, ttl=None, max_size=4096):
+        """
+        :param ttl 缓存时间（秒），默认为 settings.LOGIN_CHECK_CACHE_TTL
+        :param max_size 最多缓存的 Session 数量
+        """
+        self._ttl = ttl
+        self.max_size = max_size
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return settings.LOGIN_CHECK_CACHE_TTL if self._ttl is None else self._ttl
+
+    @staticmethod
+    def _key(cookies):
+        return tuple(sorted(cookies.items()))
+
+    def is_login(self, cookies):
+        """
+        缓存中 Session 是否为已登录状态
+        """
+        expire = self._expires.get(self._key(cookies))
+        return expire is not None and expire > time.time()
+
+    def set_login(self, cookies):
+        if self.ttl <= 0:
+            return
+
+        now = time.time()
+        with self._lock:
+            if len(self._expires) >= self.max_size:
+                for key, expire in self._expires.items():
+                    if expire <= now:
+                        del self._expires[key]
+                if len(self._expires) >= self.max_size:
+                    self._expires.clear()
+            self._expires[self._key(cookies)] = now + self.ttl
+
+    def invalidate(self, cookies):
+        with self._lock:
+            self._expires.pop(self._key(cookies), None)
+
+    def clear(self):
+        with self._lock:
+            self._expires.clear()
+
+
+login_state_cache = LoginStateCache()
+
+_trusted = threading.local()
+
+
+@contextlib.contextmanager
+def login_trusted():
+    """
+    受信任的订票流程内跳过登录检查请求，例如：
+
+        with login_trusted():
+            train_order_api.order_confirm_passenger(cookies=cookies)
+            train_order_api.order_confirm_passenger_check_order(token, ..., cookies=cookies)
+
+    接口返回未登录时仍会抛出 TrainUserNotLogin 异常
+    """
+    _trusted.depth = getattr(_trusted, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _trusted.depth -= 1
 
 
 def check_login(f):
@@ -131,15 +215,25 @@ def check_login(f):
     用户登录检查装饰器
     """
 
+    @functools.wraps(f)
     def wrapper(*args, **kwargs):
         assert isinstance(args[0], TrainBaseAPI), 'decorated function must be TrainBaseAPI method'
         cookies = kwargs.get('cookies', None)
         if not cookies:
             raise exceptions.TrainUserNotLogin()
 
-        if not TrainAuthAPI().auth_check_login(**kwargs):
-            raise exceptions.TrainUserNotLogin()
+        if not getattr(_trusted, 'depth', 0) and not login_state_cache.is_login(cookies):
+            if not TrainAuthAPI(client=args[0].client).auth_check_login(**kwargs):
+                login_state_cache.invalidate(cookies)
+                raise exceptions.TrainUserNotLogin()
+            login_state_cache.set_login(cookies)
 
-        return f(*args, **kwargs)
+        try:
+            return f(*args, **kwargs)
+        except exceptions.TrainUserNotLogin:
+            login_state_cache.invalidate(cookies)
+            raise
 
+    # 异步 API 复用接口方法时按此使用 async_check_login
+    wrapper.login_required = True
     return wrapper
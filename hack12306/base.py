@@ -13,31 +13,206 @@ import json
 import urllib
 import logging
 import datetime
-import requests
+import functools
+import threading
 import collections
+import urlparse
+
+from requests.adapters import HTTPAdapter
 
 from . import settings
 from . import constants
 from . import exceptions
+from .cache import default_cache, cache_key
+from .codec import default_codec
+from .capture import default_capture
+from .metrics import request_tracker
+from .ratelimit import default_rate_limiter
+from .transport import RequestsTransport, HTTP2Transport, TRANSPORT_HTTP2
 from .utils import urlencode, tomorrow, time_cst_format
 
 _logger = logging.getLogger('hack12306')
 
-__all__ = ('TrainBaseAPI',)
+__all__ = ('TrainBaseAPI', 'TrainClient', 'default_client', 'resolve_url',)
+
+
+_LOGIN_REDIRECT_PATTERN = re.compile(r'/otn/(passport|login/userLogin)')
+_12306_URL_PATTERN = re.compile(r'^https?://[a-z]+\.12306\.cn')
+
+
+def resolve_url(url, base_url=None):
+    """
+    将 12306 接口地址（kyfw/search/cx/epay.12306.cn）替换为 base_url，用于连接本地模拟服务
+    :param base_url 默认为 settings.BASE_URL
+    """
+    base_url = base_url or settings.BASE_URL
+    if not base_url:
+        return url
+    return _12306_URL_PATTERN.sub(lambda m: base_url.rstrip('/'), url, count=1)
+
+
+def _is_not_login(resp, content_json=None):
+    """
+    响应是否为用户未登录
+    """
+    if resp.history and _LOGIN_REDIRECT_PATTERN.search(resp.url):
+        return True
+
+    if content_json is not None and content_json.get('status') is not True:
+        return u'用户未登录' in (content_json.get('messages') or [])
+
+    return False
 
 
 def _debug_resp(url, resp):
-    import os
-    import uuid
-    import datetime
+    """
+    采集失败响应，由后台线程写入 settings.DEBUG_CAPTURE_DIR
+    """
+    default_capture().capture(url, resp)
+
+
+def _params_str(params):
+    if not params:
+        return ''
+    if isinstance(params, dict):
+        params = sorted(params.items())
+    if isinstance(params, list):
+        return urlencode(params)
+    return params
+
+
+class _Request(object):
+    """
+    接口方法生成的请求：请求参数及响应处理函数。同步 API 发送后直接处理响应，
+    异步 API 发送后在回调中处理，两者共用接口方法中的参数检查、请求参数和响应解析
+    """
+
+    __slots__ = ('url', 'params', 'handler', 'kwargs')
+
+    def __init__(self, url, params=None, handler=None, **kwargs):
+        """
+        :param url 接口地址
+        :param params 请求参数
+        :param handler 处理 submit 返回值的函数，None 表示直接返回
+        :param kwargs 透传给 submit 的参数，如 method、parse_resp、cookies
+        """
+        self.url = url
+        self.params = params
+        self.handler = handler
+        self.kwargs = kwargs
+
+    def handle(self, resp):
+        return resp if self.handler is None else self.handler(resp)
+
+
+def _endpoint(f):
+    """
+    接口方法装饰器。被装饰的方法返回 _Request，由 self._perform 发送并处理响应；
+    原方法保存在 build 属性中，异步 API 复用同一方法生成请求
+    """
+
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        return self._perform(f(self, *args, **kwargs))
+
+    wrapper.build = f
+    return wrapper
+
+
+def _data(resp):
+    """
+    响应处理：返回 data 字段
+    """
+    return resp['data']
+
+
+def _data_item(key, default=None):
+    """
+    响应处理：返回 data 字段中的 key
+    :param default 不存在时返回 default()，如 list、dict，None 表示返回 None
+    """
+
+    def handler(resp):
+        if 'data' in resp and key in resp['data']:
+            return resp['data'][key]
+        return default() if default is not None else None
+
+    return handler
+
+
+class TrainClient(object):
+    """
+    12306 HTTP 客户端，请求通过传输层发送，默认传输层按主机维护 Keep-Alive 连接池。
+    使用同一个客户端的 Train*API 实例共享连接池。
+    """
 
-    today_str = datetime.date.today().strftime('%Y-%m-%d')
-    filepath = '/tmp/hack12306/%s/%s-%s' % (today_str, url, uuid.uuid1().hex)
-    if not os.path.exists(os.path.dirname(filepath)):
-        os.makedirs(os.path.dirname(filepath))
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None, persist_cookies=False,
+                 base_url=None, transport=None):
+        """
+        :param pool_connections 缓存的主机连接池数量
+        :param pool_maxsize 每个主机保持的最大连接数
+        :param pool_block 连接数达到上限时是否阻塞等待
+        :param persist_cookies 是否保存响应中的 Cookie
+        :param base_url 替换 12306 接口地址，默认为 settings.BASE_URL
+        :param transport 传输层 RequestsTransport/HTTP2Transport/FakeTransport 实例，默认由 settings.HTTP_TRANSPORT 决定
+        """
+        self.base_url = base_url
+        self.pool_connections = pool_connections or settings.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or settings.HTTP_POOL_MAXSIZE
+        self.pool_block = settings.HTTP_POOL_BLOCK if pool_block is None else pool_block
+        self.transport = transport or self._new_transport(persist_cookies)
 
-    with open(filepath, 'w') as f:
-        f.write(resp.content)
+    def _new_transport(self, persist_cookies):
+        # 保存 Cookie 的客户端（如 SessionPool）使用 requests 的 Cookie 容器
+        if settings.HTTP_TRANSPORT == TRANSPORT_HTTP2 and not persist_cookies:
+            return HTTP2Transport()
+        return RequestsTransport(persist_cookies=persist_cookies, adapter=self._new_adapter())
+
+    def _new_adapter(self):
+        return HTTPAdapter(pool_connections=self.pool_connections,
+                           pool_maxsize=self.pool_maxsize,
+                           pool_block=self.pool_block)
+
+    @property
+    def session(self):
+        """
+        requests 传输层的 Session
+        """
+        return self.transport.session
+
+    @property
+    def adapter(self):
+        return self.transport.adapter
+
+    def request(self, method, url, **kwargs):
+        return self.transport.request(method, resolve_url(url, self.base_url), **kwargs)
+
+    def pool_stats(self):
+        """
+        连接池统计
+        :return JSON DICT，按主机统计请求数、新建连接数、连接复用率及打开的连接数
+        """
+        return self.transport.pool_stats()
+
+    def close(self):
+        self.transport.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client():
+    """
+    进程内默认的 12306 HTTP 客户端
+    """
+    global _default_client
+
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = TrainClient()
+    return _default_client
 
 
 class TrainBaseAPI(object):
@@ -45,9 +220,77 @@ class TrainBaseAPI(object):
     12306 Train API.
     """
 
-    def submit(self, url, params=None, method='POST', format='form', parse_resp=True, **kwargs):
-        _logger.debug('train request. url:%s method:%s params:%s' % (url, method, json.dumps(params)))
+    def __init__(self, client=None, cache=None, rate_limiter=None, codec=None):
+        """
+        :param client TrainClient 实例，默认使用进程内共享的客户端
+        :param cache 响应缓存 MemoryCache/DiskCache 实例，默认使用进程内共享的缓存，False 表示不缓存
+        :param rate_limiter RateLimiter 实例，默认使用进程内共享的限流器，False 表示不限流
+        :param codec 解析响应的 JSONCodec 实例，默认由 settings.JSON_CODEC 决定
+        """
+        self.client = client or default_client()
+        self.cache = default_cache() if cache is None else (None if cache is False else cache)
+        self.rate_limiter = default_rate_limiter() if rate_limiter is None else (None if rate_limiter is False else rate_limiter)
+        self.codec = codec or default_codec()
+
+    def _cache_ttl(self, url, method, parse_resp):
+        """
+        接口响应缓存时间，settings.RESPONSE_CACHE_TTLS 按接口路径配置，只缓存 GET 请求
+        """
+        if self.cache is None or method != 'GET' or not parse_resp:
+            return 0
+        return settings.RESPONSE_CACHE_TTLS.get(urlparse.urlparse(url).path, 0)
+
+    def _cache_get(self, key):
+        content = self.cache.get(key)
+        if content is None:
+            return None
+        return self.codec.loads(content)
+
+    def submit(self, url, params=None, method='POST', format='form', parse_resp=True, cache=True, **kwargs):
+        """
+        :param cache 是否读取响应缓存，False 时跳过缓存直接请求并刷新缓存
+        """
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('train request. url:%s method:%s params:%s' % (url, method, json.dumps(params)))
+
+        tracker = request_tracker(url, method)
+        if tracker is None:
+            return self._submit(url, params, method, format, parse_resp, cache, None, **kwargs)
+        with tracker:
+            return self._submit(url, params, method, format, parse_resp, cache, tracker, **kwargs)
+
+    def _submit(self, url, params, method, format, parse_resp, cache, tracker, **kwargs):
+        cache_ttl, key, content_json = self._cache_lookup(url, params, method, parse_resp, cache, tracker)
+        if content_json is not None:
+            return content_json
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url, kwargs.get('cookies'))
+        if tracker is not None:
+            tracker.sent()
 
+        resp = self.client.request(method, url, **self._request_kwargs(params, method, format, kwargs))
+        return self._handle_resp(url, resp, parse_resp, tracker, cache_ttl, key, kwargs.get('stream', False))
+
+    def _cache_lookup(self, url, params, method, parse_resp, cache, tracker):
+        """
+        查询响应缓存
+        :return (缓存时间, 缓存键, 缓存的响应)，不缓存时缓存时间为 0，未命中时缓存的响应为 None
+        """
+        cache_ttl = self._cache_ttl(url, method, parse_resp)
+        if not cache_ttl:
+            return 0, None, None
+
+        key = cache_key(method, resolve_url(url, getattr(self.client, 'base_url', None)), _params_str(params))
+        content_json = self._cache_get(key) if cache else None
+        if content_json is not None and tracker is not None:
+            tracker.cache_hit()
+        return cache_ttl, key, content_json
+
+    def _request_kwargs(self, params, method, format, kwargs):
+        """
+        生成 client.request 的参数
+        """
         headers = kwargs.get('headers', {})
         headers.update(**self.headers)
         kwargs['headers'] = headers
@@ -55,25 +298,57 @@ class TrainBaseAPI(object):
         if method == 'GET':
             if isinstance(params, list):
                 params = urlencode(params)
-            resp = requests.get(url, params, **kwargs)
+            kwargs['params'] = params
         elif method == 'POST':
             if format == 'json':
-                resp = requests.post(url, json=params, **kwargs)
+                kwargs['json'] = params
             else:
-                resp = requests.post(url, data=params, **kwargs)
+                kwargs['data'] = params
         else:
             assert False, 'Unknown http method'
+        return kwargs
+
+    def _handle_resp(self, url, resp, parse_resp, tracker, cache_ttl, key, stream=False):
+        """
+        检查登录状态、解析并缓存响应
+        """
+        if tracker is not None:
+            tracker.received(resp, stream)
+
+        if _is_not_login(resp):
+            raise exceptions.TrainUserNotLogin()
 
         if not parse_resp:
             return resp
 
+        content_json = self._parse_resp(url, resp)
+        if tracker is not None:
+            tracker.parsed()
+        if cache_ttl:
+            self.cache.set(key, resp.content, cache_ttl)
+        return content_json
+
+    def _perform(self, request):
+        """
+        发送接口方法生成的请求并处理响应
+        :param request _Request 实例，其他值直接返回
+        """
+        if not isinstance(request, _Request):
+            return request
+        return request.handle(self.submit(request.url, request.params, **request.kwargs))
+
+    def _parse_resp(self, url, resp, codec=None):
+        """
+        解析 12306 JSON 响应
+        :param codec JSON 编解码，默认 self.codec
+        """
         if resp.status_code != 200:
             if settings.DEBUG:
                 _debug_resp(url, resp)
             raise exceptions.TrainRequestException(str(resp))
 
         try:
-            content_json = json.loads(resp.content)
+            content_json = (codec or self.codec).loads(resp.content)
         except ValueError as e:
             if settings.DEBUG:
                 _debug_resp(url, resp)
@@ -81,6 +356,9 @@ class TrainBaseAPI(object):
             _logger.warning(e)
             raise exceptions.TrainRequestException('response is not valid json type')
 
+        if _is_not_login(resp, content_json):
+            raise exceptions.TrainUserNotLogin()
+
         if content_json['status'] is not True:
             _logger.warning('%s resp. %s' % (url, resp.content))
             raise exceptions.TrainAPIException(resp.content)
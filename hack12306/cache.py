@@ -0,0 +1,371 @@
+# encoding: utf8
+"""
+cache.py
+@author Meng.yangyang
+@description TTL/LRU response cache, memory and disk backends
+@created Sun Oct 18 2026 16:02:51 GMT+0800 (CST)
+"""
+
+import os
+import time
+import json
+import errno
+import hashlib
+import logging
+import tempfile
+import threading
+import collections
+
+from . import settings
+
+__all__ = ('MemoryCache', 'DiskCache', 'ResourceCache', 'default_cache', 'default_resource_cache', 'cache_key',)
+
+_logger = logging.getLogger('hack12306')
+
+
+def _makedirs(directory):
+    if not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+
+def cache_key(*parts):
+    """
+    生成缓存键
+    """
+    h = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, unicode):
+            part = part.encode('utf8')
+        h.update(str(part))
+        h.update('\0')
+    return h.hexdigest()
+
+
+class _BaseCache(object):
+    """
+    按字节数限制容量的 TTL/LRU 缓存，值为字节串
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or settings.RESPONSE_CACHE_MAX_BYTES
+        self.bytes = 0
+        self._index = collections.OrderedDict()     # key -> (expire, size)，按最近使用排序
+        self._lock = threading.RLock()
+        self._stats = collections.Counter()
+
+    def _read(self, key):
+        raise NotImplementedError
+
+    def _write(self, key, value, expire):
+        raise NotImplementedError
+
+    def _remove(self, key):
+        raise NotImplementedError
+
+    def _drop(self, key):
+        expire, size = self._index.pop(key)
+        self.bytes -= size
+        self._remove(key)
+
+    def get(self, key):
+        """
+        :return 缓存值，不存在或过期返回 None
+        """
+        with self._lock:
+            entry = self._index.pop(key, None)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._index[key] = entry
+            if entry[0] < time.time():
+                self._drop(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            value = self._read(key)
+            if value is None:
+                self._index.pop(key)
+                self.bytes -= entry[1]
+                self._stats['misses'] += 1
+                return None
+
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl):
+        """
+        :param key 缓存键
+        :param value 字节串
+        :param ttl 过期时间（秒）
+        """
+        size = len(value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._index:
+                self._drop(key)
+
+            while self._index and self.bytes + size > self.max_bytes:
+                self._drop(next(iter(self._index)))
+                self._stats['evictions'] += 1
+
+            expire = time.time() + ttl
+            self._write(key, value, expire)
+            self._index[key] = (expire, size)
+            self.bytes += size
+            self._stats['sets'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._index:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                self._drop(key)
+            self._stats.clear()
+
+    def __len__(self):
+        return len(self._index)
+
+    def stats(self):
+        """
+        命中统计
+        """
+        with self._lock:
+            hits, misses = self._stats['hits'], self._stats['misses']
+            return {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': hits / float(hits + misses) if hits + misses else 0.0,
+                'sets': self._stats['sets'],
+                'evictions': self._stats['evictions'],
+                'expired': self._stats['expired'],
+                'entries': len(self._index),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+class MemoryCache(_BaseCache):
+    """
+    进程内缓存
+    """
+
+    def __init__(self, max_bytes=None):
+        super(MemoryCache, self).__init__(max_bytes)
+        self._values = {}
+
+    def _read(self, key):
+        return self._values.get(key)
+
+    def _write(self, key, value, expire):
+        self._values[key] = value
+
+    def _remove(self, key):
+        self._values.pop(key, None)
+
+
+class DiskCache(_BaseCache):
+    """
+    磁盘缓存，进程重启后仍然有效。每个缓存项一个文件，首行为过期时间戳
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        super(DiskCache, self).__init__(max_bytes)
+        self.directory = directory or settings.RESPONSE_CACHE_DIR
+        _makedirs(self.directory)
+        self._load()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _load(self):
+        """
+        按文件修改时间恢复 LRU 顺序
+        """
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    line = f.readline()
+                expire = float(line)
+                stat = os.stat(path)
+            except (IOError, OSError, ValueError):
+                continue
+
+            if expire < now:
+                self._unlink(path)
+                continue
+            entries.append((stat.st_mtime, name, expire, stat.st_size - len(line)))
+
+        for _, name, expire, size in sorted(entries):
+            self._index[name] = (expire, size)
+            self.bytes += size
+
+        while self._index and self.bytes > self.max_bytes:
+            self._drop(next(iter(self._index)))
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                f.readline()
+                return f.read()
+        except IOError:
+            return None
+
+    def _write(self, key, value, expire):
+        fd, tmp = tempfile.mkstemp(prefix='.', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write('%.3f\n' % expire)
+            f.write(value)
+        os.rename(tmp, self._path(key))
+
+    def _remove(self, key):
+        self._unlink(self._path(key))
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ResourceCache(object):
+    """
+    静态资源（station_name.js、train_list.js）本地缓存，保存响应内容和 ETag/Last-Modified，
+    用于条件请求（If-None-Match/If-Modified-Since）以及网络失败时使用本地副本
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or settings.RESOURCE_CACHE_DIR
+        _makedirs(self.directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def meta(self, key):
+        """
+        :return 缓存元数据 {'etag', 'last_modified', 'size', 'updated'}，不存在返回 None
+        """
+        try:
+            with open(self._path(key) + '.meta', 'rb') as f:
+                meta = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if not os.path.exists(self._path(key)):
+            return None
+        return meta
+
+    def validators(self, key):
+        """
+        条件请求头
+        """
+        meta = self.meta(key)
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def iter_content(self, key, chunk_size):
+        """
+        分块读取本地副本
+        """
+        with open(self._path(key), 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def store(self, key, chunks, etag=None, last_modified=None, resource=None):
+        """
+        边写入本地副本边返回分块，全部读取完成后替换旧副本，中途停止读取时丢弃
+        :param resource 资源地址（不含参数），保存完成后删除同一资源其他版本（如旧 station_version）的副本
+        """
+        fd, tmp = tempfile.mkstemp(prefix='.', dir=self.directory)
+        size = 0
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed:
+                os.rename(tmp, self._path(key))
+                with open(self._path(key) + '.meta', 'wb') as f:
+                    json.dump({'etag': etag, 'last_modified': last_modified, 'size': size,
+                               'updated': time.time(), 'resource': resource}, f)
+                if resource:
+                    self._remove_versions(resource, key)
+            else:
+                DiskCache._unlink(tmp)
+
+    def _remove_versions(self, resource, key):
+        for name in os.listdir(self.directory):
+            if not name.endswith('.meta') or name == key + '.meta':
+                continue
+            try:
+                with open(self._path(name), 'rb') as f:
+                    if json.load(f).get('resource') != resource:
+                        continue
+            except (IOError, ValueError, AttributeError):
+                continue
+            DiskCache._unlink(self._path(name[:-len('.meta')]))
+            DiskCache._unlink(self._path(name))
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+_default_resource_cache = None
+
+
+def default_cache():
+    """
+    进程内默认的响应缓存，由 settings.RESPONSE_CACHE_BACKEND 决定，None 表示不缓存
+    """
+    global _default_cache
+
+    if _default_cache is None and settings.RESPONSE_CACHE_BACKEND:
+        with _default_cache_lock:
+            if _default_cache is None:
+                if settings.RESPONSE_CACHE_BACKEND == 'disk':
+                    _default_cache = DiskCache()
+                elif settings.RESPONSE_CACHE_BACKEND == 'memory':
+                    _default_cache = MemoryCache()
+                else:
+                    assert False, 'Unknown cache backend %s' % settings.RESPONSE_CACHE_BACKEND
+    return _default_cache
+
+
+def default_resource_cache():
+    """
+    进程内默认的静态资源缓存，settings.RESOURCE_CACHE_DIR 为 None 表示不缓存
+    """
+    global _default_resource_cache
+
+    if _default_resource_cache is None and settings.RESOURCE_CACHE_DIR:
+        with _default_cache_lock:
+            if _default_resource_cache is None:
+                _default_resource_cache = ResourceCache()
+    return _default_resource_cache
@@ -0,0 +1,217 @@
+# encoding: utf8
+"""
+capture.py
+@author Meng.yangyang
+@description Bounded asynchronous capture of failing responses for debugging
+@created Sun Oct 18 2026 20:58:19 GMT+0800 (CST)
+"""
+
+import os
+import time
+import gzip
+import json
+import atexit
+import random
+import logging
+import datetime
+import threading
+import collections
+
+from . import settings
+from .cache import _makedirs
+
+__all__ = ('ResponseCapture', 'default_capture',)
+
+_logger = logging.getLogger('hack12306')
+
+
+class ResponseCapture(object):
+    """
+    失败响应采集。请求线程只把响应放入内存环形缓冲区，后台线程定期批量压缩写入磁盘。
+
+    1. 缓冲区满时覆盖最旧的记录；
+    2. 每秒采集超过 burst 条后按 sample_rate 抽样；
+    3. 磁盘占用超过 max_bytes 时删除最旧的文件。
+    """
+
+    def __init__(self, directory=None, capacity=None, max_body=None, max_bytes=None, flush_interval=None,
+                 burst=None, sample_rate=None):
+        """
+        :param directory 保存目录，默认 settings.DEBUG_CAPTURE_DIR，False 表示只保存在内存中
+        :param capacity 内存中保存的记录数，默认 settings.DEBUG_CAPTURE_BUFFER
+        :param max_body 每条记录保存的最大响应字节数，默认 settings.DEBUG_CAPTURE_MAX_BODY
+        :param max_bytes 磁盘占用上限（字节），默认 settings.DEBUG_CAPTURE_MAX_BYTES
+        :param flush_interval 写入磁盘的间隔（秒），默认 settings.DEBUG_CAPTURE_FLUSH_INTERVAL
+        :param burst 每秒完整采集的记录数，默认 settings.DEBUG_CAPTURE_BURST
+        :param sample_rate 超过 burst 后的抽样率，默认 settings.DEBUG_CAPTURE_SAMPLE_RATE
+        """
+        self.directory = settings.DEBUG_CAPTURE_DIR if directory is None else directory
+        self.capacity = capacity or settings.DEBUG_CAPTURE_BUFFER
+        self.max_body = max_body or settings.DEBUG_CAPTURE_MAX_BODY
+        self.max_bytes = max_bytes or settings.DEBUG_CAPTURE_MAX_BYTES
+        self.flush_interval = flush_interval or settings.DEBUG_CAPTURE_FLUSH_INTERVAL
+        self.burst = settings.DEBUG_CAPTURE_BURST if burst is None else burst
+        self.sample_rate = settings.DEBUG_CAPTURE_SAMPLE_RATE if sample_rate is None else sample_rate
+
+        self._records = collections.deque(maxlen=self.capacity)
+        self._seq = 0
+        self._flushed_seq = 0
+        self._window = (0, 0)       # (秒, 该秒内的采集数)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._stats = collections.Counter()
+
+    def capture(self, url, resp):
+        """
+        采集失败响应，不阻塞请求线程
+        """
+        now = time.time()
+        with self._cond:
+            second, count = self._window
+            if int(now) != second:
+                second, count = int(now), 0
+            self._window = (second, count + 1)
+            if count >= self.burst and random.random() >= self.sample_rate:
+                self._stats['sampled_out'] += 1
+                return False
+
+            if len(self._records) == self.capacity and self._records[0][0] > self._flushed_seq:
+                self._stats['overwritten'] += 1
+            self._seq += 1
+            self._records.append((self._seq, now, url, resp.status_code, resp.content[:self.max_body],
+                                  len(resp.content or '')))
+            self._stats['captured'] += 1
+
+            if self.directory and self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='hack12306-capture')
+                self._thread.daemon = True
+                self._thread.start()
+            if self._seq - self._flushed_seq >= self.capacity / 2:
+                self._cond.notify()
+        return True
+
+    def recent(self, n=None):
+        """
+        内存中最近的记录
+        :return JSON 数组
+        """
+        with self._cond:
+            records = list(self._records)
+        return [self._to_dict(record) for record in records[-n if n else 0:]]
+
+    @staticmethod
+    def _to_dict(record):
+        seq, timestamp, url, status_code, body, size = record
+        return {
+            'seq': seq,
+            'time': timestamp,
+            'url': url,
+            'status_code': status_code,
+            'size': size,
+            'body': body.decode('utf8', 'replace') if isinstance(body, str) else body,
+        }
+
+    def _pending(self):
+        with self._cond:
+            records = [record for record in self._records if record[0] > self._flushed_seq]
+            if records:
+                self._flushed_seq = records[-1][0]
+        return records
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                _logger.warning('flush captured responses error. %s' % e)
+
+    def flush(self):
+        """
+        把未写入的记录写入一个 gzip 压缩的 JSON Lines 文件
+        :return 写入的记录数
+        """
+        records = self._pending()
+        if not records or not self.directory:
+            return 0
+
+        now = datetime.datetime.now()
+        directory = os.path.join(self.directory, now.strftime('%Y-%m-%d'))
+        _makedirs(directory)
+        path = os.path.join(directory, '%s-%d.jsonl.gz' % (now.strftime('%H%M%S'), records[0][0]))
+        with gzip.open(path, 'wb') as f:
+            for record in records:
+                f.write(json.dumps(self._to_dict(record)) + '\n')
+
+        with self._cond:
+            self._stats['flushed'] += len(records)
+            self._stats['files'] += 1
+        self._trim()
+        return len(records)
+
+    def _trim(self):
+        """
+        磁盘占用超过上限时删除最旧的文件
+        """
+        files = []
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+
+        total = sum([size for _, _, size in files])
+        for _, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._cond:
+                self._stats['removed_files'] += 1
+
+    def close(self):
+        """
+        停止后台线程并写入剩余记录
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['buffered'] = len(self._records)
+            stats['pending'] = len([record for record in self._records if record[0] > self._flushed_seq])
+        return stats
+
+
+_default_capture = None
+_default_capture_lock = threading.Lock()
+
+
+def default_capture():
+    """
+    进程内默认的失败响应采集，进程退出时写入剩余记录
+    """
+    global _default_capture
+
+    if _default_capture is None:
+        with _default_capture_lock:
+            if _default_capture is None:
+                _default_capture = ResponseCapture()
+                atexit.register(_default_capture.close)
+    return _default_capture
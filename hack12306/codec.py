@@ -0,0 +1,107 @@
+# encoding: utf8
+"""
+codec.py
+@author Meng.yangyang
+@description Pluggable JSON codec, prefers a fast decoder when installed
+@created Sun Oct 18 2026 21:34:50 GMT+0800 (CST)
+"""
+
+import importlib
+import threading
+
+from . import settings
+
+__all__ = ('JSONCodec', 'get_codec', 'available_codecs', 'default_codec',)
+
+
+class JSONCodec(object):
+    """
+    JSON 编解码。loads 直接解析响应的字节串，不先转换为 unicode。
+    """
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return '<JSONCodec %s>' % self.name
+
+
+def _ujson(module):
+    return JSONCodec('ujson', module.loads, module.dumps)
+
+
+def _rapidjson(module):
+    return JSONCodec('rapidjson', module.loads, module.dumps)
+
+
+def _simplejson(module):
+    decoder = module.JSONDecoder()
+    return JSONCodec('simplejson', decoder.decode, module.dumps)
+
+
+def _json(module):
+    decoder = module.JSONDecoder()
+    return JSONCodec('json', decoder.decode, module.dumps)
+
+
+# 按速度排序，auto 使用第一个已安装的
+_CODECS = (
+    ('ujson', _ujson),
+    ('rapidjson', _rapidjson),
+    ('simplejson', _simplejson),
+    ('json', _json),
+)
+
+_codecs = {}                    # 名称 -> JSONCodec，未安装时为导入失败的 ImportError，auto 为选中的编解码
+_codecs_lock = threading.RLock()
+
+
+def get_codec(name='auto'):
+    """
+    :param name 'auto'、'ujson'、'rapidjson'、'simplejson' 或 'json'
+    :return JSONCodec，未安装时抛出 ImportError
+    """
+    codec = _codecs.get(name)
+    if codec is None:
+        with _codecs_lock:
+            codec = _codecs.get(name)
+            if codec is None:
+                codec = _codecs[name] = _load_codec(name)
+    if isinstance(codec, ImportError):
+        raise codec
+    return codec
+
+
+def _load_codec(name):
+    if name == 'auto':
+        return get_codec(available_codecs()[0])
+
+    factories = dict(_CODECS)
+    assert name in factories, 'Unknown json codec %s' % name
+    try:
+        return factories[name](importlib.import_module(name))
+    except ImportError as e:
+        return e
+
+
+def available_codecs():
+    """
+    :return 已安装的 JSON 库名称，按速度排序
+    """
+    names = []
+    for name, _ in _CODECS:
+        try:
+            get_codec(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def default_codec():
+    """
+    进程内默认的 JSON 编解码，由 settings.JSON_CODEC 决定
+    """
+    return get_codec(settings.JSON_CODEC)
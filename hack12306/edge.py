@@ -0,0 +1,285 @@
+# encoding: utf8
+"""
+edge.py
+@author Meng.yangyang
+@description Query 12306 CDN edges pinned by IP, scored by latency and freshness
+@created Sun Oct 18 2026 20:12:44 GMT+0800 (CST)
+"""
+
+import time
+import random
+import socket
+import logging
+import threading
+
+import requests
+from concurrent import futures
+
+from . import settings
+from . import exceptions
+from .base import TrainClient, TrainBaseAPI
+from .transport import RequestsTransport
+
+__all__ = ('Edge', 'EdgePool', 'EdgeClient', 'resolve_edges', 'default_edge_pool',)
+
+_logger = logging.getLogger('hack12306')
+
+MODE_SPREAD = 'spread'
+MODE_RACE = 'race'
+
+
+def resolve_edges(host=None, port=443):
+    """
+    解析 12306 域名的全部 IP
+    :param host 域名，默认 settings.EDGE_HOST
+    :return IP 列表
+    """
+    infos = socket.getaddrinfo(host or settings.EDGE_HOST, port, socket.AF_INET, socket.SOCK_STREAM)
+    return sorted(set([info[4][0] for info in infos]))
+
+
+def _parse_address(address):
+    if isinstance(address, tuple):
+        return address
+    if ':' in address:
+        ip, port = address.rsplit(':', 1)
+        return ip, int(port)
+    return address, None
+
+
+class EdgeClient(TrainClient):
+    """
+    固定连接到一个 CDN 节点的 HTTP 客户端
+    """
+
+    def __init__(self, address, **kwargs):
+        """
+        :param address 节点地址 'ip' 或 'ip:port'
+        """
+        self.edge_address = _parse_address(address)
+        super(EdgeClient, self).__init__(**kwargs)
+
+    def _new_transport(self, persist_cookies):
+        # 连接到节点 IP，Host 头、SNI 及证书校验仍使用请求地址中的域名
+        ip, port = self.edge_address
+        return RequestsTransport(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                 pool_block=self.pool_block, persist_cookies=persist_cookies,
+                                 resolver=lambda host, default_port: (ip, port or default_port))
+
+
+class Edge(object):
+    """
+    CDN 节点及其评分。评分越低越好：
+    (耗时 + age_weight * 数据延迟) * (1 + 进行中的请求数) + 错误率 * error_penalty
+    """
+
+    # 指数移动平均系数
+    alpha = 0.2
+
+    # 错误率折算的耗时（秒）
+    error_penalty = 5.0
+
+    def __init__(self, address, base_url=None):
+        """
+        :param address 节点地址 'ip' 或 'ip:port'
+        :param base_url 同 TrainClient
+        """
+        self.address = address
+        self.client = EdgeClient(address, pool_connections=1, pool_maxsize=settings.EDGE_POOL_MAXSIZE,
+                                 base_url=base_url)
+        # 限流及 JSON 解析由发起请求的 API 指定，见 EdgePool.submit
+        self.api = TrainBaseAPI(client=self.client, cache=False, rate_limiter=False)
+        self.latency = None
+        self.age = 0.0
+        self.error_rate = 0.0
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.down_until = 0
+
+    def __repr__(self):
+        return '<Edge %s score:%.3f>' % (self.address, self.score(settings.EDGE_AGE_WEIGHT))
+
+    def score(self, age_weight):
+        # 未使用过的节点优先尝试
+        latency = self.latency or 0.0
+        return (latency + age_weight * self.age) * (1 + self.inflight) + self.error_rate * self.error_penalty
+
+    def _ewma(self, old, value):
+        return value if old is None else self.alpha * value + (1 - self.alpha) * old
+
+    def succeeded(self, latency, age):
+        self.latency = self._ewma(self.latency, latency)
+        self.age = self._ewma(self.age, age)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+        self.consecutive_errors = 0
+
+    def failed(self, cooldown, max_errors):
+        self.errors += 1
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= max_errors:
+            self.down_until = time.time() + cooldown
+
+    def stats(self):
+        return {
+            'address': self.address,
+            'latency': self.latency,
+            'age': self.age,
+            'error_rate': self.error_rate,
+            'inflight': self.inflight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'down': self.down_until > time.time(),
+        }
+
+    def close(self):
+        self.client.close()
+
+
+class EdgePool(object):
+    """
+    多个 CDN 节点的查询调度，按耗时和数据新鲜度（响应的 Age 头）为节点评分。
+
+    1. spread 每次随机取两个节点，使用评分较好的一个，请求分散到多个节点，同时偏向较好的节点；
+    2. race 同时向评分最好的 fanout 个节点发送请求，使用先成功返回的响应。
+
+    连续失败 max_errors 次的节点暂停使用 cooldown 秒。
+    """
+
+    def __init__(self, addresses=None, mode=None, fanout=None, age_weight=None, cooldown=None, max_errors=3,
+                 base_url=None):
+        """
+        :param addresses 节点地址列表，默认 settings.EDGE_IPS，为空时解析 settings.EDGE_HOST
+        :param mode 调度方式 'spread' 或 'race'，默认 settings.EDGE_MODE
+        :param fanout race 方式同时请求的节点数，默认 settings.EDGE_RACE_FANOUT
+        :param age_weight 每秒数据延迟折算的耗时（秒），默认 settings.EDGE_AGE_WEIGHT
+        :param cooldown 节点暂停使用的时间（秒），默认 settings.EDGE_ERROR_COOLDOWN
+        :param max_errors 节点连续失败多少次后暂停使用
+        :param base_url 同 TrainClient
+        """
+        addresses = addresses or settings.EDGE_IPS or resolve_edges()
+        self.edges = [Edge(address, base_url=base_url) for address in addresses]
+        self.mode = mode or settings.EDGE_MODE or MODE_SPREAD
+        self.fanout = fanout or settings.EDGE_RACE_FANOUT
+        self.age_weight = settings.EDGE_AGE_WEIGHT if age_weight is None else age_weight
+        self.cooldown = settings.EDGE_ERROR_COOLDOWN if cooldown is None else cooldown
+        self.max_errors = max_errors
+        assert self.edges, 'No edge'
+        assert self.mode in (MODE_SPREAD, MODE_RACE), 'Unknown edge mode %s' % self.mode
+
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = futures.ThreadPoolExecutor(max_workers=len(self.edges) * 2)
+        return self._executor
+
+    def available(self):
+        now = time.time()
+        edges = [edge for edge in self.edges if edge.down_until <= now]
+        return edges or list(self.edges)
+
+    def choose(self, n=1):
+        """
+        选择节点
+        :param n 节点数，1 时使用两个随机节点中评分较好的一个，否则按评分取最好的 n 个
+        """
+        with self._lock:
+            edges = self.available()
+            if n == 1:
+                candidates = random.sample(edges, min(2, len(edges)))
+                return [min(candidates, key=lambda edge: edge.score(self.age_weight))]
+            random.shuffle(edges)
+            return sorted(edges, key=lambda edge: edge.score(self.age_weight))[:n]
+
+    def _submit(self, edge, url, params, method, rate_limiter=None, codec=None, **kwargs):
+        # 本地限流的等待不计入节点耗时
+        if rate_limiter is not None:
+            rate_limiter.acquire(url, kwargs.get('cookies'))
+
+        with self._lock:
+            edge.inflight += 1
+            edge.requests += 1
+        start = time.time()
+        try:
+            resp = edge.api.submit(url, params, method=method, parse_resp=False, **kwargs)
+            result = edge.api._parse_resp(url, resp, codec)
+        except (requests.RequestException, exceptions.TrainRequestException):
+            with self._lock:
+                edge.inflight -= 1
+                edge.failed(self.cooldown, self.max_errors)
+            raise
+        except Exception:
+            # 未登录、status 为 false 等 12306 业务错误与节点无关
+            with self._lock:
+                edge.inflight -= 1
+            raise
+
+        try:
+            age = float(resp.headers.get('Age') or 0)
+        except ValueError:
+            age = 0.0
+        with self._lock:
+            edge.inflight -= 1
+            edge.succeeded(time.time() - start, age)
+        return result
+
+    def submit(self, url, params=None, method='GET', rate_limiter=None, codec=None, **kwargs):
+        """
+        通过 CDN 节点请求并解析 12306 JSON 响应，参数同 TrainBaseAPI.submit
+        :param rate_limiter 发起请求的 API 的限流器，每个节点请求前获取令牌，None 表示不限流
+        :param codec 发起请求的 API 的 JSON 编解码，默认同 TrainBaseAPI
+        """
+        if self.mode == MODE_SPREAD or self.fanout <= 1 or len(self.edges) == 1:
+            return self._submit(self.choose()[0], url, params, method, rate_limiter, codec, **kwargs)
+
+        pending = [self.executor.submit(self._submit, edge, url, params, method, rate_limiter, codec, **kwargs)
+                   for edge in self.choose(self.fanout)]
+        error = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    for p in pending:
+                        p.cancel()
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    def stats(self):
+        """
+        节点统计，按评分排序
+        """
+        with self._lock:
+            edges = sorted(self.edges, key=lambda edge: edge.score(self.age_weight))
+            return [edge.stats() for edge in edges]
+
+    def close(self):
+        for edge in self.edges:
+            edge.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_default_edge_pool = None
+_default_edge_pool_lock = threading.Lock()
+
+
+def default_edge_pool():
+    """
+    进程内默认的 CDN 节点池，settings.EDGE_MODE 为 None 时不使用
+    """
+    global _default_edge_pool
+
+    if _default_edge_pool is None and settings.EDGE_MODE:
+        with _default_edge_pool_lock:
+            if _default_edge_pool is None:
+                _default_edge_pool = EdgePool()
+    return _default_edge_pool
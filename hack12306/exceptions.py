@@ -26,4 +26,10 @@ class TrainAPIException(TrainBaseException):
 class TrainUserNotLogin(TrainAPIException):
     """
     用户未登录
-    """
\ No newline at end of file
+    """
+
+
+class TrainRateLimitException(TrainRequestException):
+    """
+    请求被限流
+    """
@@ -0,0 +1,348 @@
+# encoding: utf8
+"""
+metrics.py
+@author Meng.yangyang
+@description Request metrics exported in Prometheus text format
+@created Sun Oct 18 2026 17:21:46 GMT+0800 (CST)
+"""
+
+import time
+import bisect
+import logging
+import urlparse
+import threading
+import contextlib
+import BaseHTTPServer
+import SocketServer
+
+from . import settings
+
+__all__ = ('MetricsRegistry', 'Counter', 'Histogram', 'RequestMetrics', 'registry', 'request_metrics',
+           'serve_metrics',)
+
+_logger = logging.getLogger('hack12306')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    if isinstance(value, unicode):
+        value = value.encode('utf8')
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append('%s="%s"' % extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _Metric(object):
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        """
+        :param name 指标名称
+        :param help 指标说明
+        :param labelnames 标签名称列表
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        assert len(labels) == len(self.labelnames), 'Invalid labels %s for %s' % (labels, self.name)
+        return tuple(labels)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def expose(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s %s' % (self.name, self.type)]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    计数器
+    """
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, labels=()):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self, labels, value):
+        return ['%s%s %s' % (self.name, _format_labels(self.labelnames, labels), _format_value(value))]
+
+
+class Histogram(_Metric):
+    """
+    直方图，按桶统计观测值的分布
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=None):
+        """
+        :param buckets 桶上限列表（秒），默认 DEFAULT_BUCKETS
+        """
+        super(Histogram, self).__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets or DEFAULT_BUCKETS))
+
+    def observe(self, labels, value):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def get(self, labels=()):
+        """
+        :return (观测次数, 观测值总和)
+        """
+        entry = self._values.get(self._key(labels))
+        if entry is None:
+            return 0, 0.0
+        return sum(entry[0]), entry[1]
+
+    def _samples(self, labels, value):
+        counts, total = value
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            samples.append('%s_bucket%s %s' % (
+                self.name, _format_labels(self.labelnames, labels, ('le', _format_value(float(bound)))), cumulative))
+        label_str = _format_labels(self.labelnames, labels)
+        samples.append('%s_sum%s %s' % (self.name, label_str, _format_value(total)))
+        samples.append('%s_count%s %s' % (self.name, label_str, cumulative))
+        return samples
+
+
+class MetricsRegistry(object):
+    """
+    指标注册表，按 Prometheus 文本格式导出全部指标
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            assert metric.name not in self._names, 'Duplicated metric %s' % metric.name
+            self._names[metric.name] = metric
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=None):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def get(self, name):
+        return self._names.get(name)
+
+    def clear(self):
+        """
+        清空全部指标的取值
+        """
+        for metric in list(self._metrics):
+            metric.clear()
+
+    def expose(self):
+        """
+        :return Prometheus 文本格式
+        """
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+class _RequestTracker(object):
+    """
+    单次请求的计时，由 TrainBaseAPI.submit 调用
+    """
+
+    __slots__ = ('metrics', 'labels', 'started', 'received_at')
+
+    def __init__(self, metrics, endpoint, method):
+        self.metrics = metrics
+        self.labels = (endpoint, method)
+        self.started = time.time()
+        self.received_at = None
+
+    def cache_hit(self):
+        self.metrics.cache_hits.inc(self.labels)
+
+    def sent(self):
+        """
+        开始发送请求，重新计时，网络耗时不包含限流等待时间
+        """
+        self.started = time.time()
+
+    def received(self, resp, stream=False):
+        """
+        收到响应，记录网络耗时、状态码及收发字节数
+        :param stream 是否为流式响应，流式响应按 Content-Length 统计接收字节数
+        """
+        self.received_at = time.time()
+        metrics, labels = self.metrics, self.labels
+        metrics.network_seconds.observe(labels, self.received_at - self.started)
+        metrics.requests.inc(labels + (str(resp.status_code),))
+
+        body = getattr(getattr(resp, 'request', None), 'body', None)
+        if body and isinstance(body, basestring):
+            metrics.bytes_out.inc(labels, len(body))
+        if stream:
+            bytes_in = int(resp.headers.get('Content-Length') or 0)
+        else:
+            bytes_in = len(resp.content or '')
+        if bytes_in:
+            metrics.bytes_in.inc(labels, bytes_in)
+
+    def parsed(self):
+        self.metrics.parse_seconds.observe(self.labels, time.time() - self.received_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.metrics.exceptions.inc(self.labels + (exc_type.__name__,))
+            if self.received_at is None:
+                self.metrics.network_seconds.observe(self.labels, time.time() - self.started)
+
+
+class RequestMetrics(object):
+    """
+    12306 接口请求指标：按接口路径（endpoint）和 HTTP 方法（method）统计
+    网络耗时、解析耗时、状态码、异常及收发字节数。
+    """
+
+    def __init__(self, registry, prefix='hack12306'):
+        labels = ('endpoint', 'method')
+        self.network_seconds = registry.histogram(
+            prefix + '_request_duration_seconds', 'Network time of 12306 requests in seconds.', labels)
+        self.parse_seconds = registry.histogram(
+            prefix + '_parse_duration_seconds',
+            'Response parse time of 12306 requests in seconds. Streamed responses (station_name.js, '
+            'train_list.js, initDc) include reading the body.', labels)
+        self.requests = registry.counter(
+            prefix + '_requests_total', 'Total 12306 requests by HTTP status.', labels + ('status',))
+        self.exceptions = registry.counter(
+            prefix + '_exceptions_total', 'Total exceptions raised by 12306 requests.', labels + ('exception',))
+        self.cache_hits = registry.counter(
+            prefix + '_cache_hits_total', 'Total 12306 requests served by the response cache.', labels)
+        self.bytes_out = registry.counter(
+            prefix + '_request_bytes_total', 'Total request body bytes sent to 12306.', labels)
+        self.bytes_in = registry.counter(
+            prefix + '_response_bytes_total', 'Total response body bytes received from 12306.', labels)
+
+    def track(self, url, method):
+        """
+        开始统计一次请求
+        :return 上下文管理器，退出时记录异常
+        """
+        return _RequestTracker(self, urlparse.urlparse(url).path, method)
+
+
+registry = MetricsRegistry()
+request_metrics = RequestMetrics(registry)
+
+
+def request_tracker(url, method):
+    """
+    settings.METRICS_ENABLED 为 False 时返回 None，不做任何统计
+    """
+    if not settings.METRICS_ENABLED:
+        return None
+    return request_metrics.track(url, method)
+
+
+@contextlib.contextmanager
+def parse_timer(url, method):
+    """
+    统计自行解析响应（parse_resp=False）的接口的解析耗时，流式响应包含读取响应体的时间。
+    settings.METRICS_ENABLED 为 False 时不统计
+    """
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+
+    start = time.time()
+    yield
+    request_metrics.parse_seconds.observe((urlparse.urlparse(url).path, method), time.time() - start)
+
+
+class _MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if urlparse.urlparse(self.path).path != '/metrics':
+            self.send_error(404)
+            return
+
+        body = self.registry.expose()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        _logger.debug('metrics %s - %s' % (self.address_string(), format % args))
+
+
+class _MetricsServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_metrics(port, host='127.0.0.1', metrics_registry=None):
+    """
+    在后台线程提供 Prometheus 抓取地址 http://host:port/metrics
+    :param metrics_registry 指标注册表，默认为进程内的 registry
+    :return HTTPServer，调用 shutdown() 停止
+    """
+    metrics_registry = metrics_registry or registry
+
+    class MetricsHandler(_MetricsHandler):
+        registry = metrics_registry
+
+    server = _MetricsServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='hack12306-metrics')
+    thread.daemon = True
+    thread.start()
+    return server
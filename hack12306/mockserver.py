@@ -0,0 +1,1131 @@
+# encoding: utf8
+"""
+mockserver.py
+@author Meng.yangyang
+@description Local 12306 stand-in server with latency and fault injection
+@created Sun Oct 18 2026 13:05:52 GMT+0800 (CST)
+
+python -m hack12306.mockserver --port 8306 --latency 0.05 --error-rate 0.01
+
+    import hack12306.settings
+    hack12306.settings.BASE_URL = 'http://127.0.0.1:8306'
+"""
+
+import re
+import math
+import time
+import json
+import uuid
+import base64
+import random
+import hashlib
+import urllib
+import urlparse
+import argparse
+import datetime
+import email.utils
+import threading
+import collections
+import BaseHTTPServer
+import SocketServer
+
+__all__ = ('MockTrainServer', 'constant_latency', 'uniform_latency', 'lognormal_latency', 'exponential_latency',)
+
+
+def constant_latency(seconds):
+    return lambda rng: seconds
+
+
+def uniform_latency(low, high):
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal_latency(median, sigma=0.5):
+    """
+    对数正态分布延迟，长尾
+    :param median 延迟中位数（秒）
+    :param sigma 对数标准差
+    """
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def exponential_latency(mean):
+    return lambda rng: rng.expovariate(1.0 / mean)
+
+
+# (电报码, 名称, 简拼, 拼音)
+STATIONS = [
+    ('VAP', u'北京北', 'bjb', 'beijingbei'),
+    ('BJP', u'北京', 'bji', 'beijing'),
+    ('VNP', u'北京南', 'bjn', 'beijingnan'),
+    ('BXP', u'北京西', 'bjx', 'beijingxi'),
+    ('TIP', u'天津南', 'tjn', 'tianjinnan'),
+    ('TJP', u'天津', 'tji', 'tianjin'),
+    ('LJP', u'廊坊', 'lfa', 'langfang'),
+    ('SJP', u'石家庄', 'sjz', 'shijiazhuang'),
+    ('JGK', u'济南西', 'jnx', 'jinanxi'),
+    ('ZAF', u'郑州东', 'zzd', 'zhengzhoudong'),
+    ('NKH', u'南京南', 'njn', 'nanjingnan'),
+    ('SZH', u'苏州', 'szh', 'suzhou'),
+    ('SHH', u'上海', 'sha', 'shanghai'),
+    ('AOH', u'上海虹桥', 'shq', 'shanghaihongqiao'),
+    ('WHN', u'武汉', 'wha', 'wuhan'),
+    ('IZQ', u'广州南', 'gzn', 'guangzhounan'),
+    ('SYT', u'沈阳', 'sya', 'shenyang'),
+    ('SBT', u'沈阳北', 'syb', 'shenyangbei'),
+]
+STATION_NAMES = dict([(s[0], s[1]) for s in STATIONS])
+
+# (车次, train_no, 车次类型, [(电报码, 到达时间, 出发时间)])
+TRAINS = [
+    ('G1', '24000000G10I', 'G', [('VNP', None, '09:00'), ('TIP', '09:30', '09:32'), ('JGK', '10:22', '10:24'),
+                                 ('NKH', '12:01', '12:03'), ('AOH', '13:28', None)]),
+    ('G101', '240000G1010C', 'G', [('VNP', None, '06:36'), ('TIP', '07:10', '07:12'), ('JGK', '08:03', '08:05'),
+                                   ('NKH', '09:58', '10:00'), ('SZH', '11:05', '11:07'), ('AOH', '11:29', None)]),
+    ('G103', '240000G1030C', 'G', [('VNP', None, '07:00'), ('JGK', '08:29', '08:31'), ('NKH', '10:29', '10:31'),
+                                   ('AOH', '11:50', None)]),
+    ('G7', '5l000000G70N', 'G', [('AOH', None, '19:00'), ('NKH', '20:08', '20:10'), ('JGK', '21:45', '21:47'),
+                                 ('VNP', '23:18', None)]),
+    ('G71', '240000G0710E', 'G', [('BXP', None, '08:00'), ('SJP', '09:10', '09:12'), ('ZAF', '10:25', '10:28'),
+                                  ('WHN', '12:20', '12:25'), ('IZQ', '16:30', None)]),
+    ('D3021', '5500000D3021', 'D', [('NKH', None, '13:00'), ('WHN', '16:40', '16:45'), ('IZQ', '22:10', None)]),
+    ('D1', '24000000D10R', 'D', [('BJP', None, '07:40'), ('TJP', '08:25', '08:27'), ('SBT', '11:51', '11:55'),
+                                 ('SYT', '12:05', None)]),
+    ('K571', '240000K5710B', 'K', [('BXP', None, '18:06'), ('LJP', '19:02', '19:04'), ('TJP', '19:58', '20:10'),
+                                   ('SHH', '11:20', None)]),
+]
+TRAIN_BY_NO = dict([(t[1], t) for t in TRAINS])
+TRAIN_CLASS_NAMES = {'G': u'高速', 'D': u'动车', 'K': u'快速'}
+
+SEAT_VALUES = [u'有', u'无', u'*', u'1', u'5', u'12', u'20']
+
+PASSENGERS = [{
+    'passenger_name': u'张三',
+    'sex_code': 'M',
+    'sex_name': u'男',
+    'born_date': '1990-01-01 00:00:00',
+    'country_code': 'CN',
+    'passenger_id_type_code': '1',
+    'passenger_id_type_name': u'中国居民身份证',
+    'passenger_id_no': '110101199001011234',
+    'passenger_type': '1',
+    'passenger_flag': '0',
+    'passenger_type_name': u'成人',
+    'mobile_no': '13800138000',
+    'phone_no': '',
+    'email': 'zhangsan@example.com',
+    'address': '',
+    'postalcode': '',
+    'first_letter': 'ZS',
+    'recordCount': '1',
+    'total_times': '99',
+    'index_id': '0',
+}]
+
+INIT_DC_HTML = u"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>中国铁路12306</title>
+<script type="text/javascript">
+    var ctx='/otn/';
+    var globalRepeatSubmitToken = '%(token)s';
+    var global_lang = 'zh_CN';
+    var sessionInit = '%(name)s';
+    var isShowNotice = null;
+    var CLeftTicketUrl = 'leftTicket/query';
+    var isDstOpen = 'N';
+</script>
+%(filler)s
+<script type="text/javascript">
+    var passengerInfo_limit_tip = '';
+    var ticketInfoForPassengerForm=%(ticket_info)s;
+    var orderRequestDTO=%(order_request)s;
+    var init_seatTypes=[{'end_station_name':null,'end_time':null,'id':'O','start_station_name':null,'start_time':null,'value':'二等座'}];
+    var defaultTicketTypes=[{'end_station_name':null,'end_time':null,'id':'1','start_station_name':null,'start_time':null,'value':'成人票'}];
+</script>
+</head>
+<body>
+%(filler)s
+</body>
+</html>
+"""
+
+FILLER_HTML = u'\n'.join([u'<div class="item"><span>车次信息 %d</span><a href="javascript:;">详情</a></div>' % i
+                          for i in range(400)])
+
+TRAN_DATA_XML = u"""<?xml version="1.0" encoding="UTF-8"?>
+<Request>
+  <interfaceVersion>1.0</interfaceVersion>
+  <interfaceName>WEBPAY</interfaceName>
+  <orderDate>%(order_date)s</orderDate>
+  <orderTimeoutDate>%(order_timeout_date)s</orderTimeoutDate>
+  <orderId>%(order_id)s</orderId>
+  <amount>%(amount)s</amount>
+  <appId>0001</appId>
+  <curType>156</curType>
+  <merURL>https://kyfw.12306.cn/otn/payOrder/paySuccess</merURL>
+  <appURL>https://kyfw.12306.cn/otn/</appURL>
+  <innerURL>https://kyfw.12306.cn/otn/payOrder/paySuccess</innerURL>
+  <merVAR>http://www.12306.cn</merVAR>
+  <transType>01</transType>
+  <paymentLinkType>1</paymentLinkType>
+</Request>
+"""
+
+HTML_PAGE = u'<!DOCTYPE html><html><head><meta charset="utf-8"><title>%s</title></head><body>%s</body></html>'
+
+
+def _time_minutes(s):
+    h, m = s.split(':')
+    return int(h) * 60 + int(m)
+
+
+def _duration(depart, arrive):
+    minutes = (_time_minutes(arrive) - _time_minutes(depart)) % (24 * 60)
+    return '%02d:%02d' % (minutes / 60, minutes % 60)
+
+
+def _make_secret(train_date, train_no, from_station, to_station):
+    return urllib.quote(base64.b64encode('|'.join([train_date, train_no, from_station, to_station])))
+
+
+def _read_secret(secret):
+    return base64.b64decode(urllib.unquote(secret)).split('|')
+
+
+class _Session(object):
+
+    def __init__(self, jsessionid):
+        self.jsessionid = jsessionid
+        self.route = uuid.uuid4().hex
+        self.big_ip = '%d.64545.0000' % random.randint(100000000, 999999999)
+        self.token = None
+        self.order_context = None
+        self.pending = {}
+        self.orders = []
+
+
+class MockTrainServer(object):
+    """
+    本地 12306 模拟服务，实现 SDK 使用的全部接口，支持延迟、错误、限流和 Session 过期注入。
+
+        with MockTrainServer(latency=lognormal_latency(0.05), error_rate=0.01) as server:
+            settings.BASE_URL = server.base_url
+            ...
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=None, error_rate=0.0, throttle_rate=0.0,
+                 session_ttl=None, queue_wait=0.5, qr_scan_checks=1, cache_age=0, seed=None):
+        """
+        :param latency 延迟分布函数 f(random.Random) 返回秒数，或 {路径前缀: 延迟分布函数} 字典
+        :param error_rate 错误率（返回 502 或非 JSON 响应），或 {路径前缀: 错误率} 字典
+        :param throttle_rate 限流率（重定向到 12306 错误页面），或 {路径前缀: 限流率} 字典
+        :param session_ttl 登录 Session 空闲过期时间（秒），None 表示不过期
+        :param queue_wait 下单后排队时间（秒）
+        :param qr_scan_checks 二维码检查多少次后确认登录
+        :param cache_age 余票查询响应的 Age 头（秒），模拟 CDN 节点返回的缓存数据
+        :param seed 随机数种子
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.session_ttl = session_ttl
+        self.queue_wait = queue_wait
+        self.qr_scan_checks = qr_scan_checks
+        self.cache_age = cache_age
+        self.rng = random.Random(seed)
+        self.last_modified = email.utils.formatdate(time.time(), usegmt=True)
+
+        self.sessions = {}
+        self.logins = {}
+        self.qrs = {}
+        self.uamtks = {}
+        self.stats = collections.defaultdict(collections.Counter)
+        self.lock = threading.RLock()
+
+        self.httpd = _HTTPServer((host, port), _Handler)
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return 'http://%s:%s' % self.httpd.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='hack12306-mockserver')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _for_path(self, value, path):
+        if not isinstance(value, dict):
+            return value
+
+        matched = None
+        for prefix in value:
+            if path.startswith(prefix) and (matched is None or len(prefix) > len(matched)):
+                matched = prefix
+        return value[matched] if matched is not None else None
+
+    def latency_for(self, path):
+        latency = self._for_path(self.latency, path)
+        return max(latency(self.rng), 0) if latency else 0
+
+    def error_for(self, path):
+        return self.rng.random() < (self._for_path(self.error_rate, path) or 0)
+
+    def throttle_for(self, path):
+        return self.rng.random() < (self._for_path(self.throttle_rate, path) or 0)
+
+    def count(self, path, name):
+        with self.lock:
+            self.stats[path][name] += 1
+
+    def new_session(self):
+        with self.lock:
+            session = _Session(uuid.uuid4().hex.upper())
+            self.sessions[session.jsessionid] = session
+            return session
+
+    def login(self, session=None):
+        """
+        直接创建已登录的 Session
+        :return cookies
+        """
+        session = session or self.new_session()
+        tk = base64.urlsafe_b64encode(uuid.uuid4().bytes).rstrip('=')
+        with self.lock:
+            self.logins[tk] = session
+            session.login_expire = time.time() + self.session_ttl if self.session_ttl else None
+        return {
+            'JSESSIONID': session.jsessionid,
+            'tk': tk,
+            'route': session.route,
+            'BIGipServerotn': session.big_ip,
+        }
+
+    def expire(self, cookies):
+        """
+        使 Session 过期
+        """
+        with self.lock:
+            self.logins.pop(cookies.get('tk'), None)
+
+    def login_session(self, cookies):
+        with self.lock:
+            session = self.logins.get(cookies.get('tk'))
+            if session is None:
+                return None
+            if session.login_expire is not None:
+                if session.login_expire < time.time():
+                    self.logins.pop(cookies.get('tk'), None)
+                    return None
+                session.login_expire = time.time() + self.session_ttl
+            return session
+
+
+class _HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+_LOGIN_REQUIRED = set([
+    '/otn/leftTicket/submitOrderRequest',
+    '/otn/confirmPassenger/initDc',
+    '/otn/confirmPassenger/checkOrderInfo',
+    '/otn/confirmPassenger/getQueueCount',
+    '/otn/confirmPassenger/confirmSingleForQueue',
+    '/otn/confirmPassenger/queryOrderWaitTime',
+    '/otn/confirmPassenger/resultOrderForDcQueue',
+    '/otn/confirmPassenger/getPassengerDTOs',
+    '/otn/queryOrder/queryMyOrder',
+    '/otn/queryOrder/queryMyOrderNoComplete',
+    '/otn/queryOrder/continuePayNoCompleteMyOrder',
+    '/otn/payOrder/init',
+    '/otn/payOrder/paycheckNew',
+    '/otn/modifyUser/initQueryUserInfoApi',
+    '/otn/address/initApi',
+    '/tlcx/memberInfo/queryMemberIntegration',
+    '/tlcx/memberInfo/memberPointQuery',
+    '/tlcx/memberInfo/pointSimpleQuery',
+    '/pay/payGateway',
+    '/pay/webBusiness',
+])
+
+_HTML_PATHS = set(['/otn/confirmPassenger/initDc', '/otn/payOrder/init', '/pay/payGateway', '/pay/webBusiness'])
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'nginx'
+
+    routes = {
+        '/otn/login/conf': 'login_conf',
+        '/passport/web/create-qr64': 'create_qr64',
+        '/passport/web/checkqr': 'check_qr',
+        '/passport/web/auth/uamtk': 'uamtk',
+        '/otn/uamauthclient': 'uamauthclient',
+        '/otn/passport': 'passport',
+        '/otn/login/userLogin': 'passport',
+        '/mormhweb/logFiles/error.html': 'error_page',
+        '/otn/leftTicket/query': 'left_ticket_query',
+        '/otn/czxx/query': 'station_trains',
+        '/otn/czxx/queryByTrainNo': 'train_no',
+        '/otn/leftTicket/queryTicketPrice': 'ticket_price',
+        '/otn/resources/js/framework/station_name.js': 'station_name_js',
+        '/otn/resources/js/query/train_list.js': 'train_list_js',
+        '/search/v1/train/search': 'train_search',
+        '/otn/queryDishonest/query': 'dishonest',
+        '/otn/queryDishonest/getOne': 'dishonest_getone',
+        '/otn/leftTicket/submitOrderRequest': 'submit_order',
+        '/otn/confirmPassenger/initDc': 'init_dc',
+        '/otn/confirmPassenger/checkOrderInfo': 'check_order_info',
+        '/otn/confirmPassenger/getQueueCount': 'get_queue_count',
+        '/otn/confirmPassenger/confirmSingleForQueue': 'confirm_single_for_queue',
+        '/otn/confirmPassenger/queryOrderWaitTime': 'query_order_wait_time',
+        '/otn/confirmPassenger/resultOrderForDcQueue': 'result_order',
+        '/otn/confirmPassenger/getPassengerDTOs': 'passengers',
+        '/otn/queryOrder/queryMyOrder': 'query_my_order',
+        '/otn/queryOrder/queryMyOrderNoComplete': 'query_my_order_no_complete',
+        '/otn/modifyUser/initQueryUserInfoApi': 'user_info',
+        '/otn/address/initApi': 'addresses',
+        '/tlcx/memberInfo/queryMemberIntegration': 'member_info',
+        '/tlcx/memberInfo/memberPointQuery': 'member_point',
+        '/tlcx/memberInfo/pointSimpleQuery': 'member_point_history',
+        '/otn/queryOrder/continuePayNoCompleteMyOrder': 'continue_pay',
+        '/otn/payOrder/init': 'pay_init',
+        '/otn/payOrder/paycheckNew': 'pay_check_new',
+        '/pay/payGateway': 'pay_gateway',
+        '/pay/webBusiness': 'web_business',
+    }
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        url = urlparse.urlparse(self.path)
+        path = url.path
+        self.params = dict(urlparse.parse_qsl(url.query, keep_blank_values=True))
+
+        length = int(self.headers.getheader('Content-Length') or 0)
+        body = self.rfile.read(length) if length else ''
+        if body:
+            if 'json' in (self.headers.getheader('Content-Type') or ''):
+                self.params.update(json.loads(body))
+            else:
+                self.params.update(dict(urlparse.parse_qsl(body, keep_blank_values=True)))
+
+        self.cookies = {}
+        for cookie in (self.headers.getheader('Cookie') or '').split(';'):
+            if '=' in cookie:
+                k, v = cookie.strip().split('=', 1)
+                self.cookies[k] = v
+
+        mock = self.mock
+        mock.count(path, 'requests')
+
+        latency = mock.latency_for(path)
+        if latency:
+            time.sleep(latency)
+
+        handler = self.routes.get(path)
+        if handler is None:
+            return self._reply(404, HTML_PAGE % (u'404', u'Not Found'), 'text/html')
+
+        if handler not in ('error_page', 'passport'):
+            if mock.throttle_for(path):
+                mock.count(path, 'throttled')
+                return self._redirect('/mormhweb/logFiles/error.html')
+
+            if mock.error_for(path):
+                mock.count(path, 'errors')
+                if mock.rng.random() < 0.5:
+                    return self._reply(502, HTML_PAGE % (u'502 Bad Gateway', u'<h1>502 Bad Gateway</h1>'), 'text/html')
+                return self._reply(200, HTML_PAGE % (u'中国铁路12306', u'网络可能存在问题，请您重试一下！'), 'text/html')
+
+        self.session = None
+        if path in _LOGIN_REQUIRED:
+            self.session = mock.login_session(self.cookies)
+            if self.session is None:
+                mock.count(path, 'not_login')
+                if path in _HTML_PATHS:
+                    return self._redirect('/otn/passport?redirect=/otn/login/userLogin')
+                return self._json({'status': False, 'messages': [u'用户未登录'], 'url': '/view/index.html',
+                                   'validateMessagesShowId': '_validatorMessage', 'validateMessages': {}})
+
+        getattr(self, 'handle_%s' % handler)()
+
+    def _reply(self, status, body, content_type, headers=None):
+        if isinstance(body, unicode):
+            body = body.encode('utf8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', '%s;charset=UTF-8' % content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in headers or []:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _static(self, body, content_type):
+        """
+        静态资源，支持 ETag/Last-Modified 条件请求
+        """
+        body = body.encode('utf8')
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        last_modified = self.mock.last_modified
+        if_none_match = self.headers.getheader('If-None-Match')
+        if (if_none_match and if_none_match == etag) or \
+                (not if_none_match and self.headers.getheader('If-Modified-Since') == last_modified):
+            self.mock.count(urlparse.urlparse(self.path).path, 'not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._reply(200, body, content_type, [('ETag', etag), ('Last-Modified', last_modified)])
+
+    def _redirect(self, location):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _json(self, data, headers=None):
+        self._reply(200, json.dumps(data, ensure_ascii=False), 'application/json', headers)
+
+    def _ok(self, data, headers=None):
+        self._json({
+            'validateMessagesShowId': '_validatorMessage',
+            'status': True,
+            'httpstatus': 200,
+            'data': data,
+            'messages': [],
+            'validateMessages': {},
+        }, headers)
+
+    def _fail(self, message):
+        self._json({'validateMessagesShowId': '_validatorMessage', 'status': False, 'httpstatus': 200,
+                    'messages': [message], 'validateMessages': {}})
+
+    def _check_token(self):
+        if self.params.get('REPEAT_SUBMIT_TOKEN') != self.session.token:
+            self._fail(u'系统繁忙，请稍后重试！')
+            return False
+        return True
+
+    # 认证
+
+    def handle_login_conf(self):
+        mock = self.mock
+        headers = []
+        session = mock.sessions.get(self.cookies.get('JSESSIONID'))
+        if session is None:
+            session = mock.new_session()
+            headers = [
+                ('Set-Cookie', 'JSESSIONID=%s; Path=/otn' % session.jsessionid),
+                ('Set-Cookie', 'route=%s; Path=/' % session.route),
+                ('Set-Cookie', 'BIGipServerotn=%s; path=/' % session.big_ip),
+            ]
+        is_login = mock.login_session(self.cookies) is not None
+        self._ok({
+            'is_login': 'Y' if is_login else 'N',
+            'queryUrl': 'leftTicket/query',
+            'psr_qr_code_result': 'N',
+            'now': int(time.time() * 1000),
+            'login_model': '0',
+        }, headers=headers)
+
+    def handle_create_qr64(self):
+        qr_uuid = base64.urlsafe_b64encode(uuid.uuid4().bytes).rstrip('=')
+        with self.mock.lock:
+            self.mock.qrs[qr_uuid] = 0
+        self._json({
+            'image': base64.b64encode('\x89PNG\r\n\x1a\n' + uuid.uuid4().bytes),
+            'result_message': u'生成二维码成功',
+            'result_code': '0',
+            'uuid': qr_uuid,
+        })
+
+    def handle_check_qr(self):
+        mock = self.mock
+        qr_uuid = self.params.get('uuid')
+        with mock.lock:
+            if qr_uuid not in mock.qrs:
+                return self._json({'result_message': u'二维码已过期', 'result_code': '3'})
+            mock.qrs[qr_uuid] += 1
+            checks = mock.qrs[qr_uuid]
+
+        if checks < mock.qr_scan_checks:
+            return self._json({'result_message': u'二维码状态查询成功', 'result_code': '0'})
+
+        uamtk = uuid.uuid4().hex
+        with mock.lock:
+            mock.uamtks[uamtk] = mock.sessions.get(self.cookies.get('JSESSIONID'))
+        self._json({'result_message': u'扫码登录成功', 'result_code': '2', 'uamtk': uamtk})
+
+    def handle_uamtk(self):
+        mock = self.mock
+        with mock.lock:
+            session = mock.uamtks.pop(self.params.get('uamtk'), None)
+        if session is None:
+            return self._json({'result_message': u'验证不通过', 'result_code': 1})
+
+        newapptk = uuid.uuid4().hex
+        with mock.lock:
+            mock.uamtks[newapptk] = session
+        self._json({'result_message': u'验证通过', 'result_code': 0, 'apptk': None, 'newapptk': newapptk})
+
+    def handle_uamauthclient(self):
+        mock = self.mock
+        with mock.lock:
+            session = mock.uamtks.pop(self.params.get('tk'), None)
+        if session is None:
+            return self._json({'result_code': 2, 'result_message': u'用户未登录'})
+
+        cookies = mock.login(session)
+        self._json({'apptk': cookies['tk'], 'result_code': 0, 'result_message': u'验证通过',
+                    'username': PASSENGERS[0]['passenger_name']})
+
+    def handle_passport(self):
+        self._reply(200, HTML_PAGE % (u'登录 | 客运服务 | 铁路客户服务中心', u'<div id="login"></div>'), 'text/html')
+
+    def handle_error_page(self):
+        self._reply(200, HTML_PAGE % (u'中国铁路12306', u'网络可能存在问题，请您重试一下！'), 'text/html')
+
+    # 信息查询
+
+    def _segment(self, train, from_station, to_station):
+        codes = [stop[0] for stop in train[3]]
+        if from_station not in codes or to_station not in codes:
+            return None
+        i, j = codes.index(from_station), codes.index(to_station)
+        if i >= j:
+            return None
+        return i, j
+
+    def handle_left_ticket_query(self):
+        train_date = self.params.get('leftTicketDTO.train_date', '')
+        from_station = self.params.get('leftTicketDTO.from_station')
+        to_station = self.params.get('leftTicketDTO.to_station')
+        if not re.match(r'^\d{4}-\d{2}-\d{2}$', train_date):
+            return self._json({'status': False, 'messages': [u'查询日期格式错误'], 'httpstatus': 200})
+
+        rng = self.mock.rng
+        result = []
+        for code, train_no, train_class, stops in TRAINS:
+            segment = self._segment((code, train_no, train_class, stops), from_station, to_station)
+            if segment is None:
+                continue
+
+            i, j = segment
+            depart, arrive = stops[i][2], stops[j][1]
+            row = [u''] * 38
+            row[0] = _make_secret(train_date, train_no, from_station, to_station)
+            row[1] = u'预订'
+            row[2] = train_no
+            row[3] = code
+            row[4], row[5] = stops[0][0], stops[-1][0]
+            row[6], row[7] = from_station, to_station
+            row[8], row[9], row[10] = depart, arrive, _duration(depart, arrive)
+            row[11] = u'Y'
+            row[12] = uuid.uuid4().hex[:24]
+            row[13] = train_date.replace('-', '')
+            row[14], row[15] = u'3', u'P2'
+            row[16], row[17] = u'%02d' % (i + 1), u'%02d' % (j + 1)
+            row[18], row[19] = u'1', u'0'
+            if train_class in ('G', 'D'):
+                row[30], row[31] = rng.choice(SEAT_VALUES), rng.choice(SEAT_VALUES)
+                row[32] = rng.choice(SEAT_VALUES) if train_class == 'G' else u''
+                row[26] = rng.choice([u'无', u'有', u''])
+                row[34], row[35] = u'O0M090', u'OM9'
+            else:
+                row[23], row[28], row[29] = rng.choice(SEAT_VALUES), rng.choice(SEAT_VALUES), rng.choice(SEAT_VALUES)
+                row[26] = rng.choice(SEAT_VALUES)
+                row[34], row[35] = u'1040301010', u'1431'
+            row[36], row[37] = u'0', u'1'
+            result.append(u'|'.join(row))
+
+        self._ok({
+            'flag': '1',
+            'map': {from_station: STATION_NAMES.get(from_station, ''), to_station: STATION_NAMES.get(to_station, '')},
+            'result': result,
+        }, [('Age', str(int(self.mock.cache_age)))] if self.mock.cache_age else None)
+
+    def handle_station_trains(self):
+        station_code = self.params.get('train_station_code')
+        train_date = self.params.get('train_start_date', '').replace('-', '')
+        data = []
+        for code, train_no, train_class, stops in TRAINS:
+            for stop in stops:
+                if stop[0] != station_code:
+                    continue
+                data.append({
+                    'train_class_name': TRAIN_CLASS_NAMES[train_class],
+                    'is_support_card': '1',
+                    'start_station_telecode': stops[0][0],
+                    'start_station_name': STATION_NAMES[stops[0][0]],
+                    'end_station_telecode': stops[-1][0],
+                    'end_station_name': STATION_NAMES[stops[-1][0]],
+                    'station_train_code': code,
+                    'train_no': train_no,
+                    'start_train_date': train_date,
+                    'start_start_time': stops[0][2],
+                    'arrive_time': stop[1] or '----',
+                    'start_time': stop[2] or '----',
+                    'stopover_time': '----',
+                    'arrive_day_diff': '0',
+                })
+        self._ok({'flag': True, 'data': data})
+
+    def handle_train_no(self):
+        train = TRAIN_BY_NO.get(self.params.get('train_no'))
+        if train is None:
+            return self._ok({'data': []})
+
+        code, train_no, train_class, stops = train
+        segment = self._segment(train, self.params.get('from_station_telecode'),
+                                self.params.get('to_station_telecode')) or (0, len(stops) - 1)
+        data = []
+        for i, (station, arrive, depart) in enumerate(stops):
+            item = {
+                'arrive_time': arrive or '----',
+                'station_name': STATION_NAMES[station],
+                'start_time': depart or arrive,
+                'stopover_time': u'%d分钟' % (_time_minutes(depart) - _time_minutes(arrive))
+                if arrive and depart else '----',
+                'station_no': '%02d' % (i + 1),
+                'isEnabled': segment[0] <= i <= segment[1],
+            }
+            if i == 0:
+                item.update({
+                    'start_station_name': STATION_NAMES[stops[0][0]],
+                    'station_train_code': code,
+                    'train_class_name': TRAIN_CLASS_NAMES[train_class],
+                    'service_type': '2',
+                    'end_station_name': STATION_NAMES[stops[-1][0]],
+                })
+            data.append(item)
+        self._ok({'data': data})
+
+    def handle_ticket_price(self):
+        self._ok({
+            'OT': [],
+            'WZ': u'¥553.0',
+            'train_no': self.params.get('train_no'),
+            'A9': u'¥1748.0',
+            'M': u'¥933.0',
+            'O': u'¥553.0',
+        })
+
+    def handle_station_name_js(self):
+        stations = [u'@%s|%s|%s|%s|%s|%d' % (short_name, name, code, pinyin, short_name, i)
+                    for i, (code, name, short_name, pinyin) in enumerate(STATIONS)]
+        self._static(u"var station_names ='%s';" % u''.join(stations), 'application/javascript')
+
+    def handle_train_list_js(self):
+        today = datetime.date.today()
+        dates = []
+        for days in range(3):
+            train_date = (today + datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+            classes = collections.OrderedDict()
+            for code, train_no, train_class, stops in TRAINS:
+                classes.setdefault(train_class, []).append({
+                    'station_train_code': u'%s(%s-%s)' % (code, STATION_NAMES[stops[0][0]],
+                                                          STATION_NAMES[stops[-1][0]]),
+                    'train_no': train_no,
+                })
+            dates.append((train_date, classes))
+        body = json.dumps(collections.OrderedDict(dates), ensure_ascii=False, separators=(',', ':'))
+        self._static(u'var train_list =' + body, 'application/javascript')
+
+    def handle_train_search(self):
+        keyword = self.params.get('keyword', '').upper()
+        data = []
+        for code, train_no, train_class, stops in TRAINS:
+            if code.startswith(keyword):
+                data.append({
+                    'date': self.params.get('date', ''),
+                    'from_station': STATION_NAMES[stops[0][0]],
+                    'station_train_code': code,
+                    'to_station': STATION_NAMES[stops[-1][0]],
+                    'total_num': str(len(stops)),
+                    'train_no': train_no,
+                })
+        self._json({'data': data, 'status': True, 'errorMsg': ''})
+
+    def handle_dishonest(self):
+        self._ok({'right': [{'serial_no': '1', 'passenger_name': u'孟*', 'passenger_id_no': '131122********1234',
+                             'start_date': '2019-01-01', 'end_date': '2019-06-30'}]})
+
+    def handle_dishonest_getone(self):
+        self._ok([])
+
+    # 下单
+
+    def handle_submit_order(self):
+        try:
+            train_date, train_no, from_station, to_station = _read_secret(self.params.get('secretStr', ''))
+        except (TypeError, ValueError):
+            return self._fail(u'车票信息已过期，请重新查询最新车票信息')
+
+        self.session.order_context = {
+            'train_date': train_date,
+            'train_no': train_no,
+            'from_station': from_station,
+            'to_station': to_station,
+        }
+        self.session.token = uuid.uuid4().hex
+        self._ok('N')
+
+    def handle_init_dc(self):
+        context = self.session.order_context
+        if context is None:
+            return self._reply(200, HTML_PAGE % (u'中国铁路12306', u'系统忙，请稍后重试！'), 'text/html')
+
+        train = TRAIN_BY_NO[context['train_no']]
+        left_ticket_str = uuid.uuid4().hex
+        key_check_is_change = uuid.uuid4().hex.upper()
+        order_request = {
+            'adult_num': 0,
+            'apply_order_no': None,
+            'bed_level_order_num': None,
+            'cancel_flag': None,
+            'card_num': None,
+            'channel': None,
+            'child_num': 0,
+            'choose_seat': None,
+            'disability_num': 0,
+            'end_time': {'date': 1, 'time': 1},
+            'from_station_name': STATION_NAMES[context['from_station']],
+            'from_station_telecode': context['from_station'],
+            'id_mode': 'Y',
+            'isShowPassCode': None,
+            'leftTicketGenTime': None,
+            'order_date': None,
+            'passengerFlag': None,
+            'realleftTicket': None,
+            'reqIpAddress': None,
+            'reqTimeLeftStr': None,
+            'reserve_flag': 'A',
+            'seat_detail_type_code': None,
+            'seat_type_code': None,
+            'sequence_no': None,
+            'start_time': {'date': 1, 'time': 1},
+            'station_train_code': train[0],
+            'student_num': 0,
+            'ticket_num': 0,
+            'ticket_type_order_num': None,
+            'to_station_name': STATION_NAMES[context['to_station']],
+            'to_station_telecode': context['to_station'],
+            'tour_flag': 'dc',
+            'trainCodeText': None,
+            'train_date': {'date': 1, 'time': 1},
+            'train_date_str': None,
+            'train_location': None,
+            'train_no': train[1],
+            'train_order': None,
+            'varStr': None,
+        }
+        ticket_info = {
+            'cardTypes': [{'end_station_name': None, 'end_time': None, 'id': '1', 'start_station_name': None,
+                           'start_time': None, 'value': u'中国居民身份证'}],
+            'isAsync': '1',
+            'key_check_isChange': key_check_is_change,
+            'leftDetails': [u'二等座(553.00元)有票', u'一等座(933.00元)有票'],
+            'leftTicketStr': left_ticket_str,
+            'limitBuySeatTicketDTO': {'seat_type_codes': [{'id': 'O', 'value': u'二等座'}],
+                                      'ticket_seat_codeMap': {}, 'ticket_type_codes': []},
+            'maxTicketNum': '5',
+            'orderRequestDTO': order_request,
+            'purpose_codes': '00',
+            'queryLeftNewDetailDTO': {
+                'BXRZ_num': '-1',
+                'from_station_name': STATION_NAMES[context['from_station']],
+                'from_station_telecode': context['from_station'],
+                'station_train_code': train[0],
+                'to_station_name': STATION_NAMES[context['to_station']],
+                'to_station_telecode': context['to_station'],
+                'train_no': train[1],
+            },
+            'queryLeftTicketRequestDTO': {
+                'arrive_time': '',
+                'bigger20': 'Y',
+                'from_station': context['from_station'],
+                'from_station_name': STATION_NAMES[context['from_station']],
+                'purpose_codes': '00',
+                'station_train_code': train[0],
+                'to_station': context['to_station'],
+                'to_station_name': STATION_NAMES[context['to_station']],
+                'train_date': context['train_date'].replace('-', ''),
+                'train_no': train[1],
+                'ypInfoDetail': left_ticket_str,
+            },
+            'tour_flag': 'dc',
+            'train_location': 'P2',
+        }
+        self.session.left_ticket_str = left_ticket_str
+        self.session.key_check_is_change = key_check_is_change
+
+        def js_literal(data):
+            return json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('"', "'")
+
+        html = INIT_DC_HTML % {
+            'token': self.session.token,
+            'name': PASSENGERS[0]['passenger_name'],
+            'ticket_info': js_literal(ticket_info),
+            'order_request': js_literal(order_request),
+            'filler': FILLER_HTML,
+        }
+        self._reply(200, html, 'text/html')
+
+    def handle_check_order_info(self):
+        if not self._check_token():
+            return
+        if not self.params.get('passengerTicketStr'):
+            return self._ok({'submitStatus': False, 'errMsg': u'请选择乘客'})
+
+        self._ok({
+            'ifShowPassCode': 'N',
+            'canChooseBeds': 'N',
+            'canChooseSeats': 'Y',
+            'choose_Seats': 'OM9',
+            'isCanChooseMid': 'N',
+            'ifShowPassCodeTime': '1',
+            'submitStatus': True,
+            'smokeStr': '',
+        })
+
+    def handle_get_queue_count(self):
+        if not self._check_token():
+            return
+        self._ok({'count': '0', 'ticket': '21,0', 'op_2': 'false', 'countT': '0', 'op_1': 'false'})
+
+    def handle_confirm_single_for_queue(self):
+        if not self._check_token():
+            return
+        if self.params.get('key_check_isChange') != getattr(self.session, 'key_check_is_change', None):
+            return self._ok({'submitStatus': False, 'errMsg': u'车票信息已过期，请重新查询最新车票信息'})
+
+        order_id = 'E%09d' % self.mock.rng.randint(0, 999999999)
+        with self.mock.lock:
+            self.session.pending[self.session.token] = {
+                'order_id': order_id,
+                'ready_at': time.time() + self.mock.queue_wait,
+                'context': dict(self.session.order_context),
+            }
+        self._ok({'isAsync': '1', 'submitStatus': True})
+
+    def handle_query_order_wait_time(self):
+        pending = self.session.pending.get(self.params.get('REPEAT_SUBMIT_TOKEN'))
+        if pending is None:
+            return self._ok({'queryOrderWaitTimeStatus': True, 'count': 0, 'waitTime': -2, 'requestId': None,
+                             'waitCount': 0, 'tourFlag': 'dc', 'orderId': None,
+                             'msg': u'没有排队中的订单'})
+
+        remaining = pending['ready_at'] - time.time()
+        if remaining > 0:
+            return self._ok({'queryOrderWaitTimeStatus': True, 'count': 0,
+                             'waitTime': int(math.ceil(remaining)), 'requestId': 6512345678901234567,
+                             'waitCount': 1, 'tourFlag': 'dc', 'orderId': None})
+
+        with self.mock.lock:
+            if pending not in self.session.orders:
+                self.session.orders.append(pending)
+        self._ok({'queryOrderWaitTimeStatus': True, 'count': 0, 'waitTime': -1, 'requestId': 6512345678901234567,
+                  'waitCount': 0, 'tourFlag': 'dc', 'orderId': pending['order_id']})
+
+    def handle_result_order(self):
+        if not self._check_token():
+            return
+        self._ok({'submitStatus': True})
+
+    def _order_dto(self, order):
+        context = order['context']
+        train = TRAIN_BY_NO[context['train_no']]
+        return {
+            'sequence_no': order['order_id'],
+            'order_date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'ticket_totalnum': 1,
+            'ticket_price_all': 55300.0,
+            'cancel_flag': 'Y',
+            'resign_flag': '4',
+            'return_flag': 'N',
+            'print_eticket_flag': 'N',
+            'pay_flag': 'Y',
+            'pay_resign_flag': 'N',
+            'confirm_flag': 'N',
+            'train_code_page': train[0],
+            'from_station_name_page': [STATION_NAMES[context['from_station']]],
+            'to_station_name_page': [STATION_NAMES[context['to_station']]],
+            'start_train_date_page': context['train_date'],
+            'array_passser_name_page': [PASSENGERS[0]['passenger_name']],
+            'tickets': [],
+        }
+
+    def handle_query_my_order(self):
+        orders = [self._order_dto(order) for order in self.session.orders]
+        self._ok({'OrderDTODataList': orders, 'order_total_number': str(len(orders))})
+
+    def handle_query_my_order_no_complete(self):
+        orders = [self._order_dto(order) for order in self.session.orders]
+        self._ok({'orderDBList': orders, 'to_page': 'db'} if orders else {'to_page': 'db'})
+
+    # 用户
+
+    def handle_passengers(self):
+        self._ok({'notify_for_gat': '', 'isExist': True, 'exMsg': '', 'two_isOpenClick': ['93', '95', '97', '99'],
+                  'other_isOpenClick': ['91', '93', '98', '99', '95', '97'], 'normal_passengers': PASSENGERS,
+                  'dj_passengers': []})
+
+    def handle_user_info(self):
+        passenger = PASSENGERS[0]
+        self._ok({
+            'userTypeName': u'成人',
+            'picFlag': 'N',
+            'canUpload': True,
+            'userPassword': '',
+            'isMobileCheck': 'Y',
+            'country_name': u'中国CHINA',
+            'bornDateString': passenger['born_date'][:10],
+            'userDTO': {
+                'loginUserDTO': {
+                    'user_name': 'zhangsan',
+                    'name': passenger['passenger_name'],
+                    'id_type_code': passenger['passenger_id_type_code'],
+                    'id_type_name': passenger['passenger_id_type_name'],
+                    'id_no': passenger['passenger_id_no'],
+                    'member_id': '1234567890',
+                    'member_level': '1',
+                },
+                'country_code': 'CN',
+                'sex_code': passenger['sex_code'],
+                'mobile_no': passenger['mobile_no'],
+                'email': passenger['email'],
+                'address': '',
+                'is_active': 'Y',
+                'user_id': 1234567890,
+                'user_status': '1',
+                'is_valid': 'Y',
+                'needModifyEmail': 'N',
+            },
+        })
+
+    def handle_addresses(self):
+        self._ok({'addresses': [{'addressee_name': PASSENGERS[0]['passenger_name'], 'mobile_no': '13800138000',
+                                 'addressee_province': u'北京', 'addressee_city': u'北京市',
+                                 'addressee_county': u'海淀区', 'detail_address': u'复兴路10号',
+                                 'default_address': '0'}]})
+
+    def handle_member_info(self):
+        self._ok({'memberLevel': '1', 'memberLevelName': u'普通会员', 'usablePoint': 1200, 'totalPoint': 1500})
+
+    def handle_member_point(self):
+        self._ok({'usablePoint': 1200, 'frozenPoint': 0, 'expirePoint': 0})
+
+    def handle_member_point_history(self):
+        self._ok({'pointList': [], 'totalCount': 0})
+
+    # 支付
+
+    def handle_continue_pay(self):
+        self._ok({'existError': 'N'})
+
+    def handle_pay_init(self):
+        self._reply(200, HTML_PAGE % (u'中国铁路12306', u'<div id="payOrder">%s</div>' % FILLER_HTML),
+                    'text/html')
+
+    def handle_pay_check_new(self):
+        order = self.session.orders[-1] if self.session.orders else None
+        now = datetime.datetime.now()
+        tran_data = TRAN_DATA_XML % {
+            'order_date': now.strftime('%Y%m%d%H%M%S'),
+            'order_timeout_date': (now + datetime.timedelta(minutes=30)).strftime('%Y%m%d%H%M%S'),
+            'order_id': order['order_id'] if order else 'E000000000',
+            'amount': 55300,
+        }
+        self._ok({
+            'flag': True,
+            'payForm': {
+                'tranData': base64.b64encode(tran_data.encode('utf8')),
+                'merSignMsg': base64.b64encode(uuid.uuid4().bytes * 8),
+                'transType': '01',
+                'channelId': '1',
+                'appId': '0001',
+                'merCustomIp': self.client_address[0],
+                'orderTimeoutDate': (now + datetime.timedelta(minutes=30)).strftime('%Y%m%d%H%M%S'),
+                'paymentType': '0',
+                'bankId': '',
+                'businessType': '1',
+                'interfaceName': 'PAY_SERVLET',
+                'interfaceVersion': 'PAY_SERVLET',
+                'epayurl': 'https://epay.12306.cn/pay/payGateway',
+            },
+        })
+
+    def handle_pay_gateway(self):
+        self._reply(200, HTML_PAGE % (u'中国铁路网络支付平台', u'<div id="bank_list">%s</div>' % FILLER_HTML),
+                    'text/html')
+
+    def handle_web_business(self):
+        bank_id = self.params.get('bankId', '')
+        if not bank_id.isdigit():
+            return self._reply(200, HTML_PAGE % (u'中国铁路网络支付平台', u'交易失败'), 'text/html')
+
+        form = (u'<form action="https://pay.example.com/gateway/%s" method="post" name="myform">'
+                u'<input type="hidden" name="orderId" value="%s"/>'
+                u'<input type="hidden" name="amount" value="553.00"/>'
+                u'<input type="hidden" name="sign" value="%s"/>'
+                u'</form><script>document.myform.submit();</script>') % (bank_id, uuid.uuid4().hex, uuid.uuid4().hex)
+        self._reply(200, HTML_PAGE % (u'中国铁路网络支付平台', form), 'text/html')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local 12306 stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8306)
+    parser.add_argument('--latency', type=float, default=0, help='median latency in seconds (lognormal)')
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    parser.add_argument('--session-ttl', type=float, default=None)
+    parser.add_argument('--queue-wait', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockTrainServer(
+        host=args.host, port=args.port,
+        latency=lognormal_latency(args.latency, args.latency_sigma) if args.latency else None,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, session_ttl=args.session_ttl,
+        queue_wait=args.queue_wait, seed=args.seed)
+    print 'mock 12306 server listening on %s' % server.base_url
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
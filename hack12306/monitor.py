@@ -0,0 +1,251 @@
+# encoding: utf8
+"""
+monitor.py
+@author Meng.yangyang
+@description Adaptive left ticket polling with change detection
+@created Sun Oct 18 2026 14:32:08 GMT+0800 (CST)
+"""
+
+import time
+import Queue
+import random
+import logging
+import datetime
+import threading
+import collections
+
+from . import settings
+from . import constants
+from .query import TrainInfoQueryAPI, train_check_seat_type_have_ticket
+from .scheduler import Scheduler
+
+__all__ = ('LeftTicketMonitor', 'LeftTicketWatch', 'TicketChangeEvent',)
+
+_logger = logging.getLogger('hack12306')
+
+TicketChangeEvent = collections.namedtuple(
+    'TicketChangeEvent', ['watch', 'train_num', 'train_name', 'seat_type', 'have_ticket', 'left_ticket', 'train',
+                          'timestamp'])
+
+SEAT_TYPES = (
+    constants.SEAT_TYPE_BUSINESS_SEAT,
+    constants.SEAT_TYPE_FIRST_SEAT,
+    constants.SEAT_TYPE_SECONDE_SEAT,
+    constants.SEAT_TYPE_SOFT_SLEEPER_SEAT,
+    constants.SEAT_TYPE_HARD_SLEEPER_SEAT,
+    constants.SEAT_TYPE_SOFT_SEAT,
+    constants.SEAT_TYPE_HARD_SEAT,
+    constants.SEAT_TYPE_NO_SEAT,
+)
+
+
+class LeftTicketWatch(object):
+    """
+    余票监控项。保存上次查询的余票状态，只在车次席别有票/无票状态变化时产生事件。
+
+    轮询间隔：
+    1. 按距离发车日期在 [min_interval, max_interval] 之间线性取值，临近发车轮询更频繁；
+    2. 按余票状态变化频率（指数移动平均）缩短间隔，变化越频繁轮询越频繁；
+    3. 查询失败时指数退避，最长 max_interval。
+    """
+
+    # 发车日期超过该天数时使用 max_interval
+    horizon_days = 15
+
+    # 变化频率的指数移动平均系数
+    volatility_alpha = 0.3
+
+    # 轮询间隔随机抖动比例，避免大量监控项同时查询
+    jitter = 0.1
+
+    def __init__(self, train_date, from_station, to_station, seat_types=None, train_names=None,
+                 purpose_codes='ADULT', callback=None, min_interval=None, max_interval=None):
+        """
+        :param train_date 乘车日期，格式 YYYY-mm-dd
+        :param from_station 出发站电报码
+        :param to_station 到达站电报码
+        :param seat_types 监控的席别列表，默认全部席别
+        :param train_names 监控的车次列表，如 ['G1', 'G101']，默认全部车次
+        :param purpose_codes 乘客类型
+        :param callback 事件回调 callback(events)，默认放入 LeftTicketMonitor 的事件队列
+        :param min_interval 最短轮询间隔（秒），默认 settings.MONITOR_MIN_INTERVAL
+        :param max_interval 最长轮询间隔（秒），默认 settings.MONITOR_MAX_INTERVAL
+        """
+        self.train_date = train_date
+        self.from_station = from_station
+        self.to_station = to_station
+        self.seat_types = tuple(seat_types or SEAT_TYPES)
+        self.train_names = set(train_names) if train_names else None
+        self.purpose_codes = purpose_codes
+        self.callback = callback
+        self.min_interval = min_interval or settings.MONITOR_MIN_INTERVAL
+        self.max_interval = max_interval or settings.MONITOR_MAX_INTERVAL
+
+        self.state = {}
+        self.volatility = 0.0
+        self.interval = self.min_interval
+        self.polls = 0
+        self.events = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_poll = None
+        self.task = None
+
+    def __repr__(self):
+        return '<LeftTicketWatch %s %s-%s interval:%.1f>' % (
+            self.train_date, self.from_station, self.to_station, self.interval)
+
+    def diff(self, trains, now=None):
+        """
+        对比余票查询结果，更新状态
+        :param trains 余票查询结果
+        :return 变化事件列表
+        """
+        now = now or time.time()
+        events = []
+        state = {}
+        for train in trains:
+            train_name = train['train_name']
+            if self.train_names is not None and train_name not in self.train_names:
+                continue
+
+            train_num = train['train_num']
+            for seat_type in self.seat_types:
+                left_ticket = train.get(seat_type)
+                have_ticket = train_check_seat_type_have_ticket(left_ticket)
+                key = (train_num, seat_type)
+                state[key] = (have_ticket, train_name)
+                if self.state.get(key, (False,))[0] != have_ticket:
+                    events.append(TicketChangeEvent(self, train_num, train_name, seat_type, have_ticket,
+                                                    left_ticket, train, now))
+
+        # 车次从查询结果中消失视为无票
+        for key, (have_ticket, train_name) in self.state.iteritems():
+            if have_ticket and key not in state:
+                events.append(TicketChangeEvent(self, key[0], train_name, key[1], False, None, None, now))
+
+        self.state = state
+        self.polls += 1
+        self.events += len(events)
+        self.volatility = self.volatility_alpha * (1.0 if events else 0.0) + \
+            (1 - self.volatility_alpha) * self.volatility
+        return events
+
+    def base_interval(self, today=None):
+        """
+        按距离发车日期计算的轮询间隔
+        """
+        today = today or datetime.date.today()
+        train_date = datetime.datetime.strptime(self.train_date, '%Y-%m-%d').date()
+        days = min(max((train_date - today).days, 0), self.horizon_days)
+        return self.min_interval + (self.max_interval - self.min_interval) * days / float(self.horizon_days)
+
+    def next_interval(self, error=False, today=None):
+        """
+        计算下次轮询间隔
+        """
+        if error:
+            self.consecutive_errors += 1
+            interval = min(self.base_interval(today) * 2 ** self.consecutive_errors, self.max_interval)
+        else:
+            self.consecutive_errors = 0
+            interval = self.base_interval(today) * (1 - self.volatility)
+
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class LeftTicketMonitor(object):
+    """
+    余票监控，在一个调度器上轮询多个监控项，只输出余票状态变化事件。
+
+        with LeftTicketMonitor() as monitor:
+            monitor.watch('2019-02-01', 'VNP', 'AOH', seat_types=[constants.SEAT_TYPE_SECONDE_SEAT])
+            for event in monitor.iter_events():
+                ...
+    """
+
+    def __init__(self, api=None, scheduler=None, compact=True):
+        """
+        :param api TrainInfoQueryAPI 实例
+        :param scheduler Scheduler 实例，默认创建独立的调度器
+        :param compact 是否使用紧凑的余票记录 LeftTicket
+        """
+        self.api = api or TrainInfoQueryAPI()
+        self.scheduler = scheduler or Scheduler()
+        self.compact = compact
+        self.queue = Queue.Queue()
+        self.watches = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.scheduler.start()
+        return self
+
+    def stop(self):
+        for watch in list(self.watches):
+            self.unwatch(watch)
+        self.scheduler.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def watch(self, train_date, from_station, to_station, **kwargs):
+        """
+        添加余票监控，参数同 LeftTicketWatch
+        :return LeftTicketWatch
+        """
+        watch = LeftTicketWatch(train_date, from_station, to_station, **kwargs)
+        with self._lock:
+            self.watches.append(watch)
+        watch.task = self.scheduler.schedule(lambda: self.poll(watch), name=repr(watch))
+        return watch
+
+    def unwatch(self, watch):
+        """
+        取消余票监控
+        """
+        with self._lock:
+            if watch in self.watches:
+                self.watches.remove(watch)
+        if watch.task:
+            watch.task.cancel()
+
+    def poll(self, watch):
+        """
+        查询一次余票并分发变化事件
+        :return 下次轮询间隔（秒）
+        """
+        watch.last_poll = time.time()
+        try:
+            trains = self.api.info_query_left_tickets(watch.train_date, watch.from_station, watch.to_station,
+                                                      watch.purpose_codes, compact=self.compact)
+        except Exception as e:
+            watch.errors += 1
+            interval = watch.next_interval(error=True)
+            _logger.warning('left ticket monitor poll error. %s next:%.1fs %s' % (watch, interval, e))
+            return interval
+
+        events = watch.diff(trains)
+        if events:
+            try:
+                (watch.callback or self.queue.put)(events)
+            except Exception as e:
+                _logger.exception('left ticket monitor callback error. %s %s' % (watch, e))
+        return watch.next_interval()
+
+    def iter_events(self, timeout=None):
+        """
+        遍历事件队列中的变化事件
+        :param timeout 等待超时（秒），None 表示一直等待
+        """
+        while True:
+            try:
+                events = self.queue.get(timeout=timeout) if timeout is not None else self.queue.get(True, 1e9)
+            except Queue.Empty:
+                return
+            for event in events:
+                yield event
@@ -10,15 +10,228 @@ import re
 import time
 import json
 import urllib
+import logging
 import datetime
+import threading
+import collections
 
+from concurrent import futures
+
+from . import settings
 from . import constants
 from . import exceptions
-from .base import TrainBaseAPI
-from .auth import check_login
-from .utils import time_cst_format, tomorrow
+from .base import TrainBaseAPI, _Request, _endpoint, _data, _data_item
+from .auth import check_login, login_trusted
+from .metrics import parse_timer
+from .scheduler import Scheduler
+from .utils import time_cst_format, tomorrow, gen_passenger_ticket_tuple, gen_old_passenge_tuple
+
+__all__ = ('TrainOrderAPI', 'BookingPipeline', 'BookingResult', 'OrderQueueWatcher', 'QueueWaitResult',)
+
+_logger = logging.getLogger('hack12306')
+
+BookingResult = collections.namedtuple('BookingResult', ['order_id', 'token', 'timings', 'elapsed', 'queue_polls'])
+
+QueueWaitResult = collections.namedtuple('QueueWaitResult', ['order_id', 'token', 'cookies', 'elapsed', 'polls',
+                                                             'result'])
+
+
+_JS_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        ([{}\[\],:])                              # 1 标点
+        |'([^'\\]*(?:\\.[^'\\]*)*)'               # 2 单引号字符串
+        |"([^"\\]*(?:\\.[^"\\]*)*)"               # 3 双引号字符串
+        |(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)       # 4 数字
+        |([A-Za-z_$][\w$]*)                       # 5 标识符
+    )""", re.VERBOSE | re.DOTALL)
+
+_JS_ESCAPE_PATTERN = re.compile(r'\\(u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|.)', re.DOTALL)
+
+_JS_ESCAPES = {'n': u'\n', 't': u'\t', 'r': u'\r', 'b': u'\b', 'f': u'\f', 'v': u'\v', '0': u'\0'}
+
+_JS_CONSTANTS = {'null': None, 'undefined': None, 'true': True, 'false': False}
+
+_INIT_DC_VAR_PATTERN = re.compile(r'var (globalRepeatSubmitToken|ticketInfoForPassengerForm|orderRequestDTO)\s*=')
+
+_INIT_DC_FIELDS = {
+    'globalRepeatSubmitToken': 'token',
+    'ticketInfoForPassengerForm': 'ticket_info',
+    'orderRequestDTO': 'order_request_params',
+}
+
+
+class _Incomplete(Exception):
+    """
+    JS 字面量不完整，需要读取更多数据
+    """
+
+
+def _js_unescape(m):
+    c = m.group(1)
+    if c[0] in 'ux' and len(c) > 1:
+        return unichr(int(c[1:], 16))
+    return _JS_ESCAPES.get(c, c)
+
+
+def _js_string(s):
+    s = s.decode('utf8') if isinstance(s, str) else s
+    if '\\' in s:
+        s = _JS_ESCAPE_PATTERN.sub(_js_unescape, s)
+    return s
+
+
+def _parse_js_literal(buf, pos=0, eof=True):
+    """
+    解析 JS 字面量（对象、数组、字符串、数字、null/true/false），支持单引号字符串和不带引号的键
+    :param buf 数据
+    :param pos 开始位置
+    :param eof 数据是否已读取完毕，否则数据不完整时抛出 _Incomplete
+    :return (value, end)
+    """
+    def token(pos):
+        m = _JS_TOKEN_PATTERN.match(buf, pos)
+        if m is None or (not eof and m.end() == len(buf) and m.lastindex in (4, 5)):
+            if not eof:
+                raise _Incomplete()
+            raise ValueError('invalid js literal at %s' % pos)
+        return m
+
+    def value(m):
+        kind, text = m.lastindex, m.group(m.lastindex)
+        if kind in (2, 3):
+            return _js_string(text), m.end()
+        if kind == 4:
+            return (float(text) if ('.' in text or 'e' in text or 'E' in text) else int(text)), m.end()
+        if kind == 5:
+            if text not in _JS_CONSTANTS:
+                raise ValueError('unexpected identifier %s at %s' % (text, m.start(5)))
+            return _JS_CONSTANTS[text], m.end()
+
+        if text == '{':
+            obj = {}
+            m = token(m.end())
+            if m.group(1) == '}':
+                return obj, m.end()
+            while True:
+                if m.lastindex not in (2, 3, 5):
+                    raise ValueError('invalid object key at %s' % m.start())
+                key = _js_string(m.group(m.lastindex))
+                m = token(m.end())
+                if m.group(1) != ':':
+                    raise ValueError('expected : at %s' % m.start())
+                obj[key], end = value(token(m.end()))
+                m = token(end)
+                if m.group(1) == '}':
+                    return obj, m.end()
+                if m.group(1) != ',':
+                    raise ValueError('expected , or } at %s' % m.start())
+                m = token(m.end())
+
+        if text == '[':
+            arr = []
+            m = token(m.end())
+            if m.group(1) == ']':
+                return arr, m.end()
+            while True:
+                item, end = value(m)
+                arr.append(item)
+                m = token(end)
+                if m.group(1) == ']':
+                    return arr, m.end()
+                if m.group(1) != ',':
+                    raise ValueError('expected , or ] at %s' % m.start())
+                m = token(m.end())
+
+        raise ValueError('unexpected %s at %s' % (text, m.start()))
+
+    return value(token(pos))
+
+
+def _parse_confirm_passenger(chunks):
+    """
+    解析确认乘客页面 initDc，一次扫描提取 globalRepeatSubmitToken、ticketInfoForPassengerForm、orderRequestDTO，
+    全部找到后不再读取后续数据
+    :param chunks 页面内容，或页面内容分块迭代器
+    """
+    if isinstance(chunks, basestring):
+        chunks = [chunks]
+
+    result = {}
+    buf, pos, pending = '', 0, None
+    chunks = iter(chunks)
+    eof = False
+    while len(result) < len(_INIT_DC_FIELDS):
+        if pending is None:
+            m = _INIT_DC_VAR_PATTERN.search(buf, pos)
+            if m is not None:
+                pending = m
+            elif eof:
+                break
+            else:
+                # 保留末尾可能被截断的变量名
+                pos = max(pos, len(buf) - 64)
+
+        if pending is not None:
+            try:
+                value, end = _parse_js_literal(buf, pending.end(), eof)
+            except _Incomplete:
+                pass
+            else:
+                result.setdefault(_INIT_DC_FIELDS[pending.group(1)], value)
+                pos, pending = end, None
+                continue
+
+        if eof:
+            break
+        try:
+            buf = buf[pos:] + next(chunks)
+            if pending is not None:
+                pending = _INIT_DC_VAR_PATTERN.match(buf, pending.start() - pos)
+            pos = 0
+        except StopIteration:
+            eof = True
+
+    missing = [v for v in _INIT_DC_FIELDS.values() if v not in result]
+    if missing:
+        raise exceptions.TrainAPIException('invalid initDc page, missing %s' % ','.join(sorted(missing)))
+    return result
+
+
+def _release(resp):
+    """
+    释放流式响应。剩余数据不多时读完，连接可以放回连接池复用，否则直接关闭连接
+    """
+    try:
+        remaining = settings.INIT_DC_DRAIN_MAX_BYTES
+        for chunk in resp.iter_content(settings.INIT_DC_CHUNK_SIZE):
+            remaining -= len(chunk)
+            if remaining < 0:
+                break
+    except Exception as e:
+        _logger.debug('drain response error. %s' % e)
+    finally:
+        resp.close()
+
+
+def _parse_submit_order(resp):
+    if resp['httpstatus'] == 200 and resp['status'] is True:
+        return True
+    else:
+        raise exceptions.TrainAPIException('submit order error. %s' % json.dumps(resp, ensure_ascii=False))
+
+
+def _parse_init_dc(resp):
+    """
+    流式解析确认乘客页面，解析完成后释放响应
+    """
+    try:
+        if resp.status_code != 200:
+            raise exceptions.TrainRequestException()
 
-__all__ = ('TrainOrderAPI',)
+        with parse_timer('https://kyfw.12306.cn/otn/confirmPassenger/initDc', 'POST'):
+            return _parse_confirm_passenger(resp.iter_content(settings.INIT_DC_CHUNK_SIZE))
+    finally:
+        _release(resp)
 
 
 class TrainOrderAPI(TrainBaseAPI):
@@ -27,6 +240,7 @@ class TrainOrderAPI(TrainBaseAPI):
     """
 
     @check_login
+    @_endpoint
     def order_submit_order(self, secret_str, train_date, query_from_station_name=None, query_to_station_name=None,
                            purpose_codes='ADULT', tour_flag='dc', back_train_date=None, undefined=None,
                            **kwargs):
@@ -60,13 +274,10 @@ class TrainOrderAPI(TrainBaseAPI):
             'query_to_station_name': query_to_station_name or '',
             'undefined': undefined or ''
         }
-        resp = self.submit(url, params, method='POST', **kwargs)
-        if resp['httpstatus'] == 200 and resp['status'] is True:
-            return True
-        else:
-            raise exceptions.TrainAPIException('submit order error. %s' % json.dumps(resp, ensure_ascii=False))
+        return _Request(url, params, _parse_submit_order, method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def order_confirm_passenger(self, _json_att=None, **kwargs):
         """
         订单-下单-确认乘客初始化
@@ -77,27 +288,10 @@ class TrainOrderAPI(TrainBaseAPI):
         params = {
             '_json_att': _json_att or ''
         }
-        resp = self.submit(url, params, method='POST', parse_resp=False, **kwargs)
-        if resp.status_code != 200:
-            raise exceptions.TrainRequestException()
-
-        token_pattern = re.compile(r"var globalRepeatSubmitToken = '(\S+)'")
-        token = token_pattern.search(resp.content).group(1)
-
-        ticket_info_pattern = re.compile(r'var ticketInfoForPassengerForm=(\{.+\})?')
-        ticket_info = json.loads(ticket_info_pattern.search(resp.content).group(1).replace("'", '"'))
-
-        order_request_params_pattern = re.compile(r'var orderRequestDTO=(\{.+\})?')
-        order_request_params = json.loads(order_request_params_pattern.search(resp.content).group(1).replace("'", '"'))
-
-        resp = {
-            'token': token,
-            'ticket_info': ticket_info,
-            'order_request_params': order_request_params,
-        }
-        return resp
+        return _Request(url, params, _parse_init_dc, method='POST', parse_resp=False, stream=True, **kwargs)
 
     @check_login
+    @_endpoint
     def order_confirm_passenger_check_order(self, token, passenger_ticket_str, old_passenger_str, tour_flag='dc',
                                             cancel_flag=2, bed_level_order_num='000000000000000000000000000000',
                                             whatsSelect=1, _json_att=None, **kwargs):
@@ -127,10 +321,10 @@ class TrainOrderAPI(TrainBaseAPI):
             'REPEAT_SUBMIT_TOKEN': token
         }
 
-        resp = self.submit(url, params, method='POST', **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def order_confirm_passenger_get_queue_count(self, train_date, train_no, seat_type,
                                                 from_station_telecode, to_station_telecode, left_ticket,
                                                 token, station_train_code, purpose_codes, train_location,
@@ -168,10 +362,10 @@ class TrainOrderAPI(TrainBaseAPI):
             '_json_att': _json_att or '',
             'REPEAT_SUBMIT_TOKEN': token
         }
-        resp = self.submit(url, params, method='POST', **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def order_confirm_passenger_confirm_single_for_queue(self, passenger_ticket_str, old_passenger_str, purpose_codes,
                                                          key_check_isChange, left_ticket, train_location,
                                                          token, whats_select='1', dw_all='N', room_type=None, 
@@ -210,10 +404,10 @@ class TrainOrderAPI(TrainBaseAPI):
             '_json_att': _json_att or '',
             'REPEAT_SUBMIT_TOKEN': token
         }
-        resp = self.submit(url, params, method='POST', **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def order_confirm_passenger_query_order(self, token, tour_flag='dc', random=None, _json_att=None, **kwargs):
         """
         订单-下单-确认乘客，查询
@@ -231,10 +425,10 @@ class TrainOrderAPI(TrainBaseAPI):
             ('_json_att', _json_att or ''),
             ('REPEAT_SUBMIT_TOKEN', token),
         ]
-        resp = self.submit(url, params, method='GET', **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='GET', **kwargs)
 
     @check_login
+    @_endpoint
     def order_confirm_passenger_result_order(self, sequence_no, token, _json_att=None, **kwargs):
         """
         订单-下单-确认乘客，订单结果
@@ -248,10 +442,10 @@ class TrainOrderAPI(TrainBaseAPI):
             '_json_att': _json_att or '',
             'REPEAT_SUBMIT_TOKEN': token,
         }
-        resp = self.submit(url, params, method="POST", **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def order_query(self, start_date, end_date, type='1', sequeue_train_name='',
                     come_from_flag='my_order', query_where='G', **kwargs):
         """
@@ -281,23 +475,326 @@ class TrainOrderAPI(TrainBaseAPI):
             'queryEndDate': end_date,
             'queryType': type,
             'sequence_train_name': sequeue_train_name or '',
-            'pageIndex': kwargs.get('page_offset', 0),
-            'pageSize': kwargs.get('page_size', 8),
+            'pageIndex': kwargs.pop('page_offset', 0),
+            'pageSize': kwargs.pop('page_size', 8),
         }
-        resp = self.submit(url, params, method='POST', **kwargs)
-        if 'data' in resp and 'OrderDTODataList' in resp['data']:
-            return resp['data']['OrderDTODataList']
-        else:
-            return []
+        return _Request(url, params, _data_item('OrderDTODataList', list), method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def order_query_no_complete(self, **kwargs):
         """
         订单-未完成订单
         """
         url = 'https://kyfw.12306.cn/otn/queryOrder/queryMyOrderNoComplete'
-        resp = self.submit(url, method='POST', **kwargs)
-        if 'data' in resp and 'orderDBList' in resp['data']:
-            return resp['data']['orderDBList']
-        else:
-            return []
+        return _Request(url, handler=_data_item('orderDBList', list), method='POST', **kwargs)
+
+
+class BookingPipeline(object):
+    """
+    订票流水线，依次执行 提交订单 -> 确认乘客 -> 检查订单 -> 排队数量 -> 确认车票 -> 排队等待 -> 订单结果，
+    自动传递 REPEAT_SUBMIT_TOKEN 和 ticketInfoForPassengerForm 中的参数，并记录每一步的耗时。
+
+        pipeline = BookingPipeline(passengers, constants.SEAT_TYPE_SECONDE_SEAT, cookies)
+        result = pipeline.run(train['secret'], '2019-02-01')
+        print result.order_id, result.timings
+    """
+
+    steps = ('submit_order', 'confirm_passenger', 'check_order', 'get_queue_count',
+             'confirm_single_for_queue', 'query_order', 'result_order')
+
+    def __init__(self, passengers, seat_type, cookies, api=None, purpose_codes='ADULT',
+                 choose_seats=None, queue_timeout=None):
+        """
+        :param passengers 乘客列表，同 TrainUserAPI.user_passengers 返回值
+        :param seat_type 席别，如 constants.SEAT_TYPE_SECONDE_SEAT
+        :param cookies 用户 Session 信息
+        :param api TrainOrderAPI 实例
+        :param purpose_codes 乘客类型
+        :param choose_seats 选座，如 '1F'
+        :param queue_timeout 排队等待超时时间（秒），默认 settings.ORDER_QUEUE_TIMEOUT
+        """
+        assert passengers, 'passengers required'
+
+        self.seat_type_code = dict(constants.SEAT_TYPE_CODE_MAP)[seat_type]
+        self.cookies = cookies
+        self.api = api or TrainOrderAPI()
+        self.purpose_codes = purpose_codes
+        self.choose_seats = choose_seats
+        self.queue_timeout = queue_timeout or settings.ORDER_QUEUE_TIMEOUT
+        self.timings = collections.OrderedDict()
+
+        # 乘客信息字符串在抢票前生成
+        passenger_tickets, old_passengers = [], []
+        for passenger in passengers:
+            passenger_tickets.append(','.join(gen_passenger_ticket_tuple(
+                self.seat_type_code, passenger['passenger_flag'], passenger['passenger_type'],
+                passenger['passenger_name'], passenger['passenger_id_type_code'], passenger['passenger_id_no'],
+                passenger['mobile_no'])))
+            old_passengers.append(','.join(gen_old_passenge_tuple(
+                passenger['passenger_name'], passenger['passenger_id_type_code'], passenger['passenger_id_no'],
+                passenger['passenger_type'])))
+        self.passenger_ticket_str = '_'.join(passenger_tickets)
+        self.old_passenger_str = ''.join(old_passengers)
+
+    def _step(self, name, f, *args, **kwargs):
+        start = time.time()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.time() - start
+
+    def _wait_order_id(self, token):
+        deadline = time.time() + self.queue_timeout
+        polls = 0
+        while True:
+            polls += 1
+            result = self.api.order_confirm_passenger_query_order(token, cookies=self.cookies)
+            if result.get('orderId'):
+                return result['orderId'], polls
+
+            wait_time = result.get('waitTime')
+            if wait_time in (-2, -3) or result.get('queryOrderWaitTimeStatus') is False:
+                raise exceptions.TrainAPIException(
+                    'query order wait time error. %s' % json.dumps(result, ensure_ascii=False))
+
+            now = time.time()
+            if now >= deadline:
+                raise exceptions.TrainAPIException('query order wait time timeout. polls:%s' % polls)
+
+            # 按服务端返回的等待时间决定下次查询时间
+            interval = min(max(wait_time or 0, settings.ORDER_QUEUE_MIN_POLL_INTERVAL),
+                           settings.ORDER_QUEUE_MAX_POLL_INTERVAL)
+            time.sleep(min(interval, deadline - now))
+
+    def submit(self, secret_str, train_date, **kwargs):
+        """
+        提交订单直到确认车票（进入排队），排队结果可以交给 OrderQueueWatcher 查询
+        :param secret_str 余票查询结果中的 secret
+        :param train_date 乘车日期，格式 YYYY-mm-dd
+        :param kwargs 透传给 order_submit_order 的参数
+        :return REPEAT_SUBMIT_TOKEN
+        """
+        api, cookies = self.api, self.cookies
+        self.timings = collections.OrderedDict()
+
+        # 流程内跳过重复的登录检查请求，接口返回未登录时仍会抛出 TrainUserNotLogin
+        with login_trusted():
+            self._step('submit_order', api.order_submit_order, secret_str, train_date,
+                       purpose_codes=self.purpose_codes, cookies=cookies, **kwargs)
+
+            confirm = self._step('confirm_passenger', api.order_confirm_passenger, cookies=cookies)
+            token, ticket_info = confirm['token'], confirm['ticket_info']
+            query_dto = ticket_info['queryLeftTicketRequestDTO']
+
+            result = self._step('check_order', api.order_confirm_passenger_check_order,
+                                token, self.passenger_ticket_str, self.old_passenger_str, cookies=cookies)
+            if not result.get('submitStatus'):
+                raise exceptions.TrainAPIException('check order error. %s' % result.get('errMsg', ''))
+
+            self._step('get_queue_count', api.order_confirm_passenger_get_queue_count,
+                       train_date, query_dto['train_no'], self.seat_type_code, query_dto['from_station'],
+                       query_dto['to_station'], ticket_info['leftTicketStr'], token,
+                       query_dto['station_train_code'], ticket_info['purpose_codes'],
+                       ticket_info['train_location'], cookies=cookies)
+
+            result = self._step('confirm_single_for_queue', api.order_confirm_passenger_confirm_single_for_queue,
+                                self.passenger_ticket_str, self.old_passenger_str, ticket_info['purpose_codes'],
+                                ticket_info['key_check_isChange'], ticket_info['leftTicketStr'],
+                                ticket_info['train_location'], token, choose_seats=self.choose_seats,
+                                cookies=cookies)
+            if not result.get('submitStatus'):
+                raise exceptions.TrainAPIException('confirm ticket error. %s' % result.get('errMsg', ''))
+
+        return token
+
+    def run(self, secret_str, train_date, **kwargs):
+        """
+        执行订票流程
+        :param secret_str 余票查询结果中的 secret
+        :param train_date 乘车日期，格式 YYYY-mm-dd
+        :param kwargs 透传给 order_submit_order 的参数
+        :return BookingResult
+        """
+        start = time.time()
+        token = self.submit(secret_str, train_date, **kwargs)
+
+        with login_trusted():
+            order_id, queue_polls = self._step('query_order', self._wait_order_id, token)
+            self._step('result_order', self.api.order_confirm_passenger_result_order, order_id, token,
+                       cookies=self.cookies)
+
+        elapsed = time.time() - start
+        _logger.info('booking pipeline done. order_id:%s elapsed:%.3fs timings:%s' % (
+            order_id, elapsed, ' '.join(['%s=%.3f' % (k, v) for k, v in self.timings.items()])))
+        return BookingResult(order_id, token, self.timings, elapsed, queue_polls)
+
+
+class _QueueWait(object):
+
+    def __init__(self, token, cookies, started):
+        self.token = token
+        self.cookies = cookies
+        self.started = started
+        self.deadline = None
+        self.polls = 0
+        self.errors = 0
+        self.future = futures.Future()
+        self.task = None
+
+
+class OrderQueueWatcher(object):
+    """
+    排队等待监控。确认车票后在一个调度器上轮询多个账号的 queryOrderWaitTime，不为每个订单占用线程：
+    1. 按服务端返回的 waitTime 决定下次查询时间；
+    2. 请求失败时单个订单指数退避，全部订单的失败率（指数移动平均）升高时统一放慢查询；
+    3. 拿到订单号后立即调用 resultOrderForDcQueue，记录从确认车票到拿到订单号的耗时。
+
+        with OrderQueueWatcher() as watcher:
+            future = watcher.watch(token, cookies)
+            result = future.result()
+            print result.order_id, result.elapsed
+    """
+
+    # 失败率的指数移动平均系数
+    pressure_alpha = 0.2
+
+    # 失败率为 1 时查询间隔放大倍数
+    pressure_factor = 4
+
+    # 耗时统计保留的最近订单数
+    stats_size = 1000
+
+    def __init__(self, api=None, scheduler=None, timeout=None):
+        """
+        :param api TrainOrderAPI 实例
+        :param scheduler Scheduler 实例，默认创建独立的调度器
+        :param timeout 排队等待超时时间（秒），默认 settings.ORDER_QUEUE_TIMEOUT
+        """
+        self.api = api or TrainOrderAPI()
+        self.scheduler = scheduler or Scheduler()
+        self.timeout = timeout or settings.ORDER_QUEUE_TIMEOUT
+        self.pressure = 0.0
+        self.elapsed = collections.deque(maxlen=self.stats_size)
+        self._waits = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.scheduler.start()
+        return self
+
+    def stop(self):
+        """
+        停止调度器，尚未拿到订单号的订单抛出 TrainAPIException
+        """
+        self.scheduler.stop()
+        with self._lock:
+            waits, self._waits = list(self._waits), set()
+        for wait in waits:
+            if not wait.future.done():
+                wait.future.set_exception(exceptions.TrainAPIException(
+                    'order queue watcher stopped. token:%s polls:%s' % (wait.token, wait.polls)))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def watch(self, token, cookies, started=None):
+        """
+        添加排队中的订单
+        :param token REPEAT_SUBMIT_TOKEN
+        :param cookies 用户 Session 信息
+        :param started 确认车票的时间，默认当前时间
+        :return concurrent.futures.Future，结果为 QueueWaitResult
+        """
+        wait = _QueueWait(token, cookies, started or time.time())
+        wait.deadline = wait.started + self.timeout
+        wait.future.set_running_or_notify_cancel()
+        with self._lock:
+            self._waits.add(wait)
+        wait.future.add_done_callback(lambda f: self._discard(wait))
+        wait.task = self.scheduler.schedule(lambda: self.poll(wait), name='queue-wait-%s' % token)
+        return wait.future
+
+    def _discard(self, wait):
+        with self._lock:
+            self._waits.discard(wait)
+
+    def _update_pressure(self, error):
+        with self._lock:
+            self.pressure = self.pressure_alpha * (1.0 if error else 0.0) + (1 - self.pressure_alpha) * self.pressure
+
+    def _next_delay(self, wait, wait_time=None):
+        delay = min(max(wait_time or 0, settings.ORDER_QUEUE_MIN_POLL_INTERVAL),
+                    settings.ORDER_QUEUE_MAX_POLL_INTERVAL)
+        delay *= 2 ** min(wait.errors, 5) * (1 + self.pressure_factor * self.pressure)
+        return min(delay, settings.ORDER_QUEUE_MAX_BACKOFF, max(wait.deadline - time.time(), 0))
+
+    def _finish(self, wait, order_id, result):
+        elapsed = time.time() - wait.started
+        with self._lock:
+            self.elapsed.append(elapsed)
+        wait.future.set_result(QueueWaitResult(order_id, wait.token, wait.cookies, elapsed, wait.polls, result))
+
+    def poll(self, wait):
+        """
+        查询一次排队状态
+        :return 下次查询延迟（秒），None 表示结束
+        """
+        if time.time() >= wait.deadline:
+            wait.future.set_exception(exceptions.TrainAPIException(
+                'query order wait time timeout. token:%s polls:%s' % (wait.token, wait.polls)))
+            return None
+
+        wait.polls += 1
+        try:
+            with login_trusted():
+                result = self.api.order_confirm_passenger_query_order(wait.token, cookies=wait.cookies)
+        except exceptions.TrainRequestException as e:
+            wait.errors += 1
+            self._update_pressure(True)
+            delay = self._next_delay(wait)
+            _logger.warning('query order wait time error. token:%s next:%.1fs %s' % (wait.token, delay, e))
+            return delay
+        except Exception as e:
+            wait.future.set_exception(e)
+            return None
+
+        wait.errors = 0
+        self._update_pressure(False)
+
+        order_id = result.get('orderId')
+        if order_id:
+            try:
+                with login_trusted():
+                    self.api.order_confirm_passenger_result_order(order_id, wait.token, cookies=wait.cookies)
+            except Exception as e:
+                _logger.warning('result order error. order_id:%s %s' % (order_id, e))
+            self._finish(wait, order_id, result)
+            return None
+
+        if result.get('waitTime') in (-2, -3) or result.get('queryOrderWaitTimeStatus') is False:
+            wait.future.set_exception(exceptions.TrainAPIException(
+                'query order wait time error. %s' % json.dumps(result, ensure_ascii=False)))
+            return None
+
+        return self._next_delay(wait, result.get('waitTime'))
+
+    def stats(self):
+        """
+        拿到订单号耗时统计
+        """
+        with self._lock:
+            elapsed = sorted(self.elapsed)
+        if not elapsed:
+            return {'orders': 0}
+        return {
+            'orders': len(elapsed),
+            'min': elapsed[0],
+            'max': elapsed[-1],
+            'mean': sum(elapsed) / len(elapsed),
+            'p50': elapsed[len(elapsed) // 2],
+            'p90': elapsed[min(int(len(elapsed) * 0.9), len(elapsed) - 1)],
+        }
@@ -7,7 +7,6 @@ pay.py
 """
 
 import re
-import copy
 import base64
 import logging
 
@@ -15,7 +14,7 @@ import BeautifulSoup
 
 from . import constants
 from . import exceptions
-from .base import TrainBaseAPI
+from .base import TrainBaseAPI, _Request, _endpoint, _data
 from .auth import check_login
 
 _logger = logging.getLogger('hack12306')
@@ -23,12 +22,99 @@ _logger = logging.getLogger('hack12306')
 __all__ = ('TrainPayAPI',)
 
 
+_TRAN_DATA_FIELDS = {
+    'interfaceVersion': 'interface_version',
+    'interfaceName': 'interface_name',
+    'orderDate': 'order_date',
+    'orderTimeoutDate': 'order_timeout_date',
+    'orderId': 'order_id',
+    'amount': 'amount',
+    'appId': 'app_id',
+    'curType': 'cur_type',
+    'merURL': 'mer_url',
+    'appURL': 'app_url',
+    'innerURL': 'inner_url',
+    'merVAR': 'mer_var',
+    'transType': 'trans_type',
+}
+
+_TRAN_DATA_TAG_PATTERN = re.compile(r'<(%s)>\s*([^<]*?)\s*</\1>' % '|'.join(_TRAN_DATA_FIELDS))
+
+
+def _parse_tran_data(tran_data):
+    """
+    解析支付表单 tranData，一次扫描提取全部字段
+    """
+    xml_data = base64.b64decode(tran_data)
+
+    # 一个正则交替匹配全部标签，找齐字段后停止扫描
+    result = {}
+    for m in _TRAN_DATA_TAG_PATTERN.finditer(xml_data):
+        result.setdefault(_TRAN_DATA_FIELDS[m.group(1)], m.group(2))
+        if len(result) == len(_TRAN_DATA_FIELDS):
+            break
+    else:
+        missing = [v for v in _TRAN_DATA_FIELDS.values() if v not in result]
+        raise exceptions.TrainAPIException('invalid tranData, missing %s' % ','.join(sorted(missing)))
+
+    return result
+
+
+def _parse_web_business(content):
+    """
+    解析交易响应中的第三方支付表单
+    """
+    params = []
+
+    soup = BeautifulSoup.BeautifulSOAP(content)
+    form = soup.find('form')
+
+    form_attr_dict = dict(form.attrs)
+    for e in form.findAll('input'):
+        e_attr_dict = dict(e.attrs)
+        params.append((e_attr_dict['name'], e_attr_dict['value']))
+
+    return form_attr_dict['action'], form_attr_dict['method'].upper(), dict(params)
+
+
+def _parse_content(resp):
+    if resp.status_code != 200:
+        raise exceptions.TrainRequestException()
+
+    return resp.content
+
+
+def _parse_pay_check(resp):
+    data = resp['data']
+    data['payForm']['tranDataParsed'] = _parse_tran_data(data['payForm']['tranData'])
+    return data
+
+
+def _parse_web_business_resp(resp):
+    _logger.info('pay web business resp. status_code: %s content:%s' % (resp.status_code, resp.content))
+
+    if resp.status_code != 200:
+        raise exceptions.TrainRequestException(str(resp))
+
+    failure_pattern = re.compile('交易失败')
+    if failure_pattern.search(resp.content):
+        raise exceptions.TrainAPIException(resp.content)
+
+    url, method, params = _parse_web_business(resp.content)
+    return {
+        'url': url,
+        'method': method,
+        'params': params,
+    }
+
+
 class TrainPayAPI(TrainBaseAPI):
     """
     支付
     """
 
     @check_login
+    @_endpoint
     def pay_no_complete_order(self, sequence_no, arrive_time_str=None, pay_flag='pay', **kwargs):
         """
         支付-未完成订单
@@ -42,9 +128,9 @@ class TrainPayAPI(TrainBaseAPI):
             'pay_flag': pay_flag,
             'arrive_time_str': arrive_time_str or ''
         }
-        resp = self.submit(url, params, method='POST', **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='POST', **kwargs)
 
+    @_endpoint
     def pay_init(self, **kwargs):
         """
         支付-订单支付初始化
@@ -52,77 +138,15 @@ class TrainPayAPI(TrainBaseAPI):
         """
         url = 'https://kyfw.12306.cn/otn/payOrder/init'
 
-        resp = self.submit(url,method='GET', parse_resp=False, **kwargs)
-        if resp.status_code != 200:
-            raise exceptions.TrainRequestException()
-
-        return resp.content
+        return _Request(url, handler=_parse_content, method='GET', parse_resp=False, **kwargs)
 
     @check_login
+    @_endpoint
     def pay_check_new(self, **kwargs):
         """
         支付-发起支付
         :return JSON对象
         """
-        def parse_form_tran_data(tran_data):
-            xml_data = base64.b64decode(tran_data)
-
-            # XML 解析失败，使用正则表达式代替
-            interface_version_pattern = re.compile(r'<interfaceVersion>([0-9, \.]+)</interfaceVersion>')
-            interface_version = interface_version_pattern.search(xml_data).group(1)
-
-            interface_name_pattern = re.compile(r'<interfaceName>(.+)</interfaceName>')
-            interface_name = interface_name_pattern.search(xml_data).group(1)
-
-            order_date_pattern = re.compile(r'<orderDate>(.+)</orderDate>')
-            order_date = order_date_pattern.search(xml_data).group(1)
-
-            order_timeout_date_pattern = re.compile(r'<orderTimeoutDate>(.+)</orderTimeoutDate>')
-            order_timeout_date = order_timeout_date_pattern.search(xml_data).group(1)
-
-            order_id_pattern = re.compile(r'<orderId>(.+)</orderId>')
-            order_id = order_id_pattern.search(xml_data).group(1)
-
-            amount_pattern = re.compile(r'<amount>(\d+)</amount>')
-            amount = amount_pattern.search(xml_data).group(1)
-
-            app_id_pattern = re.compile(r'<appId>(\d+)</appId>')
-            app_id = app_id_pattern.search(xml_data).group(1)
-
-            cur_type_pattern = re.compile(r'<curType>(\d+)</curType>')
-            cur_type = cur_type_pattern.search(xml_data).group(1)
-
-            mer_url_pattern = re.compile(r'<merURL>(.+)</merURL>', re.DOTALL)
-            mer_url = mer_url_pattern.search(xml_data).group(1)
-
-            app_url_pattern = re.compile(r'<appURL>(.+)</appURL>', re.DOTALL)
-            app_url = app_url_pattern.search(xml_data).group(1)
-
-            inner_url_pattern = re.compile(r'<innerURL>(.+)</innerURL>', re.DOTALL)
-            inner_url = inner_url_pattern.search(xml_data).group(1)
-
-            mer_var_pattern = re.compile(r'<merVAR>(.+)</merVAR>', re.DOTALL)
-            mer_var = mer_var_pattern.search(xml_data).group(1)
-
-            trans_type_pattern = re.compile(r'<transType>(\d+)</transType>')
-            trans_type = trans_type_pattern.search(xml_data).group(1)
-
-            return {
-                'interface_version': interface_version,
-                'interface_name': interface_name,
-                'order_date': order_date,
-                'order_timeout_date': order_timeout_date,
-                'order_id': order_id,
-                'amount': amount,
-                'app_id': app_id,
-                'cur_type': cur_type,
-                'mer_url': mer_url,
-                'app_url': app_url,
-                'inner_url': inner_url,
-                'mer_var': mer_var,
-                'trans_type': trans_type
-            }
-
         url = 'https://kyfw.12306.cn/otn/payOrder/paycheckNew'
         params = {
             'batch_nos': kwargs.pop('batch_nos', ''),
@@ -136,13 +160,10 @@ class TrainPayAPI(TrainBaseAPI):
             'hasBoughtIns': kwargs.pop('hasBoughtIns', ''),
             '_json_att': kwargs.pop('_json_att', '')
         }
-        resp = self.submit(url, params, method="POST", **kwargs)
-
-        data = copy.deepcopy(resp['data'])
-        data['payForm']['tranDataParsed'] = parse_form_tran_data(data['payForm']['tranData'])
-        return data
+        return _Request(url, params, _parse_pay_check, method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def pay_gateway(self, trans_data, sign_msg, trans_type='01',  app_id='0001', interface_name='PAY_SERVLET', interface_version='PAY_SERVLET', **kwargs):
         """
         支付-收银台
@@ -164,14 +185,11 @@ class TrainPayAPI(TrainBaseAPI):
             'appId': app_id,
             'transType': trans_type
         }
-        resp = self.submit(url, params, method='POST', parse_resp=False, **kwargs)
-        if resp.status_code != 200:
-            raise exceptions.TrainRequestException()
-
         # TODO 解析收银台 HTML 响应报文
-        return resp.content
+        return _Request(url, params, _parse_content, method='POST', parse_resp=False, **kwargs)
 
     @check_login
+    @_endpoint
     def pay_web_business(self, tran_data, sign_msg, trans_type, custom_ip, order_timeout_date,
                          bank_id, channel_id='1', business_type="1", payment_type='0', app_id='0001', **kwargs):
         """
@@ -187,19 +205,6 @@ class TrainPayAPI(TrainBaseAPI):
         :param payment_type
         :param app_id
         """
-        def parse_resp(content):
-            params = []
-
-            soup = BeautifulSoup.BeautifulSOAP(content)
-            form = soup.find('form')
-
-            form_attr_dict = dict(form.attrs)
-            for e in form.findAll('input'):
-                e_attr_dict = dict(e.attrs)
-                params.append((e_attr_dict['name'], e_attr_dict['value']))
-
-            return form_attr_dict['action'], form_attr_dict['method'].upper(), dict(params)
-
         url = 'https://epay.12306.cn/pay/webBusiness'
         params = {
             'tranData': tran_data,
@@ -213,19 +218,4 @@ class TrainPayAPI(TrainBaseAPI):
             'bankId': bank_id,
             'businessType': business_type
         }
-        resp = self.submit(url, params, method='POST', parse_resp=False, **kwargs)
-        _logger.info('pay web business resp. status_code: %s content:%s' % (resp.status_code, resp.content))
-
-        if resp.status_code != 200:
-            raise exceptions.TrainRequestException(str(resp))
-
-        failure_pattern = re.compile('交易失败')
-        if failure_pattern.search(resp.content):
-            raise exceptions.TrainAPIException(resp.content)
-
-        url, method, params = parse_resp(resp.content)
-        return {
-            'url': url,
-            'method': method,
-            'params': params,
-        }
+        return _Request(url, params, _parse_web_business_resp, method='POST', parse_resp=False, **kwargs)
@@ -0,0 +1,207 @@
+# encoding: utf8
+"""
+policy.py
+@author Meng.yangyang
+@description Retry and hedged request policy for idempotent queries
+@created Sun Oct 18 2026 19:26:03 GMT+0800 (CST)
+"""
+
+import time
+import random
+import logging
+import threading
+import collections
+
+import requests
+from concurrent import futures
+
+from . import settings
+from . import exceptions
+
+__all__ = ('RequestPolicy', 'LatencyTracker', 'default_policy',)
+
+_logger = logging.getLogger('hack12306')
+
+
+class LatencyTracker(object):
+    """
+    按接口保存最近的请求耗时，用于计算分位数
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        """
+        :param window 每个接口保存的耗时样本数
+        :param min_samples 计算分位数需要的最少样本数
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, key, q):
+        """
+        :return 耗时分位数，样本不足时返回 None
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+class RequestPolicy(object):
+    """
+    幂等请求的重试与对冲策略。
+
+    1. 请求失败（TrainRequestException、连接错误、超时）时按指数退避加随机抖动重试，
+       接口返回的业务错误（TrainAPIException）和限流（TrainRateLimitException）不重试；
+    2. 开启对冲时，请求在该接口耗时的 hedge_quantile 分位数内没有返回则再发送一个相同请求，
+       使用先成功返回的响应，取消未开始的请求，已发出的请求在后台完成后丢弃。
+    """
+
+    def __init__(self, retries=None, backoff=None, max_backoff=None, hedge=None, hedge_quantile=None,
+                 hedge_delay=None, max_workers=None, latency=None):
+        """
+        :param retries 失败重试次数，默认 settings.QUERY_RETRIES
+        :param backoff 首次重试的退避时间（秒），默认 settings.QUERY_RETRY_BACKOFF
+        :param max_backoff 最长退避时间（秒），默认 settings.QUERY_RETRY_MAX_BACKOFF
+        :param hedge 是否发送对冲请求，默认 settings.QUERY_HEDGE
+        :param hedge_quantile 对冲延迟使用的耗时分位数，默认 settings.QUERY_HEDGE_QUANTILE
+        :param hedge_delay 耗时样本不足时的对冲延迟（秒），默认 settings.QUERY_HEDGE_DELAY
+        :param max_workers 对冲请求的线程数，默认 settings.QUERY_HEDGE_MAX_WORKERS
+        :param latency LatencyTracker 实例
+        """
+        self.retries = settings.QUERY_RETRIES if retries is None else retries
+        self.backoff = settings.QUERY_RETRY_BACKOFF if backoff is None else backoff
+        self.max_backoff = settings.QUERY_RETRY_MAX_BACKOFF if max_backoff is None else max_backoff
+        self.hedge = settings.QUERY_HEDGE if hedge is None else hedge
+        self.hedge_quantile = hedge_quantile or settings.QUERY_HEDGE_QUANTILE
+        self.hedge_delay = settings.QUERY_HEDGE_DELAY if hedge_delay is None else hedge_delay
+        self.max_workers = max_workers or settings.QUERY_HEDGE_MAX_WORKERS
+        self.latency = latency or LatencyTracker()
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def retryable(e):
+        if isinstance(e, exceptions.TrainRateLimitException):
+            return False
+        return isinstance(e, (exceptions.TrainRequestException, requests.RequestException))
+
+    def backoff_delay(self, attempt):
+        """
+        第 attempt 次重试前的退避时间，在 [0, backoff * 2 ** attempt] 内随机取值
+        """
+        return random.uniform(0, min(self.backoff * 2 ** attempt, self.max_backoff))
+
+    def delay_for(self, key):
+        """
+        对冲延迟
+        """
+        delay = self.latency.quantile(key, self.hedge_quantile)
+        return self.hedge_delay if delay is None else delay
+
+    def call(self, key, func):
+        """
+        按策略执行请求
+        :param key 接口标识，按接口统计耗时
+        :param func 发送请求的函数
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(key, func)
+            except Exception as e:
+                if attempt >= self.retries or not self.retryable(e):
+                    raise
+                delay = self.backoff_delay(attempt)
+                attempt += 1
+                self._count('retries')
+                _logger.warning('%s request error, retry %s after %.2fs. %s' % (key, attempt, delay, e))
+                time.sleep(delay)
+
+    def _timed(self, key, func):
+        start = time.time()
+        result = func()
+        self.latency.observe(key, time.time() - start)
+        return result
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _attempt(self, key, func):
+        self._count('attempts')
+        if not self.hedge:
+            return self._timed(key, func)
+
+        primary = self.executor.submit(self._timed, key, func)
+        try:
+            return primary.result(timeout=self.delay_for(key))
+        except futures.TimeoutError:
+            pass
+
+        self._count('hedges')
+        hedged = self.executor.submit(self._timed, key, func)
+        pending = [primary, hedged]
+        error = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    for p in pending:
+                        p.cancel()
+                    if f is hedged:
+                        self._count('hedge_wins')
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    def stats(self):
+        """
+        重试和对冲统计
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        for name in ('attempts', 'retries', 'hedges', 'hedge_wins'):
+            stats.setdefault(name, 0)
+        return stats
+
+
+_default_policy = None
+_default_policy_lock = threading.Lock()
+
+
+def default_policy():
+    """
+    进程内默认的信息查询请求策略，settings.QUERY_RETRIES 为 0 且未开启 settings.QUERY_HEDGE 时为 None
+    """
+    global _default_policy
+
+    if _default_policy is None and (settings.QUERY_RETRIES or settings.QUERY_HEDGE):
+        with _default_policy_lock:
+            if _default_policy is None:
+                _default_policy = RequestPolicy()
+    return _default_policy
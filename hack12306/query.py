@@ -7,17 +7,36 @@ query.py
 """
 
 import re
-import json
 import logging
+import operator
+import urlparse
+import collections
 
+import requests
+
+from concurrent import futures
+
+from . import settings
 from . import constants
 from . import exceptions
-from .base import TrainBaseAPI
+from .base import TrainBaseAPI, resolve_url, _params_str, _Request, _endpoint, _data, _data_item
+from .cache import default_resource_cache, cache_key
+from .codec import default_codec
+from .metrics import parse_timer
+from .policy import default_policy
+from .edge import default_edge_pool
+from .station import station_registry
 
-__all__ = ('TrainInfoQueryAPI', 'train_check_seat_type_have_ticket')
+__all__ = ('TrainInfoQueryAPI', 'LeftTicket', 'LeftTicketsResult', 'train_check_seat_type_have_ticket')
 
 _logger = logging.getLogger('hack12306')
 
+_LEFT_TICKETS_PATH = '/otn/leftTicket/query'
+
+
+LeftTicketsResult = collections.namedtuple(
+    'LeftTicketsResult', ['train_date', 'from_station', 'to_station', 'purpose_codes', 'trains', 'error'])
+
 
 def train_check_seat_type_have_ticket(left_ticket):
     """
@@ -29,13 +48,382 @@ def train_check_seat_type_have_ticket(left_ticket):
         return False
 
 
+_LEFT_TICKET_FIELDS = (
+    ('secret', 0),
+    ('remark', 1),
+    ('train_num', 2),
+    ('train_name', 3),
+    ('from_station', 4),
+    ('to_station', 5),
+    ('departure_time', 8),      # 出发时间
+    ('arrival_time', 9),        # 到达时间
+    ('duration', 10),           # 历时
+    (constants.SEAT_TYPE_BUSINESS_SEAT, 32),
+    (constants.SEAT_TYPE_FIRST_SEAT, 31),
+    (constants.SEAT_TYPE_SECONDE_SEAT, 30),
+    (constants.SEAT_TYPE_SOFT_SLEEPER_SEAT, 23),
+    (constants.SEAT_TYPE_HARD_SLEEPER_SEAT, 28),
+    (constants.SEAT_TYPE_SOFT_SEAT, 24),
+    (constants.SEAT_TYPE_HARD_SEAT, 29),
+    (constants.SEAT_TYPE_NO_SEAT, 26),
+)
+_LEFT_TICKET_FIELD_INDEX = dict(_LEFT_TICKET_FIELDS)
+
+# LeftTicket 缓存的列（不含 secret），按 _LEFT_TICKET_COLUMNS 中的位置访问
+_LEFT_TICKET_COLUMNS = tuple(sorted([index for _, index in _LEFT_TICKET_FIELDS if index]))
+_LEFT_TICKET_COLUMN_POS = dict([(index, pos) for pos, index in enumerate(_LEFT_TICKET_COLUMNS)])
+_pick_left_ticket_columns = operator.itemgetter(*_LEFT_TICKET_COLUMNS)
+
+
+def _left_ticket_column(index):
+    pos = _LEFT_TICKET_COLUMN_POS[index]
+    return property(lambda self: self.cols[pos])
+
+
+class LeftTicket(object):
+    """
+    余票记录，只保存余票查询返回的原始数据行，访问字段时才拆分解析。
+    支持按 dict 的键读取（如 ticket['train_name']、ticket[constants.SEAT_TYPE_SECONDE_SEAT]），
+    to_dict() 返回与 info_query_left_tickets 相同的 dict
+    """
+    __slots__ = ('raw', '_cols')
+
+    remark = _left_ticket_column(1)
+    train_num = _left_ticket_column(2)
+    train_name = _left_ticket_column(3)
+    from_station = _left_ticket_column(4)
+    to_station = _left_ticket_column(5)
+    departure_time = _left_ticket_column(8)
+    arrival_time = _left_ticket_column(9)
+    duration = _left_ticket_column(10)
+    soft_sleeper_seat = _left_ticket_column(23)
+    soft_seat = _left_ticket_column(24)
+    no_seat = _left_ticket_column(26)
+    hard_sleeper_seat = _left_ticket_column(28)
+    hard_seat = _left_ticket_column(29)
+    second_seat = _left_ticket_column(30)
+    first_seat = _left_ticket_column(31)
+    business_seat = _left_ticket_column(32)
+
+    def __init__(self, raw):
+        """
+        :param raw 余票查询返回的数据行，以“|”分隔
+        """
+        self.raw = raw
+        self._cols = None
+
+    @property
+    def secret(self):
+        return self.raw[:self.raw.index('|')]
+
+    @property
+    def cols(self):
+        if self._cols is None:
+            self._cols = _pick_left_ticket_columns(self.raw.split('|'))
+        return self._cols
+
+    def __getitem__(self, key):
+        index = _LEFT_TICKET_FIELD_INDEX[key]
+        if not index:
+            return self.secret
+        return self.cols[_LEFT_TICKET_COLUMN_POS[index]]
+
+    def __contains__(self, key):
+        return key in _LEFT_TICKET_FIELD_INDEX
+
+    def get(self, key, default=None):
+        if key not in _LEFT_TICKET_FIELD_INDEX:
+            return default
+        return self[key]
+
+    def keys(self):
+        return [key for key, _ in _LEFT_TICKET_FIELDS]
+
+    def have_ticket(self, seat_type):
+        """
+        席别是否有票
+        :param seat_type 席别，如 constants.SEAT_TYPE_SECONDE_SEAT
+        """
+        return train_check_seat_type_have_ticket(self[seat_type])
+
+    def to_dict(self):
+        return dict([(key, self[key]) for key, _ in _LEFT_TICKET_FIELDS])
+
+    def __repr__(self):
+        return '<LeftTicket %s %s-%s>' % (self.train_name, self.from_station, self.to_station)
+
+
+def _parse_left_tickets(resp, compact=False):
+    """
+    解析余票查询响应
+    :param compact 是否返回 LeftTicket 记录
+    """
+    if 'data' not in resp or 'result' not in resp['data']:
+        return []
+
+    if compact:
+        return {
+            'trains': [LeftTicket(train_s) for train_s in resp['data']['result']],
+            'map': resp['data']['map'],
+        }
+
+    trains = []
+    for train_s in resp['data']['result']:
+        train = train_s.split('|')
+        trains.append({
+            'secret': train[0],
+            'remark': train[1],
+            'train_num': train[2],
+            'train_name': train[3],
+            'from_station': train[4],
+            'to_station': train[5],
+            'departure_time': train[8],     # 出发时间
+            'arrival_time': train[9],       # 到达时间
+            'duration': train[10],          # 历时
+            constants.SEAT_TYPE_BUSINESS_SEAT: train[32],
+            constants.SEAT_TYPE_FIRST_SEAT: train[31],
+            constants.SEAT_TYPE_SECONDE_SEAT: train[30],
+            # constants.SEAT_TYPE_HIGH_SLEEPER_SEAT: '--',    # TODO 高级软卧
+            constants.SEAT_TYPE_SOFT_SLEEPER_SEAT: train[23],
+            constants.SEAT_TYPE_HARD_SLEEPER_SEAT: train[28],
+            constants.SEAT_TYPE_SOFT_SEAT: train[24],
+            constants.SEAT_TYPE_HARD_SEAT: train[29],
+            constants.SEAT_TYPE_NO_SEAT: train[26],
+        })
+    result = {
+        'trains': trains,
+        'map': resp['data']['map'],
+    }
+    return result
+
+
+def _parse_left_ticket_trains(resp, compact=False):
+    return _parse_left_tickets(resp, compact=compact)['trains']
+
+
+def _parse_stations(s):
+    """
+    解析车站列表 station_name.js
+    """
+    station_list = []
+
+    s = s.replace(';', '')
+    s = s.replace('var station_names =', '')
+
+    s_list = s.split('@')
+    s_list.pop(0)
+
+    for station in s_list:
+        station_tuple = tuple(station.split('|'))
+        station_list.append({
+            'name': station_tuple[1].decode('utf8'),
+            'short_name': unicode(station_tuple[0]),
+            'code': unicode(station_tuple[2]),
+            'english_name': unicode(station_tuple[3]),
+            'index': station_tuple[5]
+        })
+    return station_list
+
+
+_TRAIN_CODE_PATTERN = re.compile(r'([0-9,A-Z]+?)\((.*)\)')
+
+# train_list.js 结构：{"日期":{"车次类型":[{"station_train_code":"D1(北京-沈阳)","train_no":"24000000D10R"},...]}}
+_TRAIN_LIST_TOKEN_PATTERN = re.compile(
+    r'"(\d{4}-\d{2}-\d{2})"\s*:\s*\{'
+    r'|"(\w+)"\s*:\s*\['
+    r'|\{"station_train_code":"([^"]*)","train_no":"([^"]*)"\}'
+    r'|(\{[^{}\[\]]*\})')
+_TRAIN_LIST_MAX_TOKEN = 1024
+
+
+def _to_set(value):
+    if value is None:
+        return None
+    if isinstance(value, basestring):
+        return set([value])
+    return set(value)
+
+
+def _parse_train(station_train_code, train_no, train_date, train_class):
+    train_code_match = _TRAIN_CODE_PATTERN.match(station_train_code)
+    if not train_code_match:
+        _logger.warn('train code not match. %s' % station_train_code)
+        return None
+
+    m_groups = train_code_match.groups()
+    return {
+        'train_code': m_groups[0],
+        'from_station_name': m_groups[1].split('-')[0].strip().replace(' ', ''),
+        'to_station_name': m_groups[1].split('-')[1].strip().replace(' ', ''),
+        'train_no': train_no.strip().replace(' ', ''),
+        'train_date': train_date,
+        'train_class': train_class,
+    }
+
+
+def _iter_trains(chunks, train_date=None, train_class=None, loads=None):
+    """
+    流式解析车次列表 train_list.js
+    :param chunks 响应内容分块迭代器
+    :param train_date 只解析指定日期（或日期列表）的车次
+    :param train_class 只解析指定类型（或类型列表，如 G、D）的车次
+    :param loads 解析 JSON 的函数，默认使用 default_codec()
+    :return 车次迭代器
+    """
+    loads = loads or default_codec().loads
+    train_dates = _to_set(train_date)
+    train_classes = _to_set(train_class)
+
+    buf = ''
+    current_date = current_class = None
+    for chunk in chunks:
+        buf += chunk
+        end = 0
+        for m in _TRAIN_LIST_TOKEN_PATTERN.finditer(buf):
+            end = m.end()
+            date_key, class_key, station_train_code, train_no, train_obj = m.groups()
+            if date_key is not None:
+                current_date, current_class = date_key, None
+                continue
+            if class_key is not None:
+                current_class = class_key
+                continue
+
+            if train_dates is not None and current_date not in train_dates:
+                continue
+            if train_classes is not None and current_class not in train_classes:
+                continue
+
+            if train_obj is not None:
+                train_obj = loads(train_obj)
+                if 'station_train_code' not in train_obj or 'train_no' not in train_obj:
+                    continue
+                station_train_code, train_no = train_obj['station_train_code'], train_obj['train_no']
+            else:
+                station_train_code, train_no = station_train_code.decode('utf8'), train_no.decode('utf8')
+
+            train = _parse_train(station_train_code, train_no, current_date, current_class)
+            if train:
+                yield train
+
+        buf = buf[max(end, len(buf) - _TRAIN_LIST_MAX_TOKEN):]
+
+
+def _parse_trains(s, loads=None):
+    """
+    解析车次列表 train_list.js
+    """
+    return list(_iter_trains([s], loads=loads))
+
+
 class TrainInfoQueryAPI(TrainBaseAPI):
 
     """
     信息查询
     """
 
-    def _left_tickets(self, train_date, from_station, to_station, purpose_codes='ADULT', **kwargs):
+    def __init__(self, client=None, cache=None, resource_cache=None, rate_limiter=None, policy=None, edges=None,
+                 codec=None):
+        """
+        :param resource_cache 静态资源缓存 ResourceCache 实例，默认使用进程内共享的缓存，False 表示不缓存
+        :param policy GET 请求的重试与对冲策略 RequestPolicy 实例，默认使用进程内共享的策略，False 表示不重试
+        :param edges 余票查询使用的 CDN 节点池 EdgePool 实例，默认使用进程内共享的节点池，False 表示不使用
+        """
+        super(TrainInfoQueryAPI, self).__init__(client, cache, rate_limiter, codec)
+        self.resource_cache = default_resource_cache() if resource_cache is None else \
+            (None if resource_cache is False else resource_cache)
+        self.policy = default_policy() if policy is None else (None if policy is False else policy)
+        self.edges = default_edge_pool() if edges is None else (None if edges is False else edges)
+
+    def _call(self, url, func):
+        if self.policy is None:
+            return func()
+        return self.policy.call(urlparse.urlparse(url).path, func)
+
+    def submit(self, url, params=None, method='POST', **kwargs):
+        """
+        GET 请求按 self.policy 重试与对冲，流式下载不重试；指定 CDN 节点池时余票查询通过节点池请求
+        """
+        if self.edges is not None and method == 'GET' and urlparse.urlparse(url).path == _LEFT_TICKETS_PATH:
+            return self._call(url, lambda: self.edges.submit(url, params, method=method, rate_limiter=self.rate_limiter,
+                                                              codec=self.codec, **kwargs))
+
+        if self.policy is None or method != 'GET' or kwargs.get('stream'):
+            return super(TrainInfoQueryAPI, self).submit(url, params, method=method, **kwargs)
+
+        submit = super(TrainInfoQueryAPI, self).submit
+        return self._call(url, lambda: submit(url, params, method=method, **kwargs))
+
+    def _iter_resource(self, url, params=None, chunk_size=None, cache=True, **kwargs):
+        """
+        分块下载静态资源。有本地副本时发送条件请求，304 或网络失败时读取本地副本
+        :param cache 是否发送条件请求，False 时直接下载并更新本地副本
+        """
+        resource, key, meta = self._resource_request(url, params, cache, kwargs)
+        try:
+            resp = self.submit(url, params, method='GET', parse_resp=False, stream=True, **kwargs)
+        except requests.RequestException as e:
+            if not meta:
+                raise
+            _logger.warning('fetch %s error, use local copy. %s' % (url, e))
+            resp = None
+
+        chunks = self._resource_chunks(url, resp, resource, key, meta, chunk_size)
+        try:
+            for chunk in chunks:
+                yield chunk
+        finally:
+            chunks.close()
+
+    def _resource_request(self, url, params, cache, kwargs):
+        """
+        查询静态资源的本地副本，有副本时在 kwargs 的请求头中加入条件请求头
+        :return (资源地址, 缓存键, 本地副本信息)
+        """
+        resource_cache, key, meta = self.resource_cache, None, None
+        resource = resolve_url(url, getattr(self.client, 'base_url', None))
+        if resource_cache is not None:
+            key = cache_key('GET', resource, _params_str(params))
+            meta = resource_cache.meta(key)
+            if meta and cache:
+                headers = kwargs.pop('headers', {})
+                headers.update(resource_cache.validators(key))
+                kwargs['headers'] = headers
+        return resource, key, meta
+
+    def _resource_chunks(self, url, resp, resource, key, meta, chunk_size=None):
+        """
+        读取静态资源响应并更新本地副本，304 或请求失败（resp 为 None）时读取本地副本
+        """
+        chunk_size = chunk_size or settings.TRAIN_LIST_CHUNK_SIZE
+        resource_cache = self.resource_cache
+        try:
+            if resp is not None and resp.status_code == 200:
+                chunks = resp.iter_content(chunk_size)
+                if resource_cache is not None:
+                    chunks = resource_cache.store(key, chunks, resp.headers.get('ETag'),
+                                                  resp.headers.get('Last-Modified'), resource)
+                for chunk in chunks:
+                    yield chunk
+                return
+
+            if resp is not None and resp.status_code != 304:
+                if not meta or resp.status_code < 500:
+                    raise exceptions.TrainAPIException(str(resp))
+                _logger.warning('fetch %s error, use local copy. %s' % (url, resp))
+
+            for chunk in resource_cache.iter_content(key, chunk_size):
+                yield chunk
+        finally:
+            if resp is not None:
+                resp.close()
+
+    def _left_tickets(self, parse, train_date, from_station, to_station, purpose_codes='ADULT', compact=False,
+                      **kwargs):
+        """
+        余票查询请求
+        :param parse 响应处理函数 parse(resp, compact)
+        """
         date_pattern = re.compile('^[0-9]{4}-[0-9]{2}-[0-9]{2}$')
         assert date_pattern.match(train_date), 'Invalid train_date param. %s' % train_date
 
@@ -46,60 +434,76 @@ class TrainInfoQueryAPI(TrainBaseAPI):
             ('leftTicketDTO.to_station', to_station),
             ('purpose_codes', purpose_codes),
         ]
-        resp = self.submit(url, params, method='GET', **kwargs)
-        if 'data' not in resp or 'result' not in resp['data']:
-            return []
-
-        trains = []
-        for train_s in resp['data']['result']:
-            train = train_s.split('|')
-            trains.append({
-                'secret': train[0],
-                'remark': train[1],
-                'train_num': train[2],
-                'train_name': train[3],
-                'from_station': train[4],
-                'to_station': train[5],
-                'departure_time': train[8],     # 出发时间
-                'arrival_time': train[9],       # 到达时间
-                'duration': train[10],          # 历时
-                constants.SEAT_TYPE_BUSINESS_SEAT: train[32],
-                constants.SEAT_TYPE_FIRST_SEAT: train[31],
-                constants.SEAT_TYPE_SECONDE_SEAT: train[30],
-                # constants.SEAT_TYPE_HIGH_SLEEPER_SEAT: '--',    # TODO 高级软卧
-                constants.SEAT_TYPE_SOFT_SLEEPER_SEAT: train[23],
-                constants.SEAT_TYPE_HARD_SLEEPER_SEAT: train[28],
-                constants.SEAT_TYPE_SOFT_SEAT: train[24],
-                constants.SEAT_TYPE_HARD_SEAT: train[29],
-                constants.SEAT_TYPE_NO_SEAT: train[26],
-            })
-        result = {
-            'trains': trains,
-            'map': resp['data']['map'],
-        }
-        return result
+        return _Request(url, params, lambda resp: parse(resp, compact=compact), method='GET', **kwargs)
 
-    def info_query_left_tickets_v2(self, train_date, from_station, to_station, purpose_codes='ADULT', **kwargs):
+    @_endpoint
+    def info_query_left_tickets_v2(self, train_date, from_station, to_station, purpose_codes='ADULT', compact=False,
+                                   **kwargs):
         """
         信息查询-余票查询
         :param train_date 乘车日期
         :param from_station 出发站
         :param to_station 到达站
+        :param compact 是否返回 LeftTicket 记录代替 dict
         :return JSON 数组
         """
-        return self._left_tickets(train_date, from_station, to_station, purpose_codes=purpose_codes, **kwargs)
+        return self._left_tickets(_parse_left_tickets, train_date, from_station, to_station,
+                                  purpose_codes=purpose_codes, compact=compact, **kwargs)
 
-    def info_query_left_tickets(self, train_date, from_station, to_station, purpose_codes='ADULT', **kwargs):
+    @_endpoint
+    def info_query_left_tickets(self, train_date, from_station, to_station, purpose_codes='ADULT', compact=False,
+                                **kwargs):
         """
         信息查询-余票查询
         :param train_date 乘车日期
         :param from_station 出发站
         :param to_station 到达站
+        :param compact 是否返回 LeftTicket 记录代替 dict
         :return JSON 数组
         """
-        result =  self._left_tickets(train_date, from_station, to_station, purpose_codes=purpose_codes, **kwargs)
-        return result['trains']
+        return self._left_tickets(_parse_left_ticket_trains, train_date, from_station, to_station,
+                                  purpose_codes=purpose_codes, compact=compact, **kwargs)
 
+    def info_query_left_tickets_batch(self, queries, max_concurrency=None, purpose_codes='ADULT', **kwargs):
+        """
+        信息查询-批量余票查询，相同的查询只请求一次，按完成顺序返回结果
+        :param queries 查询列表，元素为 (train_date, from_station, to_station[, purpose_codes]) 元组
+        :param max_concurrency 最大并发查询数，默认为 settings.LEFT_TICKETS_BATCH_CONCURRENCY
+        :param purpose_codes 查询元组未指定时使用
+        :return LeftTicketsResult 迭代器，查询失败时 trains 为 None，error 为异常
+        """
+        query_keys = collections.OrderedDict()
+        for query in queries:
+            if len(query) == 3:
+                query = tuple(query) + (purpose_codes,)
+            query_keys[tuple(query)] = None
+
+        if not query_keys:
+            return
+
+        max_workers = min(max_concurrency or settings.LEFT_TICKETS_BATCH_CONCURRENCY, len(query_keys))
+        executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        fs = {}
+        try:
+            for key in query_keys:
+                train_date, from_station, to_station, key_purpose_codes = key
+                f = executor.submit(self.info_query_left_tickets, train_date, from_station, to_station,
+                                    purpose_codes=key_purpose_codes, **kwargs)
+                fs[f] = key
+
+            for f in futures.as_completed(fs):
+                error = f.exception()
+                if error is not None:
+                    _logger.warning('query left tickets error. %s %s' % (fs[f], error))
+                    yield LeftTicketsResult(*(fs[f] + (None, error)))
+                else:
+                    yield LeftTicketsResult(*(fs[f] + (f.result(), None)))
+        finally:
+            for f in fs:
+                f.cancel()
+            executor.shutdown(wait=False)
+
+    @_endpoint
     def info_query_station_trains(self, train_start_date, train_station_code, **kwargs):
         """
         信息查询-车站(车次)查询
@@ -115,10 +519,9 @@ class TrainInfoQueryAPI(TrainBaseAPI):
             'train_start_date': train_start_date,
             'train_station_code': train_station_code
         }
-        resp = self.submit(url, params, method='GET', **kwargs)
-        if 'data' in resp and 'data' in resp['data']:
-            return resp['data']['data']
+        return _Request(url, params, _data_item('data'), method='GET', **kwargs)
 
+    @_endpoint
     def info_query_train_no(self, train_no, from_station_telecode, to_station_telecode, depart_date, **kwargs):
         """
         信息查询-车次查询
@@ -138,12 +541,9 @@ class TrainInfoQueryAPI(TrainBaseAPI):
             ('to_station_telecode', to_station_telecode),
             ('depart_date', depart_date),
         ]
-        resp = self.submit(url, params, method='GET', **kwargs)
-        if 'data' in resp and 'data' in resp['data']:
-            return resp['data']['data']
-        else:
-            return []
+        return _Request(url, params, _data_item('data', list), method='GET', **kwargs)
 
+    @_endpoint
     def info_query_ticket_price(self, train_no, from_station_no, to_station_no, seat_types, train_date, **kwargs):
         """
         信息查询-车票价格
@@ -167,11 +567,7 @@ class TrainInfoQueryAPI(TrainBaseAPI):
             ('seat_types', seat_types),
             ('train_date', train_date)
         ]
-        resp = self.submit(url, params, method='GET', **kwargs)
-        if 'data' in resp:
-            return resp['data']
-        else:
-            return {}
+        return _Request(url, params, lambda resp: resp['data'] if 'data' in resp else {}, method='GET', **kwargs)
 
     def info_query_station_list(self, station_version=None, **kwargs):
         """
@@ -179,75 +575,62 @@ class TrainInfoQueryAPI(TrainBaseAPI):
         :param station_version 版本号
         :return JSON 数组
         """
-        def _parse_stations(s):
-            station_list = []
-
-            s = s.replace(';', '')
-            s = s.replace('var station_names =', '')
-
-            s_list = s.split('@')
-            s_list.pop(0)
-
-            for station in s_list:
-                station_tuple = tuple(station.split('|'))
-                station_list.append({
-                    'name': station_tuple[1].decode('utf8'),
-                    'short_name': unicode(station_tuple[0]),
-                    'code': unicode(station_tuple[2]),
-                    'english_name': unicode(station_tuple[3]),
-                    'index': station_tuple[5]
-                })
-            return station_list
-
         url = 'https://kyfw.12306.cn/otn/resources/js/framework/station_name.js'
         params = {
             'station_version': station_version or '',
         }
-        resp = self.submit(url, params, method='GET', parse_resp=False, **kwargs)
-        if not resp.status_code == 200:
-            raise exceptions.TrainAPIException(str(resp))
-
-        return _parse_stations(resp.content)
-
-    def info_query_trains(self, **kwargs):
-        def _parse_trains(s):
-            s = s.replace('var train_list =', '')
-            s_dict = json.loads(s)
-            train_list = []
-
-            train_code_pattern = re.compile(r'([0-9,A-Z]+?)\((.*)\)')
-            for _, type_trains in s_dict.items():
-                for _, trains in type_trains.items():
-                    for train in trains:
-                        train_code_match = train_code_pattern.match(train['station_train_code'])
-                        if not train_code_match:
-                            _logger.warn('train code not match. %s' % train['station_train_code'])
-                            continue
-
-                        m_groups = train_code_match.groups()
-                        train_list.append({
-                            'train_code': m_groups[0],
-                            'from_station_name': m_groups[1].split('-')[0].strip().replace(' ', ''),
-                            'to_station_name': m_groups[1].split('-')[1].strip().replace(' ', ''),
-                            'train_no': train['train_no'].strip().replace(' ', ''),
-                        })
-            return train_list
+        with parse_timer(url, 'GET'):
+            return _parse_stations(''.join(self._iter_resource(url, params, **kwargs)))
 
+    def info_query_trains(self, train_date=None, train_class=None, **kwargs):
+        """
+        信息查询-车次列表
+        :param train_date 日期或日期列表，默认为全部
+        :param train_class 车次类型或类型列表（如 G、D），默认为全部
+        :return JSON 数组
+        """
+        with parse_timer('https://kyfw.12306.cn/otn/resources/js/query/train_list.js', 'GET'):
+            return list(self.info_query_trains_iter(train_date=train_date, train_class=train_class, **kwargs))
+
+    def info_query_trains_iter(self, train_date=None, train_class=None, chunk_size=None, **kwargs):
+        """
+        信息查询-车次列表，边下载边解析，内存占用与 train_list.js 大小无关
+        :param train_date 日期或日期列表，默认为全部
+        :param train_class 车次类型或类型列表（如 G、D），默认为全部
+        :param chunk_size 读取响应的分块大小
+        :return 车次迭代器
+        """
         url = 'https://kyfw.12306.cn/otn/resources/js/query/train_list.js'
-        resp = self.submit(url, method='GET', parse_resp=False, **kwargs)
-        if not resp.status_code == 200:
-            raise exceptions.TrainAPIException(str(resp))
+        chunks = self._iter_resource(url, chunk_size=chunk_size, **kwargs)
+        try:
+            for train in _iter_trains(chunks, train_date=train_date, train_class=train_class,
+                                      loads=self.codec.loads):
+                yield train
+        finally:
+            chunks.close()
 
-        return _parse_trains(resp.content)
+    def _station_loader(self, **kwargs):
+        return lambda station_version: self.info_query_station_list(station_version, **kwargs)
 
     def info_query_station_by_name(self, station_name, station_version=None, **kwargs):
-        station_list = self.info_query_station_list(station_version)
-        for station in station_list:
-            if station['name'] == station_name:
-                return station
-        else:
-            return None
+        """
+        信息查询-按名称查询车站，车站列表按版本号缓存
+        :param station_name 车站名称
+        :param station_version 版本号
+        :return JSON DICT
+        """
+        return station_registry.get_by_name(station_name, station_version, loader=self._station_loader(**kwargs))
+
+    def info_query_station_by_code(self, station_code, station_version=None, **kwargs):
+        """
+        信息查询-按电报码查询车站，车站列表按版本号缓存
+        :param station_code 车站电报码
+        :param station_version 版本号
+        :return JSON DICT
+        """
+        return station_registry.get_by_code(station_code, station_version, loader=self._station_loader(**kwargs))
 
+    @_endpoint
     def info_query_train_search(self, train_no, train_date='', **kwargs):
         """
         火车车次搜索
@@ -257,17 +640,17 @@ class TrainInfoQueryAPI(TrainBaseAPI):
             'keyword': train_no,
             'date': train_date
         }
-        resp = self.submit(url, params, method='GET', **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='GET', **kwargs)
 
+    @_endpoint
     def info_query_dishonest(self, **kwargs):
         """
         失信名单
         """
         url = 'https://kyfw.12306.cn/otn/queryDishonest/query'
-        resp = self.submit(url, method='GET',  **kwargs)
-        return resp['data']['right']
+        return _Request(url, handler=lambda resp: resp['data']['right'], method='GET', **kwargs)
 
+    @_endpoint
     def info_query_dishonest_getone(self, passenger_name, passenger_id_no, **kwargs):
         """
         （个人）失信信息
@@ -277,5 +660,4 @@ class TrainInfoQueryAPI(TrainBaseAPI):
             'passenger_name': passenger_name,
             'passenger_id_no': passenger_id_no,
         }
-        resp = self.submit(url, params, method='POST', **kwargs)
-        return resp['data']
+        return _Request(url, params, _data, method='POST', **kwargs)
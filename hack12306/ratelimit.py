@@ -0,0 +1,228 @@
+# encoding: utf8
+"""
+ratelimit.py
+@author Meng.yangyang
+@description Token bucket rate limiter keyed by endpoint and account
+@created Sun Oct 18 2026 18:05:12 GMT+0800 (CST)
+"""
+
+import os
+import time
+import struct
+import logging
+import urlparse
+import threading
+
+from . import settings
+from . import exceptions
+from .cache import _makedirs, cache_key
+
+__all__ = ('RateLimiter', 'MemoryBucketBackend', 'FileBucketBackend', 'default_rate_limiter',)
+
+_logger = logging.getLogger('hack12306')
+
+POLICY_WAIT = 'wait'
+POLICY_FAIL = 'fail'
+
+
+def _reserve(state, rate, burst, now):
+    """
+    令牌桶取出一个令牌，令牌不足时预约下一个令牌（令牌数为负）
+    :param state (令牌数, 上次更新时间)，上次更新时间为 0 表示新的令牌桶
+    :return (新状态, 需要等待的秒数)
+    """
+    tokens, last = state
+    if not last:
+        tokens = burst
+    else:
+        tokens = min(burst, tokens + max(now - last, 0) * rate)
+    tokens -= 1
+    return (tokens, now), max(-tokens / rate, 0.0)
+
+
+def _refund(state, burst):
+    tokens, last = state
+    return min(burst, tokens + 1), last
+
+
+class MemoryBucketBackend(object):
+    """
+    进程内令牌桶
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key, rate, burst, now):
+        with self._lock:
+            state, wait = _reserve(self._buckets.get(key, (0.0, 0.0)), rate, burst, now)
+            self._buckets[key] = state
+            return wait
+
+    def refund(self, key, burst):
+        with self._lock:
+            if key in self._buckets:
+                self._buckets[key] = _refund(self._buckets[key], burst)
+
+
+class FileBucketBackend(object):
+    """
+    同一主机多进程共享的令牌桶。每个令牌桶一个 16 字节文件，映射到共享内存，
+    读写时使用 flock 文件锁在进程间互斥。
+    """
+
+    _format = struct.Struct('<dd')
+
+    def __init__(self, directory=None):
+        # flock 只在 POSIX 平台可用，只有文件令牌桶需要
+        import mmap
+        import fcntl
+        self._mmap, self._fcntl = mmap, fcntl
+        self.directory = directory or settings.RATE_LIMIT_DIR
+        _makedirs(self.directory)
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _map(self, key):
+        m = self._maps.get(key)
+        if m is None:
+            fd = os.open(os.path.join(self.directory, cache_key(*key)), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                self._fcntl.flock(fd, self._fcntl.LOCK_EX)
+                try:
+                    if os.fstat(fd).st_size < self._format.size:
+                        os.ftruncate(fd, self._format.size)
+                finally:
+                    self._fcntl.flock(fd, self._fcntl.LOCK_UN)
+                m = self._maps[key] = (fd, self._mmap.mmap(fd, self._format.size))
+            except Exception:
+                os.close(fd)
+                raise
+        return m
+
+    def _update(self, key, func):
+        with self._lock:
+            fd, m = self._map(key)
+            self._fcntl.flock(fd, self._fcntl.LOCK_EX)
+            try:
+                state, result = func(self._format.unpack(m[:self._format.size]))
+                m[:self._format.size] = self._format.pack(*state)
+            finally:
+                self._fcntl.flock(fd, self._fcntl.LOCK_UN)
+            return result
+
+    def reserve(self, key, rate, burst, now):
+        return self._update(key, lambda state: _reserve(state, rate, burst, now))
+
+    def refund(self, key, burst):
+        self._update(key, lambda state: (_refund(state, burst) if state[1] else state, None))
+
+    def close(self):
+        with self._lock:
+            for fd, m in self._maps.values():
+                m.close()
+                os.close(fd)
+            self._maps = {}
+
+
+class RateLimiter(object):
+    """
+    12306 接口限流，按接口路径和按账号分别使用令牌桶。
+    同时受多个令牌桶限制时，所有令牌桶都有令牌才发送请求。
+
+    限流策略：
+    1. wait 等待令牌，需要等待超过 max_wait 时抛出 TrainRateLimitException；
+    2. fail 没有令牌时立即抛出 TrainRateLimitException。
+    """
+
+    def __init__(self, limits=None, account_limits=None, backend=None, policy=None, max_wait=None):
+        """
+        :param limits 按接口路径的限流 {路径: (每秒令牌数, 令牌桶容量)}，默认 settings.RATE_LIMITS
+        :param account_limits 按账号的限流，格式同 limits，默认 settings.RATE_LIMITS_PER_ACCOUNT
+        :param backend MemoryBucketBackend/FileBucketBackend 实例，默认 MemoryBucketBackend
+        :param policy 限流策略 'wait' 或 'fail'，默认 settings.RATE_LIMIT_POLICY
+        :param max_wait 最长等待时间（秒），默认 settings.RATE_LIMIT_MAX_WAIT
+        """
+        self.limits = settings.RATE_LIMITS if limits is None else limits
+        self.account_limits = settings.RATE_LIMITS_PER_ACCOUNT if account_limits is None else account_limits
+        self.backend = backend or MemoryBucketBackend()
+        self.policy = policy or settings.RATE_LIMIT_POLICY
+        self.max_wait = settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        assert self.policy in (POLICY_WAIT, POLICY_FAIL), 'Unknown rate limit policy %s' % self.policy
+
+    @staticmethod
+    def account(cookies):
+        """
+        账号标识，登录后使用 tk，否则使用 JSESSIONID
+        """
+        if not cookies:
+            return None
+        return cookies.get('tk') or cookies.get('JSESSIONID')
+
+    def _buckets(self, endpoint, account):
+        buckets = []
+        if endpoint in self.limits:
+            buckets.append((('endpoint', endpoint), self.limits[endpoint]))
+        if account and endpoint in self.account_limits:
+            buckets.append((('account', endpoint, account), self.account_limits[endpoint]))
+        return buckets
+
+    def reserve(self, url, cookies=None, policy=None):
+        """
+        预约令牌，不等待
+        :param url 接口地址
+        :param cookies 用户 Session 信息，用于按账号限流
+        :param policy 本次调用的限流策略，默认为 self.policy
+        :return 需要等待的秒数
+        """
+        endpoint = urlparse.urlparse(url).path
+        buckets = self._buckets(endpoint, self.account(cookies))
+        if not buckets:
+            return 0
+
+        now = time.time()
+        wait = 0
+        for key, (rate, burst) in buckets:
+            wait = max(wait, self.backend.reserve(key, rate, burst, now))
+
+        policy = policy or self.policy
+        if wait > 0 and (policy == POLICY_FAIL or wait > self.max_wait):
+            for key, (rate, burst) in buckets:
+                self.backend.refund(key, burst)
+            raise exceptions.TrainRateLimitException('%s rate limited, retry after %.2fs' % (endpoint, wait))
+        return wait
+
+    def acquire(self, url, cookies=None, policy=None):
+        """
+        取得令牌，按限流策略等待或抛出 TrainRateLimitException
+        :return 等待的秒数
+        """
+        wait = self.reserve(url, cookies, policy)
+        if wait > 0:
+            _logger.debug('rate limit %s wait %.2fs' % (url, wait))
+            time.sleep(wait)
+        return wait
+
+
+_default_rate_limiter = None
+_default_rate_limiter_lock = threading.Lock()
+
+
+def default_rate_limiter():
+    """
+    进程内默认的限流器，由 settings.RATE_LIMIT_BACKEND 决定，None 表示不限流
+    """
+    global _default_rate_limiter
+
+    if _default_rate_limiter is None and settings.RATE_LIMIT_BACKEND:
+        with _default_rate_limiter_lock:
+            if _default_rate_limiter is None:
+                if settings.RATE_LIMIT_BACKEND == 'file':
+                    backend = FileBucketBackend()
+                elif settings.RATE_LIMIT_BACKEND == 'memory':
+                    backend = MemoryBucketBackend()
+                else:
+                    assert False, 'Unknown rate limit backend %s' % settings.RATE_LIMIT_BACKEND
+                _default_rate_limiter = RateLimiter(backend=backend)
+    return _default_rate_limiter
@@ -0,0 +1,310 @@
+# encoding: utf8
+"""
+route.py
+@author Meng.yangyang
+@description Transfer route planner over the local timetable
+@created Sun Oct 18 2026 23:27:05 GMT+0800 (CST)
+"""
+
+import bisect
+import datetime
+import collections
+
+from . import settings
+from . import constants
+from .query import TrainInfoQueryAPI, train_check_seat_type_have_ticket
+from .timetable import TimetableStore, _STATION_CODE_PATTERN, _minutes
+
+__all__ = ('RoutePlanner',)
+
+_DAY = 24 * 60
+
+_Stop = collections.namedtuple('_Stop', ['station_name', 'station_code', 'station_no', 'arrive', 'depart'])
+
+# 一段乘车：车次、上车站序号、下车站序号、车次当天 0 点的绝对时间（分钟）
+_Leg = collections.namedtuple('_Leg', ['train_no', 'board', 'alight', 'trip_start'])
+
+
+def _abs_minutes(hhmm, day_offset):
+    minutes = _minutes(hhmm)
+    if minutes is None:
+        return None
+    return (day_offset or 0) * _DAY + minutes
+
+
+def _hhmm(minutes):
+    return '%02d:%02d' % divmod(minutes % _DAY, 60)
+
+
+class _Departures(object):
+    """
+    车站的出发事件，按一天内的出发时刻排序。时刻表按天重复，查询时展开为绝对时间
+    """
+
+    def __init__(self, events):
+        self.events = sorted(events)
+        self.keys = [event[0] for event in self.events]
+
+    def between(self, earliest, latest):
+        """
+        :return 出发时间在 [earliest, latest] 内的 (出发时间, 事件) 迭代器，按出发时间排序
+        """
+        for day in range(earliest // _DAY, latest // _DAY + 1):
+            base = day * _DAY
+            lo = bisect.bisect_left(self.keys, earliest - base)
+            hi = bisect.bisect_right(self.keys, latest - base)
+            for event in self.events[lo:hi]:
+                yield base + event[0], event
+
+
+class RoutePlanner(object):
+    """
+    换乘方案查询。加载本地时刻表后在内存中建立按车站、出发时刻排序的出发事件索引（时间展开的连接图），
+    查询直达、一次换乘及两次换乘方案，换乘时间不少于 min_transfer 分钟且不超过 max_transfer_wait 分钟。
+
+    1. 直达及一次换乘：从出发站的每个出发事件沿车次向后，在经停站查找能到达终点站的车次；
+    2. 两次换乘：记录一次乘车到达各车站的最早时间，只沿这些车站换乘时间窗口内出发的车次向后查找。
+
+    只有候选方案的各段才通过 check_tickets 并发查询余票。
+    """
+
+    def __init__(self, store=None, train_date=None, min_transfer=None, max_transfer_wait=None):
+        """
+        :param store TimetableStore 实例，默认使用 settings.TIMETABLE_DB
+        :param train_date 乘车日期，只使用该日期开行的车次，None 表示使用全部车次
+        :param min_transfer 最短换乘时间（分钟），默认 settings.ROUTE_MIN_TRANSFER
+        :param max_transfer_wait 最长换乘等待时间（分钟），默认 settings.ROUTE_MAX_TRANSFER_WAIT
+        """
+        self.store = store or TimetableStore()
+        self.min_transfer = settings.ROUTE_MIN_TRANSFER if min_transfer is None else min_transfer
+        self.max_transfer_wait = settings.ROUTE_MAX_TRANSFER_WAIT if max_transfer_wait is None else max_transfer_wait
+        self.load(train_date)
+
+    def load(self, train_date=None):
+        """
+        从本地时刻表重新建立索引
+        """
+        trains = collections.OrderedDict()
+        names = {}
+        for row in self.store.timetable(train_date):
+            stop = _Stop(row['station_name'], row['station_code'], row['station_no'],
+                         _abs_minutes(row['arrive_time'], row['arrive_day_offset']),
+                         _abs_minutes(row['start_time'], row['start_day_offset']))
+            trains.setdefault(row['train_no'], (row['train_code'], []))[1].append(stop)
+            if row['station_code']:
+                names[row['station_code']] = row['station_name']
+
+        departures = collections.defaultdict(list)
+        visits = collections.defaultdict(list)
+        for train_no, (_, stops) in trains.items():
+            for i, stop in enumerate(stops):
+                if stop.depart is not None:
+                    departures[stop.station_name].append((stop.depart % _DAY, train_no, i))
+                if stop.arrive is not None:
+                    visits[stop.station_name].append((train_no, i))
+
+        self.train_date = train_date
+        self._trains = trains
+        self._names = names
+        self._departures = dict([(name, _Departures(events)) for name, events in departures.items()])
+        self._visits = dict(visits)
+        self._arrivals_index = {}
+
+    def _station_name(self, station):
+        if _STATION_CODE_PATTERN.match(station):
+            return self._names.get(station, station)
+        return station
+
+    def _arrivals(self, station):
+        """
+        能直达 station 的出发事件，按上车站索引：{上车站: _Departures((出发时刻, train_no, 上车站序号, 下车站序号))}。
+        每个到达站第一次查询时建立，之后复用
+        """
+        arrivals = self._arrivals_index.get(station)
+        if arrivals is not None:
+            return arrivals
+
+        events = collections.defaultdict(list)
+        for train_no, j in self._visits.get(station, []):
+            stops = self._trains[train_no][1]
+            for i in range(j):
+                if stops[i].depart is not None:
+                    events[stops[i].station_name].append((stops[i].depart % _DAY, train_no, i, j))
+        arrivals = self._arrivals_index[station] = dict([(name, _Departures(items)) for name, items in events.items()])
+        return arrivals
+
+    def _time(self, leg, index, attr):
+        return leg.trip_start + getattr(self._trains[leg.train_no][1][index], attr)
+
+    def plan(self, from_station, to_station, depart_after='00:00', depart_before='24:00', max_transfers=None,
+             limit=None):
+        """
+        查询换乘方案
+        :param from_station 出发车站名称或电报码
+        :param to_station 到达车站名称或电报码
+        :param depart_after 最早出发时间 HH:MM
+        :param depart_before 最晚出发时间 HH:MM
+        :param max_transfers 最多换乘次数（0、1、2），默认 settings.ROUTE_MAX_TRANSFERS
+        :param limit 返回的方案数，默认 settings.ROUTE_LIMIT
+        :return JSON LIST，按到达时间、出发时间（晚者优先）、换乘次数排序
+        """
+        source, target = self._station_name(from_station), self._station_name(to_station)
+        max_transfers = settings.ROUTE_MAX_TRANSFERS if max_transfers is None else max_transfers
+        limit = limit or settings.ROUTE_LIMIT
+        min_transfer, max_wait = self.min_transfer, self.max_transfer_wait
+        if source == target or source not in self._departures or target not in self._visits:
+            return []
+
+        routes = {}
+
+        def add(legs):
+            # 相同车次组合只保留最早到达、换乘等待最短的方案
+            key = tuple([leg.train_no for leg in legs])
+            arrive = self._time(legs[-1], legs[-1].alight, 'arrive')
+            depart = self._time(legs[0], legs[0].board, 'depart')
+            wait = sum([self._time(b, b.board, 'depart') - self._time(a, a.alight, 'arrive')
+                        for a, b in zip(legs, legs[1:])])
+            rank = (arrive, -depart, len(legs), wait)
+            if key not in routes or rank < routes[key][0]:
+                routes[key] = (rank, legs)
+
+        arrivals = self._arrivals(target)
+        # 一次乘车到达各车站的最早时间 {车站: (到达时间, 第一段)}
+        reached = {}
+        for depart, (tod, train_no, i) in self._departures[source].between(_minutes(depart_after),
+                                                                            _minutes(depart_before) - 1):
+            stops = self._trains[train_no][1]
+            trip_start = depart - stops[i].depart
+            for j in range(i + 1, len(stops)):
+                stop = stops[j]
+                if stop.arrive is None or stop.station_name == source:
+                    continue
+                leg = _Leg(train_no, i, j, trip_start)
+                if stop.station_name == target:
+                    add([leg])
+                    break
+
+                arrive = trip_start + stop.arrive
+                if stop.station_name not in reached or arrive < reached[stop.station_name][0]:
+                    reached[stop.station_name] = (arrive, leg)
+                if max_transfers < 1 or stop.station_name not in arrivals:
+                    continue
+                for depart2, (_, train_no2, k, m) in arrivals[stop.station_name].between(arrive + min_transfer,
+                                                                                          arrive + max_wait):
+                    if train_no2 != train_no:
+                        stops2 = self._trains[train_no2][1]
+                        add([leg, _Leg(train_no2, k, m, depart2 - stops2[k].depart)])
+
+        if max_transfers >= 2:
+            self._plan_two_transfers(source, target, reached, arrivals, add)
+
+        ranked = sorted(routes.values())[:limit]
+        return [self._route(legs) for _, legs in ranked]
+
+    def _plan_two_transfers(self, source, target, reached, arrivals, add):
+        """
+        在一次乘车可到达的车站换乘第二段，在能直达终点站的车站再换乘第三段
+        """
+        min_transfer, max_wait = self.min_transfer, self.max_transfer_wait
+        # 第二段每个车次最早能赶上的一班 {train_no: (车次当天 0 点, 第一段, 上车站序号)}
+        boards = {}
+        for name, (arrive1, leg1) in reached.items():
+            if name == target or name not in self._departures:
+                continue
+            for depart, (_, train_no, k) in self._departures[name].between(arrive1 + min_transfer,
+                                                                          arrive1 + max_wait):
+                if train_no == leg1.train_no:
+                    continue
+                trip_start = depart - self._trains[train_no][1][k].depart
+                if train_no not in boards or (trip_start, k) < (boards[train_no][0], boards[train_no][2]):
+                    boards[train_no] = (trip_start, leg1, k)
+
+        for train_no, (trip_start, leg1, k) in boards.items():
+            stops = self._trains[train_no][1]
+            for n in range(k + 1, len(stops)):
+                stop = stops[n]
+                if stop.arrive is None or stop.station_name not in arrivals or stop.station_name == source:
+                    continue
+                leg2 = _Leg(train_no, k, n, trip_start)
+                arrive = trip_start + stop.arrive
+                for depart3, (_, train_no3, m, o) in arrivals[stop.station_name].between(arrive + min_transfer,
+                                                                                          arrive + max_wait):
+                    if train_no3 not in (leg1.train_no, train_no):
+                        stops3 = self._trains[train_no3][1]
+                        add([leg1, leg2, _Leg(train_no3, m, o, depart3 - stops3[m].depart)])
+
+    def _leg(self, leg):
+        train_code, stops = self._trains[leg.train_no]
+        board, alight = stops[leg.board], stops[leg.alight]
+        depart, arrive = leg.trip_start + board.depart, leg.trip_start + alight.arrive
+        train_date = None
+        if self.train_date is not None:
+            day = datetime.datetime.strptime(self.train_date, '%Y-%m-%d').date()
+            train_date = (day + datetime.timedelta(days=depart // _DAY)).strftime('%Y-%m-%d')
+        return {
+            'train_no': leg.train_no,
+            'train_code': train_code,
+            'train_date': train_date,
+            'from_station_name': board.station_name,
+            'from_station_code': board.station_code,
+            'from_station_no': board.station_no,
+            'to_station_name': alight.station_name,
+            'to_station_code': alight.station_code,
+            'to_station_no': alight.station_no,
+            'start_time': _hhmm(depart),
+            'start_day': depart // _DAY,
+            'arrive_time': _hhmm(arrive),
+            'arrive_day': arrive // _DAY,
+        }
+
+    def _route(self, legs):
+        depart = self._time(legs[0], legs[0].board, 'depart')
+        arrive = self._time(legs[-1], legs[-1].alight, 'arrive')
+        waits = [self._time(b, b.board, 'depart') - self._time(a, a.alight, 'arrive')
+                 for a, b in zip(legs, legs[1:])]
+        return {
+            'legs': [self._leg(leg) for leg in legs],
+            'transfers': len(legs) - 1,
+            'transfer_stations': [self._trains[leg.train_no][1][leg.alight].station_name for leg in legs[:-1]],
+            'transfer_waits': waits,
+            'start_time': _hhmm(depart),
+            'arrive_time': _hhmm(arrive),
+            'arrive_day': arrive // _DAY,
+            'duration': arrive - depart,
+        }
+
+    def check_tickets(self, routes, api=None, max_concurrency=None, available_only=False, **kwargs):
+        """
+        并发查询候选方案各段的余票，相同的查询只请求一次
+        :param routes plan 返回的方案，需要指定 train_date
+        :param api TrainInfoQueryAPI 实例
+        :param max_concurrency 最大并发查询数，默认为 settings.LEFT_TICKETS_BATCH_CONCURRENCY
+        :param available_only 是否只返回每段都有票的方案
+        :return 方案列表，每段增加 left_ticket（余票记录）及 has_ticket，方案增加 has_ticket
+        """
+        assert self.train_date is not None, 'check_tickets requires train_date'
+        api = api or TrainInfoQueryAPI()
+
+        queries = set()
+        for route in routes:
+            for leg in route['legs']:
+                if leg['from_station_code'] and leg['to_station_code']:
+                    queries.add((leg['train_date'], leg['from_station_code'], leg['to_station_code']))
+
+        results = {}
+        for result in api.info_query_left_tickets_batch(sorted(queries), max_concurrency=max_concurrency, **kwargs):
+            results[(result.train_date, result.from_station, result.to_station)] = result.trains
+
+        seat_types = [seat_type for seat_type, _ in constants.SEAT_TYPE_CODE_MAP]
+        checked = []
+        for route in routes:
+            for leg in route['legs']:
+                trains = results.get((leg['train_date'], leg['from_station_code'], leg['to_station_code'])) or []
+                tickets = [train for train in trains if train['train_num'] == leg['train_no']]
+                leg['left_ticket'] = tickets[0] if tickets else None
+                leg['has_ticket'] = bool(tickets) and any(
+                    [train_check_seat_type_have_ticket(tickets[0].get(seat_type)) for seat_type in seat_types])
+            route['has_ticket'] = all([leg['has_ticket'] for leg in route['legs']])
+            if route['has_ticket'] or not available_only:
+                checked.append(route)
+        return checked
@@ -0,0 +1,156 @@
+# encoding: utf8
+"""
+scheduler.py
+@author Meng.yangyang
+@description Timer scheduler for polling tasks
+@created Sun Oct 18 2026 14:10:37 GMT+0800 (CST)
+"""
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+from concurrent import futures
+
+from . import settings
+
+__all__ = ('Scheduler', 'ScheduledTask',)
+
+_logger = logging.getLogger('hack12306')
+
+
+class ScheduledTask(object):
+    """
+    定时任务。func() 返回下次执行的延迟（秒），返回 None 表示任务结束。
+    """
+
+    def __init__(self, func, name=None):
+        self.func = func
+        self.name = name or getattr(func, '__name__', 'task')
+        self.due = None
+        self.runs = 0
+        self.cancelled = False
+        self.done = threading.Event()
+        self.exception = None
+
+    def cancel(self):
+        self.cancelled = True
+        self.done.set()
+
+    def __repr__(self):
+        return '<ScheduledTask %s due:%s runs:%s>' % (self.name, self.due, self.runs)
+
+
+class Scheduler(object):
+    """
+    定时任务调度器。调度线程按到期时间从最小堆取出任务，在线程池中执行，
+    任务执行完成后按返回的延迟重新入堆，同一任务不会并发执行。
+    数千个轮询任务共享一个调度线程和固定大小的线程池。
+    """
+
+    def __init__(self, max_workers=None):
+        """
+        :param max_workers 执行任务的线程数，默认 settings.SCHEDULER_MAX_WORKERS
+        """
+        self.max_workers = max_workers or settings.SCHEDULER_MAX_WORKERS
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+            self._executor = futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            self._thread = threading.Thread(target=self._run, name='hack12306-scheduler')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            for _, _, task in self._heap:
+                task.cancel()
+            self._heap = []
+            self._cond.notify()
+
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, func, delay=0, name=None):
+        """
+        添加定时任务
+        :param func 任务函数，返回下次执行的延迟（秒），返回 None 结束
+        :param delay 首次执行延迟（秒）
+        :return ScheduledTask
+        """
+        task = ScheduledTask(func, name)
+        self._push(task, delay)
+        return task
+
+    def _push(self, task, delay):
+        with self._cond:
+            if task.cancelled:
+                return
+            if not self._running:
+                task.cancel()
+                return
+            task.due = time.time() + max(delay, 0)
+            heapq.heappush(self._heap, (task.due, next(self._counter), task))
+            if self._heap[0][2] is task:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    timeout = self._heap[0][0] - time.time()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+
+                if not self._running:
+                    return
+                _, _, task = heapq.heappop(self._heap)
+
+            if not task.cancelled:
+                self._executor.submit(self._execute, task)
+
+    def _execute(self, task):
+        if task.cancelled:
+            return
+
+        try:
+            task.runs += 1
+            delay = task.func()
+        except Exception as e:
+            _logger.exception('scheduled task %s error. %s' % (task.name, e))
+            task.exception = e
+            task.done.set()
+            return
+
+        if delay is None:
+            task.done.set()
+        else:
+            self._push(task, delay)
@@ -0,0 +1,363 @@
+# encoding: utf8
+"""
+session.py
+@author Meng.yangyang
+@description Multi-account session pool with persistent cookie jars
+@created Sun Oct 18 2026 18:47:30 GMT+0800 (CST)
+"""
+
+import os
+import time
+import json
+import logging
+import tempfile
+import threading
+import contextlib
+import collections
+
+from requests.cookies import RequestsCookieJar, create_cookie
+
+from . import settings
+from . import exceptions
+from .base import TrainClient
+from .cache import _makedirs, cache_key
+from .utils import cookie_str_to_dict
+
+__all__ = ('TrainSession', 'SessionPool',)
+
+_logger = logging.getLogger('hack12306')
+
+
+class TrainSession(object):
+    """
+    账号 Session，持有账号的 Cookie 和独立的 HTTP 连接池。
+    响应中的 Set-Cookie 自动保存到 Cookie 中。
+
+        with pool.checkout('alice') as session:
+            TrainUserAPI(client=session.client).user_info(cookies=session.cookies)
+    """
+
+    def __init__(self, account, cookies=None, client=None):
+        """
+        :param account 账号
+        :param cookies 初始 Cookie，字典或 Cookie 字符串
+        :param client TrainClient 实例，默认为该账号创建独立的连接池
+        """
+        self.account = account
+        self.client = client or TrainClient(pool_connections=settings.SESSION_HTTP_POOL_CONNECTIONS,
+                                            pool_maxsize=settings.SESSION_HTTP_POOL_MAXSIZE,
+                                            persist_cookies=True)
+        self.jar = self.client.session.cookies
+        self.last_used = time.time()
+        self.checked_out = False
+        self.loaded = True      # SessionPool 签出后在锁外加载磁盘上的 Cookie，加载前为 False
+        self.removed = False    # 签出期间被 SessionPool.remove 删除，归还时不再保存
+        if cookies:
+            self.update(cookies)
+
+    def __repr__(self):
+        return '<TrainSession %s>' % self.account
+
+    @property
+    def cookies(self):
+        """
+        :return Cookie 字典，作为 API 的 cookies 参数
+        """
+        return dict([(cookie.name, cookie.value) for cookie in self.jar])
+
+    def update(self, cookies=None, **kwargs):
+        """
+        更新 Cookie，如登录后设置 tk
+        :param cookies 字典或 Cookie 字符串
+        """
+        if isinstance(cookies, basestring):
+            cookies = cookie_str_to_dict(cookies)
+        cookies = dict(cookies or {}, **kwargs)
+        for name, value in cookies.items():
+            # 空值表示删除
+            self.jar.set(name, value or None)
+
+    def clear(self):
+        """
+        清空 Cookie，如 Session 过期后重新登录
+        """
+        self.jar.clear()
+
+    def api(self, api_class, **kwargs):
+        """
+        创建使用该 Session 连接池的 API 实例
+        :param api_class TrainBaseAPI 子类，如 TrainUserAPI
+        """
+        return api_class(client=self.client, **kwargs)
+
+    def dump(self):
+        return {
+            'account': self.account,
+            'cookies': [{
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'expires': cookie.expires,
+                'secure': cookie.secure,
+            } for cookie in self.jar],
+            'updated': time.time(),
+        }
+
+    def load(self, data):
+        jar = RequestsCookieJar()
+        now = time.time()
+        for cookie in data.get('cookies', []):
+            if cookie.get('expires') and cookie['expires'] < now:
+                continue
+            jar.set_cookie(create_cookie(**cookie))
+        self.jar.clear()
+        self.jar.update(jar)
+
+    def close(self):
+        self.client.close()
+
+
+class SessionPool(object):
+    """
+    多账号 Session 池。
+
+    1. 同一账号的 Session 同一时间只能被一个线程签出，其他线程等待归还；
+    2. 签出和归还时按需从磁盘加载、保存 Cookie，进程重启后无需重新登录；
+    3. 空闲超过 idle_timeout 或数量超过 max_sessions 时关闭最久未使用的 Session 的连接池，
+       Cookie 保留在磁盘上，下次签出时重新加载。
+    """
+
+    def __init__(self, directory=None, idle_timeout=None, max_sessions=None):
+        """
+        :param directory Cookie 保存目录，默认 settings.SESSION_POOL_DIR，False 表示不保存
+        :param idle_timeout 空闲 Session 的回收时间（秒），默认 settings.SESSION_IDLE_TIMEOUT
+        :param max_sessions 内存中保持的最大 Session 数，默认 settings.SESSION_POOL_MAX_SESSIONS
+        """
+        self.directory = settings.SESSION_POOL_DIR if directory is None else directory
+        self.idle_timeout = idle_timeout or settings.SESSION_IDLE_TIMEOUT
+        self.max_sessions = max_sessions or settings.SESSION_POOL_MAX_SESSIONS
+        if self.directory:
+            _makedirs(self.directory)
+
+        self._sessions = collections.OrderedDict()     # account -> TrainSession，按最近使用排序
+        self._cond = threading.Condition()
+        self._last_sweep = time.time()
+        self._persisted = self._scan()                  # 磁盘上保存了 Cookie 的账号
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, account):
+        return account in self._sessions or account in self._persisted
+
+    def _path(self, account):
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, cache_key('session', account) + '.json')
+
+    def _scan(self):
+        """
+        读取 Cookie 保存目录中的账号，只在创建时读取一次，之后随保存、删除更新
+        """
+        accounts = set()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name), 'rb') as f:
+                        accounts.add(json.load(f)['account'])
+                except (IOError, ValueError, KeyError):
+                    continue
+        return accounts
+
+    def accounts(self):
+        """
+        :return 内存中及磁盘上保存的全部账号
+        """
+        with self._cond:
+            return sorted(set(self._sessions.keys()) | self._persisted)
+
+    def add(self, account, cookies=None):
+        """
+        添加账号或更新账号的 Cookie
+        :param cookies 字典或 Cookie 字符串
+        """
+        with self.checkout(account) as session:
+            session.update(cookies)
+        return session
+
+    def remove(self, account):
+        """
+        删除账号及保存的 Cookie。Session 已签出时归还后关闭，使用中的连接池不受影响
+        """
+        with self._cond:
+            session = self._sessions.get(account)
+            if session is not None and session.checked_out:
+                session.removed = True
+                session = None
+            else:
+                self._sessions.pop(account, None)
+            self._persisted.discard(account)
+            self._cond.notify_all()
+        if session is not None:
+            session.close()
+        path = self._path(account)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def _load(self, session):
+        """
+        加载磁盘上保存的 Cookie，在锁外调用，Session 已被当前线程签出
+        """
+        path = self._path(session.account)
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    session.load(json.load(f))
+            except (IOError, ValueError, KeyError, TypeError) as e:
+                _logger.warning('load session %s error. %s' % (session.account, e))
+        session.loaded = True
+
+    def save(self, session):
+        """
+        保存 Session 的 Cookie 到磁盘
+        """
+        path = self._path(session.account)
+        if not path:
+            return
+        fd, tmp = tempfile.mkstemp(prefix='.', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            json.dump(session.dump(), f)
+        os.rename(tmp, path)
+        with self._cond:
+            if session.removed:
+                # 保存期间账号被删除
+                os.remove(path)
+            else:
+                self._persisted.add(session.account)
+
+    @contextlib.contextmanager
+    def checkout(self, account=None, timeout=None):
+        """
+        签出 Session，退出时归还并保存 Cookie
+        :param account 账号，None 表示最久未使用的空闲 Session
+        :param timeout 等待其他线程归还的超时时间（秒），None 表示一直等待
+        """
+        session = self.acquire(account, timeout)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def acquire(self, account=None, timeout=None):
+        """
+        签出 Session，使用完成后调用 release 归还
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                session = self._idle(account)
+                if session is not None:
+                    break
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise exceptions.TrainAPIException('checkout session %s timeout' % (account or ''))
+                self._cond.wait(remaining)
+
+            session.checked_out = True
+            session.last_used = time.time()
+            self._sessions.pop(session.account)
+            self._sessions[session.account] = session
+            evicted = self._evict()
+        for s in evicted:
+            s.close()
+        if not session.loaded:
+            self._load(session)
+        return session
+
+    def _idle(self, account):
+        if account is None:
+            for session in self._sessions.itervalues():
+                if not session.checked_out:
+                    return session
+            # 内存中没有空闲 Session 时签出磁盘上保存的账号
+            for account in sorted(self._persisted):
+                if account not in self._sessions:
+                    return self._placeholder(account)
+            return None
+
+        session = self._sessions.get(account)
+        if session is None:
+            session = self._placeholder(account)
+        return None if session.checked_out else session
+
+    def _placeholder(self, account):
+        """
+        创建尚未加载 Cookie 的 Session，签出后由 acquire 在锁外加载，读取磁盘时不阻塞其他账号的签出和归还
+        """
+        session = self._sessions[account] = TrainSession(account)
+        session.loaded = False
+        return session
+
+    def release(self, session):
+        """
+        归还 Session，签出期间被删除的 Session 不再保存并关闭
+        """
+        if not session.removed:
+            self.save(session)
+        with self._cond:
+            session.checked_out = False
+            session.last_used = time.time()
+            if session.removed and self._sessions.get(session.account) is session:
+                self._sessions.pop(session.account)
+            self._cond.notify_all()
+        if session.removed:
+            session.close()
+
+    def _evict(self, now=None):
+        """
+        移出空闲超时及超过数量上限的 Session，Cookie 已在归还时保存。
+        不保存 Cookie 时只关闭连接池，Session 保留在内存中
+        """
+        now = now or time.time()
+        evicted = []
+        over = len(self._sessions) - self.max_sessions
+        sweep = now - self._last_sweep >= self.idle_timeout / 2.0
+        if over <= 0 and not sweep:
+            return evicted
+
+        for account, session in list(self._sessions.items()):
+            if session.checked_out:
+                continue
+            if over > 0 or now - session.last_used >= self.idle_timeout:
+                if self.directory:
+                    self._sessions.pop(account)
+                    self._persisted.add(account)
+                evicted.append(session)
+                over -= 1
+            elif not sweep:
+                break
+        if sweep:
+            self._last_sweep = now
+        return evicted
+
+    def evict_idle(self):
+        """
+        回收空闲 Session 的连接池
+        :return 回收的 Session 数
+        """
+        with self._cond:
+            self._last_sweep = 0
+            evicted = self._evict()
+        for session in evicted:
+            session.close()
+        return len(evicted)
+
+    def close(self):
+        with self._cond:
+            sessions = self._sessions.values()
+            self._sessions = collections.OrderedDict()
+        for session in sessions:
+            session.close()
@@ -1,3 +1,139 @@
 #encoding: utf8
 
 DEBUG = True
+
+# 12306 接口地址替换，如本地模拟服务 'http://127.0.0.1:8306'，None 表示使用 12306 官方地址
+BASE_URL = None
+
+# HTTP 连接池
+HTTP_POOL_CONNECTIONS = 10      # 缓存的主机连接池数量
+HTTP_POOL_MAXSIZE = 10          # 每个主机保持的最大连接数
+HTTP_POOL_BLOCK = False         # 连接数达到上限时是否阻塞等待
+
+# HTTP 传输层：'requests' 或 'http2'（同一主机的并发请求共享一个多路复用连接，pip install hack12306[http2]），
+# 保存响应 Cookie 的客户端（如 SessionPool）始终使用 requests
+HTTP_TRANSPORT = 'requests'
+HTTP2_TIMEOUT = 10              # HTTP/2 连接及读写超时（秒）
+
+# 登录检查结果缓存时间（秒），0 表示不缓存
+LOGIN_CHECK_CACHE_TTL = 60
+
+# 异步 HTTP 客户端最大并发请求数
+ASYNC_HTTP_MAX_CLIENTS = 200
+
+# 批量余票查询默认并发数
+LEFT_TICKETS_BATCH_CONCURRENCY = 5
+
+# 流式解析 train_list.js 的分块大小（字节）
+TRAIN_LIST_CHUNK_SIZE = 64 * 1024
+
+# 定时任务调度器执行线程数
+SCHEDULER_MAX_WORKERS = 10
+
+# 余票监控轮询间隔范围（秒）
+MONITOR_MIN_INTERVAL = 3
+MONITOR_MAX_INTERVAL = 60
+
+# 下单排队等待：查询间隔范围（秒）、失败退避上限（秒）和超时时间（秒）
+ORDER_QUEUE_MIN_POLL_INTERVAL = 0.5
+ORDER_QUEUE_MAX_POLL_INTERVAL = 3
+ORDER_QUEUE_MAX_BACKOFF = 10
+ORDER_QUEUE_TIMEOUT = 120
+
+# 流式解析 initDc 页面的分块大小（字节），解析完成后剩余数据不超过上限时读完以复用连接
+INIT_DC_CHUNK_SIZE = 8 * 1024
+INIT_DC_DRAIN_MAX_BYTES = 256 * 1024
+
+# 响应缓存：'memory' 进程内，'disk' 磁盘，None 不缓存
+RESPONSE_CACHE_BACKEND = None
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_DIR = '/tmp/hack12306/cache'
+
+# 按接口路径配置的响应缓存时间（秒），车次、车站车次、票价、车次搜索每天最多变化一次
+RESPONSE_CACHE_TTLS = {
+    '/otn/czxx/queryByTrainNo': 6 * 3600,
+    '/otn/czxx/query': 6 * 3600,
+    '/otn/leftTicket/queryTicketPrice': 3600,
+    '/search/v1/train/search': 3600,
+}
+
+# 静态资源（station_name.js、train_list.js）本地缓存目录，None 表示不缓存
+RESOURCE_CACHE_DIR = '/tmp/hack12306/resources'
+
+# 接口请求指标（耗时、状态码、异常、收发字节数），关闭时不做任何统计
+METRICS_ENABLED = False
+
+# 接口限流：'memory' 进程内，'file' 同一主机多进程共享，None 不限流
+RATE_LIMIT_BACKEND = None
+RATE_LIMIT_DIR = '/tmp/hack12306/ratelimit'
+
+# 限流策略：'wait' 等待令牌，'fail' 立即抛出 TrainRateLimitException；等待超过上限（秒）时同样抛出
+RATE_LIMIT_POLICY = 'wait'
+RATE_LIMIT_MAX_WAIT = 10
+
+# 按接口路径、按账号的令牌桶 {路径: (每秒令牌数, 令牌桶容量)}
+RATE_LIMITS = {
+    '/otn/leftTicket/query': (2, 5),
+    '/otn/leftTicket/submitOrderRequest': (1, 2),
+    '/otn/confirmPassenger/confirmSingleForQueue': (1, 2),
+}
+RATE_LIMITS_PER_ACCOUNT = {
+    '/otn/leftTicket/query': (1, 3),
+    '/otn/leftTicket/submitOrderRequest': (0.2, 1),
+    '/otn/confirmPassenger/queryOrderWaitTime': (1, 2),
+}
+
+# 多账号 Session 池：Cookie 保存目录、空闲回收时间（秒）、内存中最大 Session 数及每个账号的连接池大小
+SESSION_POOL_DIR = '/tmp/hack12306/sessions'
+SESSION_IDLE_TIMEOUT = 600
+SESSION_POOL_MAX_SESSIONS = 200
+SESSION_HTTP_POOL_CONNECTIONS = 4
+SESSION_HTTP_POOL_MAXSIZE = 2
+
+# 信息查询 GET 接口的重试与对冲：失败重试次数、退避时间（秒）
+QUERY_RETRIES = 0
+QUERY_RETRY_BACKOFF = 0.2
+QUERY_RETRY_MAX_BACKOFF = 2
+
+# 对冲请求：超过该接口耗时分位数仍未返回时再发送一个请求，耗时样本不足时使用固定延迟（秒）
+QUERY_HEDGE = False
+QUERY_HEDGE_QUANTILE = 0.95
+QUERY_HEDGE_DELAY = 0.5
+QUERY_HEDGE_MAX_WORKERS = 20
+
+# 余票查询 CDN 节点：None 不使用，'spread' 按评分分散到多个节点，'race' 同时请求多个节点取最先返回的响应
+EDGE_MODE = None
+EDGE_HOST = 'kyfw.12306.cn'
+EDGE_IPS = []                   # 节点 IP（'ip' 或 'ip:port'），为空时解析 EDGE_HOST
+EDGE_RACE_FANOUT = 2            # race 方式同时请求的节点数
+EDGE_AGE_WEIGHT = 0.1           # 每秒数据延迟（响应 Age 头）折算的耗时（秒）
+EDGE_ERROR_COOLDOWN = 30        # 节点连续失败后暂停使用的时间（秒）
+EDGE_POOL_MAXSIZE = 4           # 每个节点保持的最大连接数
+
+# DEBUG 模式下失败响应的采集：内存中保存的记录数、每条记录保存的最大响应字节数
+DEBUG_CAPTURE_BUFFER = 256
+DEBUG_CAPTURE_MAX_BODY = 64 * 1024
+
+# 后台线程每隔 DEBUG_CAPTURE_FLUSH_INTERVAL 秒批量压缩写入 DEBUG_CAPTURE_DIR（None 表示不写入磁盘），
+# 磁盘占用超过 DEBUG_CAPTURE_MAX_BYTES 时删除最旧的文件
+DEBUG_CAPTURE_DIR = '/tmp/hack12306/debug'
+DEBUG_CAPTURE_FLUSH_INTERVAL = 5
+DEBUG_CAPTURE_MAX_BYTES = 64 * 1024 * 1024
+
+# 每秒完整采集的记录数，超过后按抽样率采集
+DEBUG_CAPTURE_BURST = 20
+DEBUG_CAPTURE_SAMPLE_RATE = 0.05
+
+# 解析响应的 JSON 库：'auto' 按 ujson、rapidjson、simplejson、json 的顺序使用第一个已安装的
+JSON_CODEC = 'auto'
+
+# 本地时刻表：SQLite 数据库路径，爬取停靠站的并发数及限流 (每秒请求数, 令牌桶容量)
+TIMETABLE_DB = '/tmp/hack12306/timetable.db'
+TIMETABLE_CRAWL_CONCURRENCY = 5
+TIMETABLE_CRAWL_RATE_LIMIT = (5, 10)
+
+# 换乘方案：最短换乘时间、最长换乘等待时间（分钟），最多换乘次数及返回的方案数
+ROUTE_MIN_TRANSFER = 20
+ROUTE_MAX_TRANSFER_WAIT = 240
+ROUTE_MAX_TRANSFERS = 2
+ROUTE_LIMIT = 10
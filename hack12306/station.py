@@ -0,0 +1,137 @@
+# encoding: utf8
+"""
+station.py
+@author Meng.yangyang
+@description Station registry
+@created Sun Oct 18 2026 11:40:26 GMT+0800 (CST)
+"""
+
+import logging
+import threading
+import collections
+
+__all__ = ('StationRegistry', 'station_registry',)
+
+_logger = logging.getLogger('hack12306')
+
+_StationIndex = collections.namedtuple(
+    '_StationIndex', ['version', 'stations', 'by_name', 'by_code', 'by_short_name', 'by_english_name'])
+
+
+def _to_unicode(s):
+    if isinstance(s, str):
+        return s.decode('utf8')
+    return s
+
+
+def _build_index(stations, station_version):
+    by_name, by_code, by_short_name, by_english_name = {}, {}, {}, {}
+    for station in stations:
+        by_name.setdefault(station['name'], station)
+        by_code.setdefault(station['code'], station)
+        by_short_name.setdefault(station['short_name'], station)
+        by_english_name.setdefault(station['english_name'], station)
+    return _StationIndex(station_version, stations, by_name, by_code, by_short_name, by_english_name)
+
+
+class StationRegistry(object):
+    """
+    车站索引。每个 station_version 只加载一次车站列表，按名称、电报码、简拼、拼音查询车站。
+    station_version 变化时在后台线程重新加载，加载完成前继续使用旧版本的索引。
+    """
+
+    def __init__(self, loader=None):
+        """
+        :param loader 车站列表加载函数 loader(station_version)，默认为 TrainInfoQueryAPI().info_query_station_list
+        """
+        self.loader = loader
+        self._index = None
+        self._lock = threading.Lock()
+        self._refreshing = None
+
+    def _load(self, station_version, loader):
+        if loader is None:
+            loader = self.loader
+        if loader is None:
+            from .query import TrainInfoQueryAPI
+            loader = TrainInfoQueryAPI().info_query_station_list
+
+        stations = loader(station_version)
+        self.update(stations, station_version)
+        _logger.info('station registry loaded. version:%s stations:%s' % (station_version, len(stations)))
+
+    def _refresh_in_background(self, station_version, loader):
+        def refresh():
+            try:
+                self._load(station_version, loader)
+            except Exception as e:
+                _logger.warning('station registry refresh error. version:%s %s' % (station_version, e))
+            finally:
+                with self._lock:
+                    self._refreshing = None
+
+        with self._lock:
+            if self._refreshing is not None:
+                return
+            self._refreshing = station_version
+
+        t = threading.Thread(target=refresh, name='hack12306-station-registry')
+        t.daemon = True
+        t.start()
+
+    def _ensure(self, station_version=None, loader=None):
+        index = self._index
+        if index is None:
+            with self._lock:
+                index = self._index
+                if index is None:
+                    self._load(station_version, loader)
+                    index = self._index
+        elif station_version and station_version != index.version:
+            self._refresh_in_background(station_version, loader)
+        return index
+
+    def is_loaded(self, station_version=None):
+        """
+        是否已加载指定版本的车站列表
+        """
+        index = self._index
+        return index is not None and (not station_version or station_version == index.version)
+
+    def update(self, stations, station_version=None):
+        """
+        使用车站列表重建索引
+        :param stations 车站列表，同 info_query_station_list 返回值
+        :param station_version 版本号
+        """
+        self._index = _build_index(stations, station_version)
+
+    def refresh(self, station_version=None, loader=None):
+        """
+        重新加载车站列表
+        """
+        with self._lock:
+            self._load(station_version, loader)
+
+    @property
+    def version(self):
+        index = self._index
+        return index.version if index else None
+
+    def stations(self, station_version=None, loader=None):
+        return self._ensure(station_version, loader).stations
+
+    def get_by_name(self, name, station_version=None, loader=None):
+        return self._ensure(station_version, loader).by_name.get(_to_unicode(name))
+
+    def get_by_code(self, code, station_version=None, loader=None):
+        return self._ensure(station_version, loader).by_code.get(_to_unicode(code))
+
+    def get_by_short_name(self, short_name, station_version=None, loader=None):
+        return self._ensure(station_version, loader).by_short_name.get(_to_unicode(short_name))
+
+    def get_by_english_name(self, english_name, station_version=None, loader=None):
+        return self._ensure(station_version, loader).by_english_name.get(_to_unicode(english_name))
+
+
+station_registry = StationRegistry()
@@ -0,0 +1,347 @@
+# encoding: utf8
+"""
+timetable.py
+@author Meng.yangyang
+@description Local SQLite timetable built from train_list.js and queryByTrainNo
+@created Sun Oct 18 2026 22:48:31 GMT+0800 (CST)
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+
+from concurrent import futures
+
+from . import settings
+from .cache import _makedirs
+from .query import TrainInfoQueryAPI
+from .ratelimit import RateLimiter
+
+__all__ = ('TimetableStore', 'TimetableCrawler',)
+
+_logger = logging.getLogger('hack12306')
+
+_STATION_CODE_PATTERN = re.compile(r'^[A-Z]{3}$')
+
+_TRAIN_NO_URL = 'https://kyfw.12306.cn/otn/czxx/queryByTrainNo'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS trains (
+    train_no TEXT PRIMARY KEY,
+    train_code TEXT NOT NULL,
+    train_class TEXT,
+    from_station_name TEXT,
+    to_station_name TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stops (
+    train_no TEXT NOT NULL,
+    station_no INTEGER NOT NULL,
+    station_name TEXT NOT NULL,
+    station_code TEXT,
+    arrive_time TEXT,
+    start_time TEXT,
+    stopover_time TEXT,
+    arrive_day_offset INTEGER,
+    start_day_offset INTEGER,
+    PRIMARY KEY (train_no, station_no)
+);
+CREATE INDEX IF NOT EXISTS stops_station_name ON stops (station_name, train_no);
+CREATE INDEX IF NOT EXISTS stops_station_code ON stops (station_code, train_no);
+CREATE TABLE IF NOT EXISTS schedule (
+    train_date TEXT NOT NULL,
+    train_no TEXT NOT NULL,
+    PRIMARY KEY (train_date, train_no)
+);
+CREATE INDEX IF NOT EXISTS schedule_train_no ON schedule (train_no, train_date);
+CREATE TABLE IF NOT EXISTS dates (
+    train_date TEXT PRIMARY KEY,
+    trains INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+
+
+def _minutes(hhmm):
+    if not hhmm or ':' not in hhmm:
+        return None
+    hour, minute = hhmm.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def _time(value):
+    return None if not value or value == '----' else value
+
+
+def _parse_stops(stops):
+    """
+    解析 queryByTrainNo 返回的停靠站，按到达/出发时间推算跨天数
+    """
+    result = []
+    day_offset, last = 0, None
+    for i, stop in enumerate(stops):
+        # 始发站没有到达时间，终到站没有出发时间
+        times = [None if i == 0 else _time(stop.get('arrive_time')),
+                 None if i == len(stops) - 1 else _time(stop.get('start_time'))]
+        offsets = [None, None]
+        for j, value in enumerate(times):
+            minutes = _minutes(value)
+            if minutes is None:
+                continue
+            if last is not None and minutes < last:
+                day_offset += 1
+            last = minutes
+            offsets[j] = day_offset
+        result.append({
+            'station_no': int(stop.get('station_no') or i + 1),
+            'station_name': stop['station_name'],
+            'arrive_time': times[0],
+            'start_time': times[1],
+            'stopover_time': _time(stop.get('stopover_time')),
+            'arrive_day_offset': offsets[0],
+            'start_day_offset': offsets[1],
+        })
+    return result
+
+
+class TimetableStore(object):
+    """
+    SQLite 本地时刻表。停靠站按 train_no 保存（train_no 不变时刻表不变），
+    schedule 表记录每天开行的车次，stops 表按车站名称、电报码建立索引。
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path 数据库文件路径，默认 settings.TIMETABLE_DB，':memory:' 表示只保存在内存中
+        """
+        self.path = path or settings.TIMETABLE_DB
+        if self.path != ':memory:':
+            _makedirs(os.path.dirname(os.path.abspath(self.path)))
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def known_train_nos(self):
+        """
+        已保存停靠站的 train_no 集合
+        """
+        return set([row['train_no'] for row in self._query('SELECT train_no FROM trains')])
+
+    def save_train(self, train, stops, station_codes=None):
+        """
+        保存车次及停靠站
+        :param train info_query_trains 返回的车次
+        :param stops info_query_train_no 返回的停靠站
+        :param station_codes {车站名称: 电报码}
+        """
+        station_codes = station_codes or {}
+        rows = [(train['train_no'], stop['station_no'], stop['station_name'],
+                 station_codes.get(stop['station_name']), stop['arrive_time'], stop['start_time'],
+                 stop['stopover_time'], stop['arrive_day_offset'], stop['start_day_offset'])
+                for stop in _parse_stops(stops)]
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO trains VALUES (?, ?, ?, ?, ?, ?)', (
+                train['train_no'], train['train_code'], train.get('train_class'), train.get('from_station_name'),
+                train.get('to_station_name'), time.time()))
+            self._conn.execute('DELETE FROM stops WHERE train_no = ?', (train['train_no'],))
+            self._conn.executemany('INSERT INTO stops VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def save_schedule(self, train_date, train_nos):
+        """
+        替换某天开行的车次
+        """
+        train_nos = set(train_nos)
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM schedule WHERE train_date = ?', (train_date,))
+            self._conn.executemany('INSERT INTO schedule VALUES (?, ?)',
+                                   [(train_date, train_no) for train_no in train_nos])
+            self._conn.execute('INSERT OR REPLACE INTO dates VALUES (?, ?, ?)',
+                               (train_date, len(train_nos), time.time()))
+
+    def dates(self):
+        """
+        已保存的日期
+        :return JSON LIST，包含日期、车次数及更新时间
+        """
+        return self._query('SELECT * FROM dates ORDER BY train_date')
+
+    def prune(self, before_date):
+        """
+        删除 before_date 之前的开行记录，以及不再开行的车次
+        :return 删除的车次数
+        """
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM schedule WHERE train_date < ?', (before_date,))
+            self._conn.execute('DELETE FROM dates WHERE train_date < ?', (before_date,))
+            orphan = 'SELECT train_no FROM trains WHERE train_no NOT IN (SELECT train_no FROM schedule)'
+            self._conn.execute('DELETE FROM stops WHERE train_no IN (%s)' % orphan)
+            return self._conn.execute('DELETE FROM trains WHERE train_no NOT IN (SELECT train_no FROM schedule)') \
+                .rowcount
+
+    def stops(self, train_no):
+        """
+        车次停靠站
+        """
+        return self._query('SELECT * FROM stops WHERE train_no = ? ORDER BY station_no', (train_no,))
+
+    def timetable(self, train_date=None):
+        """
+        全部车次的停靠站，按 train_no、站序排序
+        :param train_date 只返回该日期开行的车次
+        :return JSON LIST，每个停靠站包含车次 train_code
+        """
+        sql = 'SELECT t.train_code, s.* FROM stops s JOIN trains t ON t.train_no = s.train_no'
+        params = []
+        if train_date is not None:
+            sql += ' WHERE s.train_no IN (SELECT train_no FROM schedule WHERE train_date = ?)'
+            params.append(train_date)
+        sql += ' ORDER BY s.train_no, s.station_no'
+        return self._query(sql, params)
+
+    @staticmethod
+    def _station(alias, station):
+        # 三个大写字母按电报码查询，否则按车站名称查询
+        column = 'station_code' if _STATION_CODE_PATTERN.match(station) else 'station_name'
+        return '%s.%s = ?' % (alias, column)
+
+    def station_trains(self, station, train_date=None):
+        """
+        经过车站的车次
+        :param station 车站名称或电报码
+        :param train_date 只返回该日期开行的车次
+        :return JSON LIST，按出发时间排序
+        """
+        sql = '''SELECT t.train_no, t.train_code, t.train_class, t.from_station_name, t.to_station_name,
+                        s.station_no, s.station_name, s.arrive_time, s.arrive_day_offset, s.start_time,
+                        s.start_day_offset
+                 FROM stops s JOIN trains t ON t.train_no = s.train_no
+                 WHERE %s''' % self._station('s', station)
+        params = [station]
+        if train_date is not None:
+            sql += ' AND s.train_no IN (SELECT train_no FROM schedule WHERE train_date = ?)'
+            params.append(train_date)
+        sql += ' ORDER BY COALESCE(s.start_day_offset, s.arrive_day_offset), COALESCE(s.start_time, s.arrive_time)'
+        return self._query(sql, params)
+
+    def trains_between(self, from_station, to_station, train_date=None):
+        """
+        依次停靠两个车站的车次
+        :param from_station 出发车站名称或电报码
+        :param to_station 到达车站名称或电报码
+        :param train_date 只返回该日期开行的车次
+        :return JSON LIST，按出发时间排序
+        """
+        sql = '''SELECT t.train_no, t.train_code, t.train_class,
+                        a.station_name AS from_station_name, a.station_no AS from_station_no,
+                        a.start_time, a.start_day_offset,
+                        b.station_name AS to_station_name, b.station_no AS to_station_no,
+                        b.arrive_time, b.arrive_day_offset
+                 FROM stops a
+                 JOIN stops b ON b.train_no = a.train_no AND b.station_no > a.station_no
+                 JOIN trains t ON t.train_no = a.train_no
+                 WHERE %s AND %s''' % (self._station('a', from_station), self._station('b', to_station))
+        params = [from_station, to_station]
+        if train_date is not None:
+            sql += ' AND a.train_no IN (SELECT train_no FROM schedule WHERE train_date = ?)'
+            params.append(train_date)
+        sql += ' ORDER BY a.start_day_offset, a.start_time'
+        return self._query(sql, params)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TimetableCrawler(object):
+    """
+    时刻表爬取。按日期获取车次列表，并发查询本地没有的 train_no 的停靠站，
+    已保存的 train_no 直接复用，因此每天的增量刷新只查询新增的车次。
+    """
+
+    def __init__(self, store=None, api=None, max_concurrency=None, rate_limiter=None):
+        """
+        :param store TimetableStore 实例，默认使用 settings.TIMETABLE_DB
+        :param api TrainInfoQueryAPI 实例
+        :param max_concurrency 最大并发查询数，默认 settings.TIMETABLE_CRAWL_CONCURRENCY
+        :param rate_limiter 限流器，默认按 settings.TIMETABLE_CRAWL_RATE_LIMIT 限制 queryByTrainNo，False 表示不限流
+        """
+        self.store = store or TimetableStore()
+        self.api = api or TrainInfoQueryAPI()
+        self.max_concurrency = max_concurrency or settings.TIMETABLE_CRAWL_CONCURRENCY
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(limits={'/otn/czxx/queryByTrainNo': settings.TIMETABLE_CRAWL_RATE_LIMIT},
+                                       account_limits={})
+        self.rate_limiter = None if rate_limiter is False else rate_limiter
+        self._station_codes = {}
+
+    def _station_code(self, station_name):
+        # 只在调用 crawl 的线程中查询，查询线程使用提交前解析好的电报码
+        if station_name not in self._station_codes:
+            try:
+                station = self.api.info_query_station_by_name(station_name)
+            except Exception as e:
+                _logger.warning('query station %s error. %s' % (station_name, e))
+                station = None
+            self._station_codes[station_name] = station['code'] if station else None
+        return self._station_codes[station_name]
+
+    def _fetch(self, train, train_date, from_station, to_station, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(_TRAIN_NO_URL, kwargs.get('cookies'))
+        return self.api.info_query_train_no(train['train_no'], from_station or '', to_station or '', train_date,
+                                            **kwargs)
+
+    def crawl(self, train_date, train_class=None, refresh=False, **kwargs):
+        """
+        爬取某天的时刻表
+        :param train_date 日期
+        :param train_class 只爬取指定类型（或类型列表，如 G、D）的车次
+        :param refresh 是否重新查询已保存的 train_no
+        :return JSON DICT，包含车次数、查询数、复用数及失败数
+        """
+        trains = list(self.api.info_query_trains_iter(train_date=train_date, train_class=train_class))
+        known = set() if refresh else self.store.known_train_nos()
+        pending = [train for train in trains if train['train_no'] not in known]
+        stats = {'trains': len(trains), 'fetched': 0, 'reused': len(trains) - len(pending), 'errors': 0}
+
+        failed = set()
+        if pending:
+            executor = futures.ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pending)))
+            fs = dict([(executor.submit(self._fetch, train, train_date, self._station_code(train['from_station_name']),
+                                        self._station_code(train['to_station_name']), **kwargs), train)
+                       for train in pending])
+            try:
+                # SQLite 写入在当前线程完成
+                for f in futures.as_completed(fs):
+                    train = fs[f]
+                    error = f.exception()
+                    if error is None and not f.result():
+                        error = 'empty stops'
+                    if error is not None:
+                        _logger.warning('query train %s error. %s' % (train['train_no'], error))
+                        failed.add(train['train_no'])
+                        stats['errors'] += 1
+                        continue
+                    stops = f.result()
+                    station_codes = dict([(stop['station_name'], self._station_code(stop['station_name']))
+                                          for stop in stops])
+                    self.store.save_train(train, stops, station_codes)
+                    stats['fetched'] += 1
+            finally:
+                for f in fs:
+                    f.cancel()
+                executor.shutdown(wait=False)
+
+        self.store.save_schedule(train_date, [train['train_no'] for train in trains
+                                              if train['train_no'] not in failed])
+        return stats
@@ -0,0 +1,467 @@
+# encoding: utf8
+"""
+transport.py
+@author Meng.yangyang
+@description Pluggable HTTP transports: requests, HTTP/2 multiplexing and an in-memory fake
+@created Sun Oct 18 2026 22:16:38 GMT+0800 (CST)
+"""
+
+import ssl
+import json
+import socket
+import urllib
+import urlparse
+import cookielib
+import threading
+import collections
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.packages.urllib3.poolmanager import PoolManager
+from requests.packages.urllib3.connection import HTTPConnection, VerifiedHTTPSConnection
+from requests.packages.urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from requests.packages.urllib3.util import connection
+
+try:
+    import hyper
+    from hyper.tls import init_context
+    from hyper.http20.exceptions import HTTP20Error
+except ImportError:
+    hyper = None
+
+from . import settings
+
+__all__ = ('BaseTransport', 'RequestsTransport', 'HTTP2Transport', 'FakeTransport', 'TransportRequest',
+           'TransportResponse',)
+
+TRANSPORT_REQUESTS = 'requests'
+TRANSPORT_HTTP2 = 'http2'
+
+_json_dumps = json.dumps
+
+
+def _encode_params(params):
+    if isinstance(params, dict):
+        params = params.items()
+
+    encoded_params = []
+    for k, v in params:
+        if v is None:
+            continue
+        if isinstance(v, unicode):
+            v = v.encode('utf8')
+        encoded_params.append((k, v))
+    return urllib.urlencode(encoded_params)
+
+
+def _prepare_request(method, url, params=None, data=None, json=None, headers=None, cookies=None):
+    """
+    按 requests 的规则生成请求地址、请求头和请求体
+    :return (url, headers, body)
+    """
+    headers = dict(headers or {})
+    if params:
+        query = params if isinstance(params, basestring) else _encode_params(params)
+        url = '%s%s%s' % (url, '&' if '?' in url else '?', query)
+
+    body = None
+    if json is not None:
+        body = _json_dumps(json)
+        headers.setdefault('Content-Type', 'application/json')
+    elif method == 'POST':
+        body = data if isinstance(data, basestring) else _encode_params(data or {})
+        headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+
+    if cookies:
+        headers['Cookie'] = '; '.join(['%s=%s' % (k, v) for k, v in cookies.items()])
+    return url, headers, body
+
+
+def _reuse_ratio(num_requests, num_connections):
+    if not num_requests:
+        return 0.0
+    return max(num_requests - num_connections, 0) / float(num_requests)
+
+
+TransportRequest = collections.namedtuple('TransportRequest', ('method', 'url', 'headers', 'body'))
+
+
+class TransportResponse(object):
+    """
+    HTTP 响应，提供与 requests.Response 相同的常用属性
+    """
+
+    def __init__(self, status_code, content, headers=None, url=None, history=None, request=None):
+        self.status_code = status_code
+        self.content = content or ''
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.url = url
+        self.history = history or []
+        self.request = request
+
+    def __repr__(self):
+        return '<Response [%s]>' % self.status_code
+
+    def iter_content(self, chunk_size=1):
+        chunk_size = chunk_size or len(self.content) or 1
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class BaseTransport(object):
+    """
+    HTTP 传输层。request 的参数与 requests.Session.request 的常用参数相同，
+    返回具有 status_code、content、headers、url、history 属性的响应。
+    """
+
+    # request 是否阻塞，异步客户端在线程池中调用阻塞的传输层
+    blocking = True
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, cookies=None, timeout=None,
+                allow_redirects=True, stream=False):
+        raise NotImplementedError
+
+    def pool_stats(self):
+        """
+        连接统计，格式同 TrainClient.pool_stats
+        """
+        return {'requests': 0, 'connections': 0, 'reuse_ratio': 0.0, 'open_connections': 0, 'hosts': {}}
+
+    def close(self):
+        pass
+
+
+class _RejectCookiePolicy(cookielib.DefaultCookiePolicy):
+    """
+    拒绝保存响应中的 Cookie，用户 Session 信息由调用方通过 cookies 参数传入
+    """
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+class _ResolvingConnectionMixin(object):
+    """
+    连接到 resolver 解析的地址，Host 头、SNI 及证书校验仍使用请求地址中的域名
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.resolver = kwargs.pop('resolver')
+        super(_ResolvingConnectionMixin, self).__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        extra_kw = {}
+        if self.source_address:
+            extra_kw['source_address'] = self.source_address
+        if self.socket_options:
+            extra_kw['socket_options'] = self.socket_options
+
+        ip, port = self.resolver(self.host, self.port)
+        try:
+            return connection.create_connection((ip, port), self.timeout, **extra_kw)
+        except socket.timeout:
+            raise ConnectTimeoutError(
+                self, 'Connection to %s (%s) timed out. (connect timeout=%s)' % (self.host, ip, self.timeout))
+        except socket.error as e:
+            raise NewConnectionError(self, 'Failed to establish a new connection to %s: %s' % (ip, e))
+
+
+class _ResolvingHTTPConnection(_ResolvingConnectionMixin, HTTPConnection):
+    pass
+
+
+class _ResolvingHTTPSConnection(_ResolvingConnectionMixin, VerifiedHTTPSConnection):
+    pass
+
+
+class _ResolvingPoolManager(PoolManager):
+
+    def __init__(self, resolver, *args, **kwargs):
+        self.resolver = resolver
+        super(_ResolvingPoolManager, self).__init__(*args, **kwargs)
+
+    def _new_pool(self, scheme, host, port):
+        pool = super(_ResolvingPoolManager, self)._new_pool(scheme, host, port)
+        pool.ConnectionCls = _ResolvingHTTPSConnection if scheme == 'https' else _ResolvingHTTPConnection
+        pool.conn_kw['resolver'] = self.resolver
+        return pool
+
+
+class _ResolvingAdapter(HTTPAdapter):
+
+    def __init__(self, resolver, **kwargs):
+        self.resolver = resolver
+        super(_ResolvingAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _ResolvingPoolManager(self.resolver, num_pools=connections, maxsize=maxsize,
+                                                 block=block, strict=True, **pool_kwargs)
+
+
+class RequestsTransport(BaseTransport):
+    """
+    基于 requests 的传输层，按主机维护 Keep-Alive 连接池
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None, persist_cookies=False,
+                 proxies=None, verify=None, cert=None, resolver=None, adapter=None):
+        """
+        :param pool_connections 缓存的主机连接池数量
+        :param pool_maxsize 每个主机保持的最大连接数
+        :param pool_block 连接数达到上限时是否阻塞等待
+        :param persist_cookies 是否保存响应中的 Cookie
+        :param proxies 代理，如 {'https': 'http://127.0.0.1:8080'}
+        :param verify 是否校验证书，或 CA 证书路径
+        :param cert 客户端证书路径，或 (证书, 私钥) 路径
+        :param resolver 域名解析函数 resolver(host, port) -> (ip, port)，默认使用系统 DNS
+        :param adapter requests HTTPAdapter 实例，指定时忽略连接池参数及 resolver
+        """
+        self.session = requests.Session()
+        if not persist_cookies:
+            self.session.cookies.set_policy(_RejectCookiePolicy())
+        if proxies:
+            self.session.proxies.update(proxies)
+        if verify is not None:
+            self.session.verify = verify
+        if cert:
+            self.session.cert = cert
+
+        if adapter is None:
+            pool_kwargs = {
+                'pool_connections': pool_connections or settings.HTTP_POOL_CONNECTIONS,
+                'pool_maxsize': pool_maxsize or settings.HTTP_POOL_MAXSIZE,
+                'pool_block': settings.HTTP_POOL_BLOCK if pool_block is None else pool_block,
+            }
+            adapter = _ResolvingAdapter(resolver, **pool_kwargs) if resolver else HTTPAdapter(**pool_kwargs)
+        self.adapter = adapter
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def pool_stats(self):
+        pools = self.adapter.poolmanager.pools
+        hosts = {}
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+
+            idle_connections = len([conn for conn in list(pool.pool.queue) if conn is not None and conn.sock])
+            active_connections = pool.pool.maxsize - pool.pool.qsize()
+            host = '%s://%s:%s' % (pool.scheme, pool.host, pool.port)
+            hosts[host] = {
+                'requests': pool.num_requests,
+                'connections': pool.num_connections,
+                'reuse_ratio': _reuse_ratio(pool.num_requests, pool.num_connections),
+                'idle_connections': idle_connections,
+                'active_connections': active_connections,
+                'open_connections': idle_connections + active_connections,
+            }
+
+        num_requests = sum([h['requests'] for h in hosts.values()])
+        num_connections = sum([h['connections'] for h in hosts.values()])
+        return {
+            'requests': num_requests,
+            'connections': num_connections,
+            'reuse_ratio': _reuse_ratio(num_requests, num_connections),
+            'open_connections': sum([h['open_connections'] for h in hosts.values()]),
+            'hosts': hosts,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+class HTTP2Transport(BaseTransport):
+    """
+    基于 hyper 的 HTTP/2 传输层（pip install hack12306[http2]）。
+    每个主机只建立一个连接，多个线程的并发请求作为不同的 stream 在同一连接上多路复用。
+
+    不支持 resolver 和流式下载（stream 参数），不保存响应中的 Cookie。
+    """
+
+    # 最多跟随的重定向次数
+    max_redirects = 10
+
+    def __init__(self, proxies=None, verify=None, cert=None, timeout=None):
+        """
+        :param proxies 代理，同 RequestsTransport
+        :param verify 是否校验证书，或 CA 证书路径
+        :param cert 客户端证书路径
+        :param timeout 连接及读写超时（秒），默认 settings.HTTP2_TIMEOUT，不支持按请求设置
+        """
+        if hyper is None:
+            raise ImportError('HTTP2Transport requires hyper, pip install hack12306[http2]')
+
+        self.proxies = proxies or {}
+        self.timeout = timeout or settings.HTTP2_TIMEOUT
+        self.ssl_context = init_context(cert_path=verify if isinstance(verify, basestring) else None, cert=cert)
+        if verify is False:
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+
+        self._connections = {}
+        self._stats = collections.defaultdict(collections.Counter)
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme, host, port):
+        key = (scheme, host, port)
+        conn = self._connections.get(key)
+        if conn is None:
+            with self._lock:
+                conn = self._connections.get(key)
+                if conn is None:
+                    proxy_host = proxy_port = None
+                    if self.proxies.get(scheme):
+                        proxy = urlparse.urlsplit(self.proxies[scheme])
+                        proxy_host, proxy_port = proxy.hostname, proxy.port
+                    secure = scheme == 'https'
+                    conn = self._connections[key] = hyper.HTTP20Connection(
+                        host, port, secure=secure, ssl_context=self.ssl_context if secure else None,
+                        proxy_host=proxy_host, proxy_port=proxy_port, timeout=self.timeout)
+                    self._stats[key]['connections'] += 1
+        return key, conn
+
+    def _discard(self, key, conn):
+        with self._lock:
+            if self._connections.get(key) is conn:
+                del self._connections[key]
+        conn.close()
+
+    def _send(self, method, url, headers, body):
+        parts = urlparse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        path = (parts.path or '/') + ('?%s' % parts.query if parts.query else '')
+
+        key, conn = self._connection(parts.scheme, parts.hostname, port)
+        with self._lock:
+            self._stats[key]['requests'] += 1
+        # HTTP20Connection 线程安全，并发请求共享同一连接
+        try:
+            stream_id = conn.request(method, path, body=body, headers=headers)
+            resp = conn.get_response(stream_id)
+            content = resp.read()
+        except socket.timeout as e:
+            self._discard(key, conn)
+            raise requests.Timeout(e)
+        except (socket.error, ssl.SSLError, HTTP20Error) as e:
+            self._discard(key, conn)
+            raise requests.ConnectionError(e)
+
+        resp_headers = CaseInsensitiveDict()
+        for name, value in resp.headers.iter_raw():
+            resp_headers[name] = '%s, %s' % (resp_headers[name], value) if name in resp_headers else value
+        return TransportResponse(resp.status, content, resp_headers, url,
+                                 request=TransportRequest(method, url, headers, body))
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, cookies=None, timeout=None,
+                allow_redirects=True, stream=False):
+        url, headers, body = _prepare_request(method, url, params, data, json, headers, cookies)
+
+        history = []
+        while True:
+            resp = self._send(method, url, headers, body)
+            location = resp.headers.get('Location')
+            if not allow_redirects or resp.status_code not in (301, 302, 303, 307, 308) or not location:
+                break
+            if len(history) >= self.max_redirects:
+                raise requests.TooManyRedirects('Exceeded %s redirects.' % self.max_redirects)
+
+            history.append(resp)
+            url = urlparse.urljoin(url, location)
+            if resp.status_code in (301, 302, 303) and method != 'HEAD':
+                method, body = 'GET', None
+                headers.pop('Content-Type', None)
+
+        resp.history = history
+        return resp
+
+    def pool_stats(self):
+        with self._lock:
+            hosts = {}
+            for (scheme, host, port), stats in self._stats.items():
+                hosts['%s://%s:%s' % (scheme, host, port)] = {
+                    'requests': stats['requests'],
+                    'connections': stats['connections'],
+                    'reuse_ratio': _reuse_ratio(stats['requests'], stats['connections']),
+                    'open_connections': 1 if (scheme, host, port) in self._connections else 0,
+                }
+
+        num_requests = sum([h['requests'] for h in hosts.values()])
+        num_connections = sum([h['connections'] for h in hosts.values()])
+        return {
+            'requests': num_requests,
+            'connections': num_connections,
+            'reuse_ratio': _reuse_ratio(num_requests, num_connections),
+            'open_connections': sum([h['open_connections'] for h in hosts.values()]),
+            'hosts': hosts,
+        }
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections.values(), {}
+        for conn in connections:
+            conn.close()
+
+
+class FakeTransport(BaseTransport):
+    """
+    内存中的传输层，按接口路径返回预设的响应并记录收到的请求，用于测试，例如：
+
+        transport = FakeTransport()
+        transport.add('/otn/leftTicket/query', {'status': True, 'data': {'result': [], 'map': {}}})
+        api = TrainInfoQueryAPI(client=TrainClient(transport=transport))
+    """
+
+    blocking = False
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def add(self, path, body='', status_code=200, headers=None, method=None):
+        """
+        :param path 接口路径，如 /otn/leftTicket/query
+        :param body 响应内容，dict/list 序列化为 JSON；可调用对象以 TransportRequest 为参数，返回响应内容或 TransportResponse
+        :param status_code HTTP 状态码
+        :param headers 响应头
+        :param method 请求方法，None 表示任意方法
+        """
+        self.routes[(method, path)] = (body, status_code, headers or {})
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, cookies=None, timeout=None,
+                allow_redirects=True, stream=False):
+        url, headers, body = _prepare_request(method, url, params, data, json, headers, cookies)
+        request = TransportRequest(method, url, headers, body)
+        with self._lock:
+            self.requests.append(request)
+
+        path = urlparse.urlsplit(url).path
+        route = self.routes.get((method, path)) or self.routes.get((None, path))
+        if route is None:
+            return TransportResponse(404, 'Not Found', url=url, request=request)
+
+        content, status_code, resp_headers = route
+        if callable(content):
+            content = content(request)
+            if isinstance(content, TransportResponse):
+                return content
+        if isinstance(content, (dict, list)):
+            content = _json_dumps(content)
+            resp_headers = dict(resp_headers, **{'Content-Type': 'application/json'})
+        return TransportResponse(status_code, content, resp_headers, url, request=request)
+
+    def pool_stats(self):
+        stats = super(FakeTransport, self).pool_stats()
+        stats['requests'] = len(self.requests)
+        return stats
@@ -11,18 +11,54 @@ import re
 
 from . import exceptions
 from . import constants
-from .base import TrainBaseAPI
+from .base import TrainBaseAPI, _Request, _endpoint, _data_item
 from .auth import check_login
 
 __all__ = ('TrainUserAPI', 'TrainMemberAPI',)
 
 
+def _parse_user_info(resp):
+    """
+    解析用户个人信息
+    """
+    resp_data = resp['data']
+    user = resp['data']['userDTO']
+    login_user = resp['data']['userDTO']['loginUserDTO']
+    return {
+        'user_type_name': resp_data['userTypeName'],
+        'pic_flag': resp_data['picFlag'],
+        'can_upload': resp_data['canUpload'],
+        'user_password': resp_data['userPassword'],
+        'is_mobile_check': resp_data['isMobileCheck'],
+        'country_name': resp_data['country_name'],
+        'user_name': login_user['user_name'],
+        'name': login_user['name'],
+        'id_type_code': login_user['id_type_code'],
+        'id_type_name': login_user['id_type_name'],
+        'id_no': login_user['id_no'],
+        'member_id': login_user['member_id'],
+        'member_level': login_user['member_level'],
+        'country_code': user['country_code'],
+        'sex': user['sex_code'],
+        'mobile_no': user['mobile_no'],
+        'email': user['email'],
+        'address': user['address'],
+        'is_active': user['is_active'],
+        'user_id': user['user_id'],
+        'user_status': user['user_status'],
+        'is_valid': user['is_valid'],
+        'need_modify_email': user['needModifyEmail'],
+        'birthday': resp_data['bornDateString'],
+    }
+
+
 class TrainUserAPI(TrainBaseAPI):
     """
     用户
     """
 
     @check_login
+    @_endpoint
     def user_info(self, **kwargs):
         """
         用户-个人信息
@@ -30,61 +66,27 @@ class TrainUserAPI(TrainBaseAPI):
         """
 
         url = 'https://kyfw.12306.cn/otn/modifyUser/initQueryUserInfoApi'
-        resp = self.submit(url, **kwargs)
-
-        resp_data = resp['data']
-        user = resp['data']['userDTO']
-        login_user = resp['data']['userDTO']['loginUserDTO']
-        result = {
-            'user_type_name': resp_data['userTypeName'],
-            'pic_flag': resp_data['picFlag'],
-            'can_upload': resp_data['canUpload'],
-            'user_password': resp_data['userPassword'],
-            'is_mobile_check': resp_data['isMobileCheck'],
-            'country_name': resp_data['country_name'],
-            'user_name': login_user['user_name'],
-            'name': login_user['name'],
-            'id_type_code': login_user['id_type_code'],
-            'id_type_name': login_user['id_type_name'],
-            'id_no': login_user['id_no'],
-            'member_id': login_user['member_id'],
-            'member_level': login_user['member_level'],
-            'country_code': user['country_code'],
-            'sex': user['sex_code'],
-            'mobile_no': user['mobile_no'],
-            'email': user['email'],
-            'address': user['address'],
-            'is_active': user['is_active'],
-            'user_id': user['user_id'],
-            'user_status': user['user_status'],
-            'is_valid': user['is_valid'],
-            'need_modify_email': user['needModifyEmail'],
-            'birthday': resp_data['bornDateString'],
-        }
-        return result
+        return _Request(url, handler=_parse_user_info, **kwargs)
 
     @check_login
+    @_endpoint
     def user_passengers(self, **kwargs):
         """
         用户-常用联系人信息
         :return JSON LIST
         """
         url = 'http://kyfw.12306.cn/otn/confirmPassenger/getPassengerDTOs'
-        resp = self.submit(url, method='POST', **kwargs)
-        if 'data' in resp and 'normal_passengers' in resp['data']:
-            return resp['data']['normal_passengers']
-        else:
-            return []
+        return _Request(url, handler=_data_item('normal_passengers', list), method='POST', **kwargs)
 
     @check_login
+    @_endpoint
     def user_addresses(self, **kwargs):
         """
         用户-地址
         :return JSON LIST
         """
         url = 'https://kyfw.12306.cn/otn/address/initApi'
-        resp = self.submit(url, method='POST', **kwargs)
-        return resp['data']['addresses']
+        return _Request(url, handler=lambda resp: resp['data']['addresses'], method='POST', **kwargs)
 
 
 class TrainMemberAPI(TrainBaseAPI):
@@ -15,7 +15,11 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/hack12306/hack12306",
     packages=setuptools.find_packages(),
-    install_requires=["requests>=2.12.4", "BeautifulSoup>=3.2.1"],
+    install_requires=["requests>=2.12.4", "BeautifulSoup>=3.2.1", "futures>=3.0; python_version < '3'"],
+    extras_require={
+        "async": ["tornado>=5.1,<6"],
+        "http2": ["hyper>=0.7.0"],
+    },
     classifiers=[
         "Programming Language :: Python :: 2",
         "License :: OSI Approved :: MIT License",
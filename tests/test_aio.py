@@ -0,0 +1,165 @@
+# encoding: utf8
+
+"""
+异步 API 测试
+"""
+
+import json
+import urlparse
+import threading
+import BaseHTTPServer
+import SocketServer
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from hack12306 import constants
+from hack12306 import exceptions
+from hack12306.aio import AsyncTrainClient, AsyncTrainInfoQueryAPI, AsyncTrainOrderAPI, AsyncTrainPayAPI, \
+    AsyncTrainUserAPI
+from hack12306.auth import login_state_cache
+from hack12306.mockserver import MockTrainServer
+
+COOKIES = {'JSESSIONID': 'A85E3C4D', 'tk': 'hASyOiZR'}
+
+
+def _left_ticket_row(train_num, train_name):
+    row = [''] * 36
+    row[0] = 'secret-%s' % train_num
+    row[1] = u'预订'
+    row[2] = train_num
+    row[3] = train_name
+    row[4], row[5] = 'VNP', 'AOH'
+    row[8], row[9], row[10] = '07:00', '11:29', '04:29'
+    row[30], row[31], row[32] = u'有', '5', u'无'
+    return u'|'.join(row)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, data):
+        body = json.dumps(data)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        if url.path == '/otn/leftTicket/query':
+            query = dict(urlparse.parse_qsl(url.query))
+            self._reply({'status': True, 'data': {
+                'result': [_left_ticket_row('240000G1010C', 'G101'), _left_ticket_row('240000G1030C', 'G103')],
+                'map': {query['leftTicketDTO.from_station']: u'北京南'},
+            }})
+        elif url.path == '/otn/confirmPassenger/queryOrderWaitTime':
+            self._reply({'status': False, 'messages': [u'用户未登录']})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.getheader('Content-Length') or 0))
+        if self.path == '/otn/login/conf':
+            is_login = 'Y' if 'tk=' in (self.headers.getheader('Cookie') or '') else 'N'
+            self._reply({'status': True, 'data': {'is_login': is_login}})
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def setup_module(module):
+    module.server = _Server(('127.0.0.1', 0), _Handler)
+    module.base_url = 'http://127.0.0.1:%s' % module.server.server_address[1]
+    t = threading.Thread(target=module.server.serve_forever)
+    t.daemon = True
+    t.start()
+
+
+def teardown_module(module):
+    module.server.shutdown()
+
+
+class TestAsyncTrainInfoQueryAPI(object):
+    """
+    测试异步信息查询
+    """
+
+    def test_info_query_left_tickets(self):
+        api = AsyncTrainInfoQueryAPI(client=AsyncTrainClient(base_url=base_url))
+        trains = IOLoop.current().run_sync(lambda: api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH'))
+        assert [train['train_name'] for train in trains] == ['G101', 'G103']
+        assert trains[0][constants.SEAT_TYPE_SECONDE_SEAT] == u'有'
+        assert trains[0][constants.SEAT_TYPE_FIRST_SEAT] == '5'
+
+    def test_concurrent_queries(self):
+        api = AsyncTrainInfoQueryAPI(client=AsyncTrainClient(max_clients=20, base_url=base_url))
+
+        @gen.coroutine
+        def query_all():
+            results = yield [api.info_query_left_tickets_v2('2019-02-%02d' % (i + 1), 'VNP', 'AOH')
+                             for i in range(20)]
+            raise gen.Return(results)
+
+        results = IOLoop.current().run_sync(query_all)
+        assert len(results) == 20
+        assert all([result['map'] == {'VNP': u'北京南'} for result in results])
+
+
+class TestAsyncCheckLogin(object):
+    """
+    测试异步登录检查
+    """
+
+    def setup_method(self, method):
+        login_state_cache.clear()
+
+    def test_not_login(self):
+        api = AsyncTrainOrderAPI(client=AsyncTrainClient(base_url=base_url))
+        future = api.order_confirm_passenger_query_order('token', cookies={'JSESSIONID': 'A85E3C4D'})
+        try:
+            IOLoop.current().run_sync(lambda: future)
+            assert False, 'TrainUserNotLogin expected'
+        except exceptions.TrainUserNotLogin:
+            pass
+
+    def test_invalidate_on_not_login(self):
+        api = AsyncTrainOrderAPI(client=AsyncTrainClient(base_url=base_url))
+        try:
+            IOLoop.current().run_sync(lambda: api.order_confirm_passenger_query_order('token', cookies=COOKIES))
+            assert False, 'TrainUserNotLogin expected'
+        except exceptions.TrainUserNotLogin:
+            pass
+        assert not login_state_cache.is_login(COOKIES)
+
+
+def test_order_and_pay():
+    login_state_cache.clear()
+
+    @gen.coroutine
+    def book(client, cookies):
+        train = (yield AsyncTrainInfoQueryAPI(client=client).info_query_left_tickets(
+            '2019-02-01', 'VNP', 'AOH', cache=False))[0]
+        order_api = AsyncTrainOrderAPI(client=client)
+        assert (yield order_api.order_submit_order(train['secret'], '2019-02-01', cookies=cookies))
+        confirm = yield order_api.order_confirm_passenger(cookies=cookies)
+        assert confirm['ticket_info']['queryLeftNewDetailDTO']['station_train_code'] == 'G1'
+
+        user_api = AsyncTrainUserAPI(client=client)
+        passengers = yield user_api.user_passengers(cookies=cookies)
+        assert passengers[0]['passenger_name']
+        orders = yield order_api.order_query_no_complete(cookies=cookies)
+        assert orders == []
+        try:
+            yield AsyncTrainPayAPI(client=client).pay_check_new(cookies={'JSESSIONID': 'A85E3C4D'})
+            assert False, 'TrainUserNotLogin expected'
+        except exceptions.TrainUserNotLogin:
+            pass
+
+    with MockTrainServer() as server:
+        client = AsyncTrainClient(base_url=server.base_url)
+        IOLoop.current().run_sync(lambda: book(client, server.login()))
+        assert server.stats['/otn/confirmPassenger/initDc']['requests'] == 1
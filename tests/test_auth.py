@@ -11,7 +11,9 @@ import json
 import base64
 from PIL import Image
 
-from hack12306.auth import TrainAuthAPI
+from hack12306 import exceptions
+from hack12306.auth import TrainAuthAPI, LoginStateCache, login_state_cache, login_trusted, check_login
+from hack12306.base import TrainBaseAPI
 from hack12306.user import TrainUserAPI
 
 
@@ -66,5 +68,70 @@ def test_loin_qr():
             os.remove(qr_img_path)
 
 
+class _FakeAPI(TrainBaseAPI):
+
+    def __init__(self, not_login=False):
+        super(_FakeAPI, self).__init__()
+        self.not_login = not_login
+
+    @check_login
+    def call(self, **kwargs):
+        if self.not_login:
+            raise exceptions.TrainUserNotLogin()
+        return True
+
+
+class TestCheckLogin(object):
+    """
+    测试登录检查缓存
+    """
+    cookies = {'JSESSIONID': 'A85E3C4D', 'tk': 'hASyOiZR'}
+
+    def setup_method(self, method):
+        login_state_cache.clear()
+        self.probes = []
+        self._auth_check_login = TrainAuthAPI.auth_check_login
+        TrainAuthAPI.auth_check_login = lambda api, cookies=None, **kwargs: self.probes.append(cookies) or True
+
+    def teardown_method(self, method):
+        TrainAuthAPI.auth_check_login = self._auth_check_login
+
+    def test_cache_ttl(self):
+        cache = LoginStateCache(ttl=60)
+        assert not cache.is_login(self.cookies)
+        cache.set_login(dict(self.cookies))
+        assert cache.is_login(self.cookies)
+        cache.invalidate(self.cookies)
+        assert not cache.is_login(self.cookies)
+
+        cache = LoginStateCache(ttl=0)
+        cache.set_login(self.cookies)
+        assert not cache.is_login(self.cookies)
+
+    def test_probe_cached(self):
+        api = _FakeAPI()
+        for _ in range(3):
+            assert api.call(cookies=self.cookies)
+        assert len(self.probes) == 1
+
+    def test_invalidate_on_not_login(self):
+        _FakeAPI().call(cookies=self.cookies)
+        assert login_state_cache.is_login(self.cookies)
+
+        try:
+            _FakeAPI(not_login=True).call(cookies=self.cookies)
+        except exceptions.TrainUserNotLogin:
+            pass
+        assert not login_state_cache.is_login(self.cookies)
+
+        _FakeAPI().call(cookies=self.cookies)
+        assert len(self.probes) == 2
+
+    def test_login_trusted(self):
+        with login_trusted():
+            assert _FakeAPI().call(cookies=self.cookies)
+        assert not self.probes
+
+
 if __name__ == '__main__':
     test_loin_qr()
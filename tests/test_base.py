@@ -0,0 +1,77 @@
+# encoding: utf8
+
+"""
+网络请求封装测试
+"""
+
+import json
+import threading
+import BaseHTTPServer
+import SocketServer
+
+from hack12306.base import TrainBaseAPI, TrainClient
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'status': True, 'data': {'path': self.path}})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'JSESSIONID=server-side; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def setup_module(module):
+    module.server = _Server(('127.0.0.1', 0), _Handler)
+    module.base_url = 'http://127.0.0.1:%s' % module.server.server_address[1]
+    t = threading.Thread(target=module.server.serve_forever)
+    t.daemon = True
+    t.start()
+
+
+def teardown_module(module):
+    module.server.shutdown()
+
+
+class TestTrainClient(object):
+    """
+    测试连接池
+    """
+
+    def test_connection_reuse(self):
+        client = TrainClient(pool_maxsize=2)
+        api = TrainBaseAPI(client=client)
+        for i in range(5):
+            resp = api.submit(base_url + '/otn/%s' % i, method='GET')
+            assert resp['data']['path'] == '/otn/%s' % i
+
+        stats = client.pool_stats()
+        assert stats['requests'] == 5
+        assert stats['connections'] == 1
+        assert stats['reuse_ratio'] == 0.8
+        assert stats['open_connections'] == 1
+        client.close()
+
+    def test_shared_client(self):
+        client = TrainClient()
+        TrainBaseAPI(client=client).submit(base_url + '/a', method='GET')
+        TrainBaseAPI(client=client).submit(base_url + '/b', method='GET')
+        assert client.pool_stats()['connections'] == 1
+        client.close()
+
+    def test_cookies_not_persisted(self):
+        client = TrainClient()
+        TrainBaseAPI(client=client).submit(base_url + '/a', method='GET', cookies={'tk': 'x'})
+        assert len(client.session.cookies) == 0
+        client.close()
@@ -0,0 +1,214 @@
+# encoding: utf8
+
+"""
+响应缓存测试
+"""
+
+import os
+import time
+import shutil
+import tempfile
+
+from tornado.ioloop import IOLoop
+
+from hack12306.aio import AsyncTrainClient, AsyncTrainInfoQueryAPI
+from hack12306.base import TrainClient
+from hack12306.cache import MemoryCache, DiskCache, ResourceCache
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.mockserver import MockTrainServer
+
+
+class TestMemoryCache(object):
+    """
+    测试进程内缓存
+    """
+
+    def test_ttl(self):
+        cache = MemoryCache()
+        cache.set('a', 'x', 0.05)
+        assert cache.get('a') == 'x'
+        time.sleep(0.06)
+        assert cache.get('a') is None
+
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1 and stats['expired'] == 1
+        assert stats['entries'] == 0 and stats['bytes'] == 0
+
+    def test_lru_bytes(self):
+        cache = MemoryCache(max_bytes=10)
+        cache.set('a', 'aaaa', 60)
+        cache.set('b', 'bbbb', 60)
+        assert cache.get('a') == 'aaaa'
+        cache.set('c', 'cccc', 60)
+        assert cache.get('b') is None
+        assert cache.get('a') == 'aaaa' and cache.get('c') == 'cccc'
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['bytes'] == 8
+
+        cache.set('d', 'd' * 11, 60)
+        assert cache.get('d') is None
+
+
+class TestDiskCache(object):
+    """
+    测试磁盘缓存
+    """
+
+    def setup_method(self, method):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.directory)
+
+    def test_persist(self):
+        cache = DiskCache(self.directory, max_bytes=10)
+        cache.set('a', 'aaaa', 60)
+        cache.set('b', 'bbbb', 0.05)
+        cache.set('c', 'cccc', 60)
+        assert cache.get('a') is None
+        time.sleep(0.06)
+
+        cache = DiskCache(self.directory, max_bytes=10)
+        assert len(cache) == 1
+        assert cache.get('c') == 'cccc'
+        assert cache.stats()['bytes'] == 4
+
+
+class TestResponseCache(object):
+    """
+    测试接口响应缓存
+    """
+
+    def test_query_cache(self):
+        with MockTrainServer() as server:
+            cache = MemoryCache()
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), cache=cache)
+
+            stops = api.info_query_train_no('240000G1010C', 'VNP', 'AOH', '2019-02-01')
+            assert api.info_query_train_no('240000G1010C', 'VNP', 'AOH', '2019-02-01') == stops
+            assert server.stats['/otn/czxx/queryByTrainNo']['requests'] == 1
+
+            # 跳过缓存
+            api.info_query_train_no('240000G1010C', 'VNP', 'AOH', '2019-02-01', cache=False)
+            assert server.stats['/otn/czxx/queryByTrainNo']['requests'] == 2
+
+            api.info_query_station_trains('2019-02-01', 'NKH')
+            api.info_query_station_trains('2019-02-01', 'NKH')
+            assert server.stats['/otn/czxx/query']['requests'] == 1
+
+            # 余票查询不缓存
+            api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            assert server.stats['/otn/leftTicket/query']['requests'] == 2
+
+            assert cache.stats()['hits'] == 2
+
+    def test_no_cache(self):
+        with MockTrainServer() as server:
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), cache=False)
+            api.info_query_train_search('G1')
+            api.info_query_train_search('G1')
+            assert server.stats['/search/v1/train/search']['requests'] == 2
+
+    def test_default_off(self):
+        # 默认不缓存，由调用方开启
+        with MockTrainServer() as server:
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url))
+            assert api.cache is None
+            api.info_query_train_search('G1')
+            api.info_query_train_search('G1')
+            assert server.stats['/search/v1/train/search']['requests'] == 2
+
+
+class TestResourceCache(object):
+    """
+    测试静态资源条件请求和本地副本
+    """
+
+    station_path = '/otn/resources/js/framework/station_name.js'
+    train_list_path = '/otn/resources/js/query/train_list.js'
+
+    def setup_method(self, method):
+        self.directory = tempfile.mkdtemp()
+        self.resource_cache = ResourceCache(self.directory)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.directory)
+
+    def api(self, server):
+        return TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), resource_cache=self.resource_cache)
+
+    def test_not_modified(self):
+        with MockTrainServer() as server:
+            api = self.api(server)
+            stations = api.info_query_station_list()
+            assert server.stats[self.station_path]['not_modified'] == 0
+
+            assert api.info_query_station_list() == stations
+            assert server.stats[self.station_path]['requests'] == 2
+            assert server.stats[self.station_path]['not_modified'] == 1
+
+            # 跳过条件请求
+            assert api.info_query_station_list(cache=False) == stations
+            assert server.stats[self.station_path]['not_modified'] == 1
+
+            trains = api.info_query_trains()
+            assert api.info_query_trains(train_class='G') == [train for train in trains if train['train_class'] == 'G']
+            assert server.stats[self.train_list_path]['not_modified'] == 1
+
+    def test_local_copy(self):
+        server = MockTrainServer().start()
+        api = self.api(server)
+        try:
+            stations = api.info_query_station_list()
+            trains = api.info_query_trains()
+        finally:
+            server.stop()
+
+        assert api.info_query_station_list() == stations
+        assert api.info_query_trains() == trains
+
+    def test_async(self):
+        server = MockTrainServer().start()
+        api = AsyncTrainInfoQueryAPI(client=AsyncTrainClient(base_url=server.base_url),
+                                     resource_cache=self.resource_cache)
+        run = IOLoop.current().run_sync
+        try:
+            stations = run(api.info_query_station_list)
+            trains = run(api.info_query_trains)
+            assert stations == self.api(server).info_query_station_list()
+            assert server.stats[self.station_path]['not_modified'] == 1
+
+            assert run(lambda: api.info_query_trains(train_class='G')) == \
+                [train for train in trains if train['train_class'] == 'G']
+            assert server.stats[self.train_list_path]['not_modified'] == 1
+        finally:
+            server.stop()
+
+        # 请求失败时读取本地副本
+        assert run(api.info_query_station_list) == stations
+        assert run(api.info_query_trains) == trains
+
+    def test_station_version(self):
+        with MockTrainServer() as server:
+            api = self.api(server)
+            api.info_query_station_list('1.0')
+            api.info_query_trains()
+            assert len(os.listdir(self.directory)) == 4
+
+            # 新版本保存完成后删除旧版本的副本，其他资源保留
+            api.info_query_station_list('1.1')
+            assert len(os.listdir(self.directory)) == 4
+            assert api.info_query_station_list('1.1')
+            assert server.stats[self.station_path]['not_modified'] == 1
+
+    def test_abandoned_download(self):
+        with MockTrainServer() as server:
+            api = self.api(server)
+            trains = api.info_query_trains_iter(chunk_size=64)
+            next(trains)
+            trains.close()
+            assert not [name for name in os.listdir(self.directory)]
+
+            api.info_query_trains()
+            assert len(os.listdir(self.directory)) == 2
@@ -0,0 +1,108 @@
+# encoding: utf8
+
+"""
+失败响应采集测试
+"""
+
+import os
+import time
+import gzip
+import json
+import shutil
+import tempfile
+
+from hack12306 import settings
+from hack12306 import exceptions
+from hack12306.base import TrainClient
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.capture import ResponseCapture, default_capture
+from hack12306.mockserver import MockTrainServer
+
+
+class _Response(object):
+
+    def __init__(self, content, status_code=502):
+        self.content = content
+        self.status_code = status_code
+
+
+def _files(directory):
+    return sorted([os.path.join(root, name) for root, dirs, names in os.walk(directory) for name in names])
+
+
+class TestResponseCapture(object):
+    """
+    测试失败响应采集
+    """
+
+    def setup_method(self, method):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.directory)
+
+    def test_ring_buffer(self):
+        capture = ResponseCapture(False, capacity=4, max_body=3, burst=100)
+        for i in range(6):
+            capture.capture('/otn/leftTicket/query', _Response('body%d' % i))
+        records = capture.recent()
+        assert [record['seq'] for record in records] == [3, 4, 5, 6]
+        assert records[-1]['body'] == 'bod' and records[-1]['size'] == 5
+        assert capture.recent(1)[0]['seq'] == 6
+        assert capture.stats()['overwritten'] == 2
+
+    def test_sample(self):
+        capture = ResponseCapture(False, burst=5, sample_rate=0)
+        captured = [capture.capture('/otn/leftTicket/query', _Response('x')) for i in range(50)]
+        assert 5 <= captured.count(True) <= 10
+        assert capture.stats()['sampled_out'] >= 40
+
+    def test_flush(self):
+        capture = ResponseCapture(self.directory, burst=100)
+        capture.capture('/otn/leftTicket/query', _Response(u'网络可能存在问题'.encode('utf8'), 200))
+        capture.capture('/otn/leftTicket/query', _Response('<h1>502 Bad Gateway</h1>'))
+        assert capture.flush() == 2
+        assert capture.flush() == 0
+
+        files = _files(self.directory)
+        assert len(files) == 1 and files[0].endswith('.jsonl.gz')
+        with gzip.open(files[0], 'rb') as f:
+            records = [json.loads(line) for line in f]
+        assert [record['status_code'] for record in records] == [200, 502]
+        assert records[0]['body'] == u'网络可能存在问题'
+
+    def test_max_bytes(self):
+        capture = ResponseCapture(self.directory, burst=100)
+        capture.capture('/otn/leftTicket/query', _Response('x' * 100))
+        capture.flush()
+        capture.max_bytes = os.path.getsize(_files(self.directory)[0]) * 2.5
+        for i in range(4):
+            time.sleep(0.01)
+            capture.capture('/otn/leftTicket/query', _Response('x' * 100))
+            capture.flush()
+        assert len(_files(self.directory)) == 2
+        assert capture.stats()['removed_files'] == 3
+
+    def test_background_flush(self):
+        capture = ResponseCapture(self.directory, flush_interval=0.05, burst=100)
+        capture.capture('/otn/leftTicket/query', _Response('x'))
+        time.sleep(0.2)
+        assert len(_files(self.directory)) == 1
+        capture.capture('/otn/leftTicket/query', _Response('y'))
+        capture.close()
+        assert len(_files(self.directory)) == 2
+        assert capture.stats()['pending'] == 0
+
+    def test_debug_resp(self):
+        debug, settings.DEBUG = settings.DEBUG, True
+        try:
+            with MockTrainServer(error_rate=1.0) as server:
+                api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), cache=False, policy=False)
+                try:
+                    api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+                    assert False, 'TrainRequestException expected'
+                except exceptions.TrainRequestException:
+                    pass
+        finally:
+            settings.DEBUG = debug
+        assert default_capture().recent(1)[0]['url'].endswith('/otn/leftTicket/query')
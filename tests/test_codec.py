@@ -0,0 +1,66 @@
+# encoding: utf8
+
+"""
+JSON 编解码测试
+"""
+
+import pytest
+
+from hack12306 import settings
+from hack12306.base import TrainClient
+from hack12306.codec import JSONCodec, get_codec, available_codecs, default_codec
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.mockserver import MockTrainServer
+
+
+class TestCodec(object):
+    """
+    测试 JSON 编解码选择
+    """
+
+    def test_available(self):
+        names = available_codecs()
+        assert names[-1] == 'json'
+        assert get_codec('auto').name == names[0]
+        assert get_codec('json') is get_codec('json')
+
+    def test_memoize(self, monkeypatch):
+        get_codec('auto')
+        imports = []
+        monkeypatch.setattr('importlib.import_module', lambda name: imports.append(name))
+        # auto 选中的编解码和未安装的库都不再重新导入
+        for i in range(3):
+            default_codec()
+            available_codecs()
+        assert imports == []
+
+    def test_loads_bytes(self):
+        for name in available_codecs():
+            content = get_codec(name).loads('{"status": true, "data": ["\xe5\x8c\x97\xe4\xba\xac\xe5\x8d\x97"]}')
+            assert content == {'status': True, 'data': [u'北京南']}
+
+    def test_default(self):
+        old = settings.JSON_CODEC
+        settings.JSON_CODEC = 'json'
+        try:
+            assert default_codec().name == 'json'
+        finally:
+            settings.JSON_CODEC = old
+
+        with pytest.raises(AssertionError):
+            get_codec('nonexistent')
+
+    def test_api_codec(self):
+        calls = []
+
+        def loads(content):
+            calls.append(content)
+            return get_codec('json').loads(content)
+
+        codec = JSONCodec('counting', loads, get_codec('json').dumps)
+        with MockTrainServer() as server:
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), cache=False, policy=False,
+                                    codec=codec)
+            trains = api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            assert trains[0]['train_name'] == 'G1'
+            assert len(calls) == 1 and isinstance(calls[0], str)
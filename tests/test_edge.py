@@ -0,0 +1,140 @@
+# encoding: utf8
+
+"""
+CDN 节点查询测试
+"""
+
+import time
+import random
+
+from hack12306 import exceptions
+from hack12306.edge import EdgeClient, EdgePool
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.ratelimit import RateLimiter
+from hack12306.mockserver import MockTrainServer, constant_latency
+
+
+def _address(server):
+    return '%s:%s' % server.httpd.server_address[:2]
+
+
+class TestEdgeClient(object):
+    """
+    测试固定节点的 HTTP 客户端
+    """
+
+    def test_pinned_https(self):
+        client = EdgeClient('1.2.3.4')
+        pool = client.adapter.poolmanager.connection_from_url('https://kyfw.12306.cn/otn/leftTicket/query')
+        # 连接使用节点 IP，Host 头及 SNI 使用域名
+        assert pool.host == 'kyfw.12306.cn' and pool.port == 443
+        assert pool.conn_kw['resolver']('kyfw.12306.cn', 443) == ('1.2.3.4', 443)
+        conn = pool._new_conn()
+        assert conn.host == 'kyfw.12306.cn' and conn.resolver(conn.host, conn.port) == ('1.2.3.4', 443)
+        client.close()
+
+    def test_pinned_http(self):
+        with MockTrainServer() as server, MockTrainServer() as edge:
+            client = EdgeClient(_address(edge), base_url=server.base_url)
+            resp = client.request('GET', 'https://kyfw.12306.cn/otn/resources/js/framework/station_name.js')
+            assert resp.status_code == 200
+            assert edge.stats['/otn/resources/js/framework/station_name.js']['requests'] == 1
+            assert server.stats['/otn/resources/js/framework/station_name.js']['requests'] == 0
+            client.close()
+
+
+class TestEdgePool(object):
+    """
+    测试 CDN 节点调度
+    """
+
+    def setup_method(self, method):
+        self.servers = [MockTrainServer(seed=i).start() for i in range(3)]
+
+    def teardown_method(self, method):
+        for server in self.servers:
+            server.stop()
+
+    def pool(self, **kwargs):
+        return EdgePool([_address(server) for server in self.servers], base_url=self.servers[0].base_url,
+                        **kwargs)
+
+    def requests(self):
+        return [server.stats['/otn/leftTicket/query']['requests'] for server in self.servers]
+
+    def test_spread(self):
+        # 固定随机选取的节点对，本机请求耗时有约 40ms 的波动，较慢的节点延迟需明显大于波动
+        random.seed(12306)
+        self.servers[1].cache_age = 30
+        self.servers[2].latency = constant_latency(0.2)
+        edges = self.pool(mode='spread')
+        api = TrainInfoQueryAPI(cache=False, policy=False, edges=edges)
+        for i in range(30):
+            assert api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')[0]['train_name'] == 'G1'
+
+        fresh, stale, slow = self.requests()
+        assert fresh + stale + slow == 30
+        assert fresh > stale and fresh > slow
+        stats = dict([(edge['address'], edge) for edge in edges.stats()])
+        assert stats[_address(self.servers[1])]['age'] > stats[_address(self.servers[0])]['age']
+        edges.close()
+
+    def test_race(self):
+        self.servers[0].latency = constant_latency(0.6)
+        self.servers[1].latency = constant_latency(0.6)
+        edges = self.pool(mode='race', fanout=3)
+        api = TrainInfoQueryAPI(cache=False, policy=False, edges=edges)
+        start = time.time()
+        api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        # 不等待较慢的节点，未开始的请求可能被取消
+        assert time.time() - start < 0.5
+        assert self.requests()[2] == 1
+        edges.close()
+
+    def test_cooldown(self):
+        self.servers[0].error_rate = 1.0
+        edges = self.pool(mode='spread', cooldown=60, max_errors=1)
+        api = TrainInfoQueryAPI(cache=False, policy=False, edges=edges)
+        errors = 0
+        for i in range(20):
+            try:
+                api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            except exceptions.TrainRequestException:
+                errors += 1
+        # 失败一次后不再选择该节点
+        assert errors == 1
+        assert self.servers[0].stats['/otn/leftTicket/query']['requests'] == 1
+        assert [stats['down'] for stats in edges.stats()] == [False, False, True]
+        edges.close()
+
+    def test_rate_limit(self):
+        edges = self.pool(mode='spread', cooldown=60, max_errors=1)
+        limiter = RateLimiter(limits={'/otn/leftTicket/query': (1, 1)}, policy='fail')
+        api = TrainInfoQueryAPI(cache=False, policy=False, edges=edges, rate_limiter=limiter)
+        limited = 0
+        for i in range(5):
+            try:
+                api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            except exceptions.TrainRateLimitException:
+                limited += 1
+        assert limited == 4
+        assert sum(self.requests()) == 1
+        # 本地限流不计为节点失败
+        assert [stats['errors'] for stats in edges.stats()] == [0, 0, 0]
+        assert not any([stats['down'] for stats in edges.stats()])
+        edges.close()
+
+    def test_api_error(self):
+        edges = self.pool(mode='spread', cooldown=60, max_errors=1)
+        api = TrainInfoQueryAPI(cache=False, policy=False, edges=edges)
+        for i in range(3):
+            try:
+                api.submit('https://kyfw.12306.cn/otn/leftTicket/query', [('leftTicketDTO.train_date', '2019')],
+                           method='GET')
+                assert False, 'TrainAPIException expected'
+            except exceptions.TrainAPIException:
+                pass
+        # 12306 的业务错误不计为节点失败
+        assert [stats['errors'] for stats in edges.stats()] == [0, 0, 0]
+        assert not any([stats['down'] for stats in edges.stats()])
+        edges.close()
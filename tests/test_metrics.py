@@ -0,0 +1,138 @@
+# encoding: utf8
+
+"""
+请求指标测试
+"""
+
+import time
+import urllib2
+
+from hack12306 import settings
+from hack12306 import exceptions
+from hack12306.base import TrainClient
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.order import TrainOrderAPI
+from hack12306.ratelimit import RateLimiter
+from hack12306.metrics import MetricsRegistry, registry, request_metrics, serve_metrics
+from hack12306.mockserver import MockTrainServer
+
+
+class TestMetricsRegistry(object):
+    """
+    测试指标注册表
+    """
+
+    def test_expose(self):
+        metrics = MetricsRegistry()
+        counter = metrics.counter('test_total', 'Test counter.', ('endpoint',))
+        histogram = metrics.histogram('test_seconds', 'Test histogram.', ('endpoint',), buckets=(0.1, 1))
+        counter.inc(('/a"b',))
+        counter.inc(('/a"b',), 2)
+        histogram.observe(('/a',), 0.05)
+        histogram.observe(('/a',), 0.5)
+        histogram.observe(('/a',), 5)
+
+        text = metrics.expose()
+        assert '# TYPE test_total counter' in text
+        assert 'test_total{endpoint="/a\\"b"} 3\n' in text
+        assert 'test_seconds_bucket{endpoint="/a",le="0.1"} 1\n' in text
+        assert 'test_seconds_bucket{endpoint="/a",le="1.0"} 2\n' in text
+        assert 'test_seconds_bucket{endpoint="/a",le="+Inf"} 3\n' in text
+        assert 'test_seconds_sum{endpoint="/a"} 5.55\n' in text
+        assert 'test_seconds_count{endpoint="/a"} 3\n' in text
+
+
+class TestRequestMetrics(object):
+    """
+    测试接口请求指标
+    """
+
+    def setup_method(self, method):
+        self.enabled, settings.METRICS_ENABLED = settings.METRICS_ENABLED, True
+        registry.clear()
+        self.server = MockTrainServer().start()
+        self.client = TrainClient(base_url=self.server.base_url)
+
+    def teardown_method(self, method):
+        settings.METRICS_ENABLED = self.enabled
+        registry.clear()
+        self.client.close()
+        self.server.stop()
+
+    def test_submit(self):
+        api = TrainInfoQueryAPI(client=self.client, cache=False)
+        api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        api.info_query_station_list()
+
+        labels = ('/otn/leftTicket/query', 'GET')
+        assert request_metrics.network_seconds.get(labels)[0] == 1
+        assert request_metrics.parse_seconds.get(labels)[0] == 1
+        assert request_metrics.requests.get(labels + ('200',)) == 1
+        assert request_metrics.bytes_in.get(labels) > 0
+
+        # 静态资源流式下载，按 Content-Length 统计接收字节数，解析耗时包含读取响应体
+        labels = ('/otn/resources/js/framework/station_name.js', 'GET')
+        assert request_metrics.parse_seconds.get(labels)[0] == 1
+        assert request_metrics.bytes_in.get(labels) > 0
+        api.info_query_trains()
+        assert request_metrics.parse_seconds.get(('/otn/resources/js/query/train_list.js', 'GET'))[0] == 1
+
+        cookies = self.server.login()
+        train = api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')[0]
+        order_api = TrainOrderAPI(client=self.client)
+        order_api.order_submit_order(train['secret'], '2019-02-01', cookies=cookies)
+        order_api.order_confirm_passenger(cookies=cookies)
+        assert request_metrics.parse_seconds.get(('/otn/confirmPassenger/initDc', 'POST'))[0] == 1
+
+        api.info_query_dishonest_getone(u'张三', '110101199001011234')
+        assert request_metrics.bytes_out.get(('/otn/queryDishonest/getOne', 'POST')) > 0
+
+    def test_exceptions(self):
+        api = TrainInfoQueryAPI(client=self.client, cache=False)
+        self.server.error_rate = 1.0
+        for i in range(3):
+            try:
+                api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+                assert False, 'TrainRequestException expected'
+            except exceptions.TrainRequestException:
+                pass
+        assert request_metrics.exceptions.get(
+            ('/otn/leftTicket/query', 'GET', 'TrainRequestException')) == 3
+
+        self.server.stop()
+        api = TrainInfoQueryAPI(client=TrainClient(base_url=self.server.base_url), cache=False)
+        try:
+            api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            assert False, 'ConnectionError expected'
+        except Exception:
+            pass
+        assert request_metrics.exceptions.get(('/otn/leftTicket/query', 'GET', 'ConnectionError')) == 1
+        assert request_metrics.network_seconds.get(('/otn/leftTicket/query', 'GET'))[0] == 4
+
+    def test_rate_limit_wait(self):
+        # 限流等待时间不计入网络耗时
+        limiter = RateLimiter(limits={'/otn/leftTicket/query': (5, 1)}, account_limits={})
+        api = TrainInfoQueryAPI(client=self.client, cache=False, rate_limiter=limiter)
+        start = time.time()
+        for i in range(2):
+            api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        assert time.time() - start >= 0.15
+        count, total = request_metrics.network_seconds.get(('/otn/leftTicket/query', 'GET'))
+        assert count == 2 and total < 0.15
+
+    def test_disabled(self):
+        settings.METRICS_ENABLED = False
+        TrainInfoQueryAPI(client=self.client, cache=False).info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        assert request_metrics.network_seconds.get(('/otn/leftTicket/query', 'GET'))[0] == 0
+
+    def test_serve_metrics(self):
+        TrainInfoQueryAPI(client=self.client, cache=False).info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        server = serve_metrics(0)
+        try:
+            resp = urllib2.urlopen('http://127.0.0.1:%s/metrics' % server.server_address[1])
+            assert resp.info().getheader('Content-Type').startswith('text/plain; version=0.0.4')
+            text = resp.read()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'hack12306_requests_total{endpoint="/otn/leftTicket/query",method="GET",status="200"} 1' in text
@@ -0,0 +1,167 @@
+# encoding: utf8
+
+"""
+本地模拟服务测试
+"""
+
+import time
+
+from hack12306 import constants
+from hack12306 import exceptions
+from hack12306 import settings
+from hack12306.base import TrainClient
+from hack12306.auth import TrainAuthAPI, login_state_cache, login_trusted
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.order import TrainOrderAPI
+from hack12306.user import TrainUserAPI
+from hack12306.pay import TrainPayAPI
+from hack12306.mockserver import MockTrainServer, constant_latency
+from hack12306.utils import gen_old_passenge_tuple, gen_passenger_ticket_tuple
+
+
+def setup_module(module):
+    module.debug, settings.DEBUG = settings.DEBUG, False
+
+
+def teardown_module(module):
+    settings.DEBUG = module.debug
+
+
+class TestMockTrainServer(object):
+    """
+    测试模拟服务
+    """
+
+    def setup_method(self, method):
+        login_state_cache.clear()
+        self.server = MockTrainServer(queue_wait=0.2, seed=1).start()
+        self.client = TrainClient(base_url=self.server.base_url)
+
+    def teardown_method(self, method):
+        self.client.close()
+        self.server.stop()
+
+    def test_qr_login(self):
+        auth_api = TrainAuthAPI(client=self.client)
+        cookies = auth_api.auth_init()
+        assert set(cookies.keys()) == set(['route', 'JSESSIONID', 'BIGipServerotn'])
+        assert not auth_api.auth_check_login(cookies=cookies)
+
+        qr = auth_api.auth_qr_get(cookies=cookies)
+        result = auth_api.auth_qr_check(qr['uuid'], cookies=cookies)
+        assert result['result_code'] == '2'
+
+        uamtk = auth_api.auth_uamtk(result['uamtk'], cookies=cookies)
+        uamauth = auth_api.auth_uamauth(uamtk['newapptk'], cookies=cookies)
+        cookies.update(tk=uamauth['apptk'])
+        assert auth_api.auth_check_login(cookies=cookies)
+
+    def test_query(self):
+        query_api = TrainInfoQueryAPI(client=self.client)
+        trains = query_api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        assert [train['train_name'] for train in trains] == ['G1', 'G101', 'G103']
+        assert trains[0]['departure_time'] == '09:00'
+        assert trains[0]['duration'] == '04:28'
+
+        stations = query_api.info_query_station_list()
+        assert u'北京南' in [station['name'] for station in stations]
+
+        stops = query_api.info_query_train_no('240000G1010C', 'VNP', 'AOH', '2019-02-01')
+        assert [stop['station_name'] for stop in stops][-1] == u'上海虹桥'
+
+    def test_order_and_pay(self):
+        cookies = self.server.login()
+        order_api = TrainOrderAPI(client=self.client)
+
+        train = TrainInfoQueryAPI(client=self.client).info_query_left_tickets('2019-02-01', 'VNP', 'AOH')[0]
+        assert order_api.order_submit_order(train['secret'], '2019-02-01', cookies=cookies)
+        confirm = order_api.order_confirm_passenger(cookies=cookies)
+        token, ticket_info = confirm['token'], confirm['ticket_info']
+        assert ticket_info['queryLeftNewDetailDTO']['station_train_code'] == 'G1'
+
+        passenger = TrainUserAPI(client=self.client).user_passengers(cookies=cookies)[0]
+        seat_type_code = dict(constants.SEAT_TYPE_CODE_MAP)[constants.SEAT_TYPE_SECONDE_SEAT]
+        passenger_ticket = ','.join(gen_passenger_ticket_tuple(
+            seat_type_code, passenger['passenger_flag'], passenger['passenger_type'], passenger['passenger_name'],
+            passenger['passenger_id_type_code'], passenger['passenger_id_no'], passenger['mobile_no']))
+        old_passenger = ','.join(gen_old_passenge_tuple(
+            passenger['passenger_name'], passenger['passenger_id_type_code'], passenger['passenger_id_no'],
+            passenger['passenger_type']))
+        assert order_api.order_confirm_passenger_check_order(
+            token, passenger_ticket, old_passenger, cookies=cookies)['submitStatus']
+        assert order_api.order_confirm_passenger_confirm_single_for_queue(
+            passenger_ticket, old_passenger, ticket_info['purpose_codes'], ticket_info['key_check_isChange'],
+            ticket_info['leftTicketStr'], ticket_info['train_location'], token, cookies=cookies)['submitStatus']
+
+        result = order_api.order_confirm_passenger_query_order(token, cookies=cookies)
+        assert result['waitTime'] > 0 and result['orderId'] is None
+        time.sleep(0.25)
+        result = order_api.order_confirm_passenger_query_order(token, cookies=cookies)
+        assert result['waitTime'] == -1 and result['orderId']
+
+        orders = order_api.order_query_no_complete(cookies=cookies)
+        assert orders[0]['sequence_no'] == result['orderId']
+
+        pay_form = TrainPayAPI(client=self.client).pay_check_new(cookies=cookies)['payForm']
+        assert pay_form['tranDataParsed']['order_id'] == result['orderId']
+
+    def test_session_expire(self):
+        self.server.session_ttl = 0.1
+        cookies = self.server.login()
+        user_api = TrainUserAPI(client=self.client)
+        assert user_api.user_info(cookies=cookies)
+
+        login_state_cache.clear()
+        time.sleep(0.15)
+        try:
+            user_api.user_info(cookies=cookies)
+            assert False, 'TrainUserNotLogin expected'
+        except exceptions.TrainUserNotLogin:
+            pass
+
+    def test_init_dc_redirect_not_login(self):
+        try:
+            TrainOrderAPI(client=self.client).order_confirm_passenger(cookies={'JSESSIONID': 'A85E3C4D'})
+            assert False, 'TrainUserNotLogin expected'
+        except exceptions.TrainUserNotLogin:
+            pass
+
+        with login_trusted():
+            try:
+                TrainOrderAPI(client=self.client).order_confirm_passenger(cookies={'tk': 'expired'})
+                assert False, 'TrainUserNotLogin expected'
+            except exceptions.TrainUserNotLogin:
+                pass
+
+    def test_fault_injection(self):
+        self.server.throttle_rate = {'/otn/leftTicket/': 1.0}
+        query_api = TrainInfoQueryAPI(client=self.client)
+        try:
+            query_api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            assert False, 'TrainRequestException expected'
+        except exceptions.TrainRequestException:
+            pass
+        assert self.server.stats['/otn/leftTicket/query']['throttled'] == 1
+        assert query_api.info_query_station_list()
+
+        self.server.throttle_rate = 0
+        self.server.error_rate = 1.0
+        for i in range(4):
+            try:
+                query_api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+                assert False, 'TrainRequestException expected'
+            except exceptions.TrainRequestException:
+                pass
+        assert self.server.stats['/otn/leftTicket/query']['errors'] == 4
+
+    def test_latency(self):
+        self.server.latency = {'/otn/leftTicket/': constant_latency(0.1)}
+        query_api = TrainInfoQueryAPI(client=self.client)
+
+        start = time.time()
+        query_api.info_query_station_list()
+        assert time.time() - start < 0.1
+
+        start = time.time()
+        query_api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        assert time.time() - start >= 0.1
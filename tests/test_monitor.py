@@ -0,0 +1,96 @@
+# encoding: utf8
+
+"""
+余票监控测试
+"""
+
+import datetime
+
+from hack12306 import constants
+from hack12306.base import TrainClient
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.monitor import LeftTicketMonitor, LeftTicketWatch
+from hack12306.mockserver import MockTrainServer
+
+SECOND_SEAT = constants.SEAT_TYPE_SECONDE_SEAT
+FIRST_SEAT = constants.SEAT_TYPE_FIRST_SEAT
+
+
+def _train(train_num, train_name, second_seat, first_seat=u'无'):
+    return {'train_num': train_num, 'train_name': train_name, SECOND_SEAT: second_seat, FIRST_SEAT: first_seat}
+
+
+class TestLeftTicketWatch(object):
+    """
+    测试余票变化检测和轮询间隔
+    """
+
+    def test_diff(self):
+        watch = LeftTicketWatch('2019-02-01', 'VNP', 'AOH', seat_types=[SECOND_SEAT, FIRST_SEAT])
+
+        events = watch.diff([_train('240000G1010C', 'G101', u'有'), _train('240000G1030C', 'G103', u'无')])
+        assert [(e.train_name, e.seat_type, e.have_ticket) for e in events] == [('G101', SECOND_SEAT, True)]
+
+        # 余票数量变化但有票状态不变，不产生事件
+        assert watch.diff([_train('240000G1010C', 'G101', u'5'), _train('240000G1030C', 'G103', u'*')]) == []
+
+        events = watch.diff([_train('240000G1010C', 'G101', u'5'), _train('240000G1030C', 'G103', u'3', u'1')])
+        assert sorted([(e.train_name, e.seat_type, e.left_ticket) for e in events]) == \
+            [('G103', FIRST_SEAT, u'1'), ('G103', SECOND_SEAT, u'3')]
+
+        events = watch.diff([_train('240000G1030C', 'G103', u'3', u'1')])
+        assert [(e.train_name, e.seat_type, e.have_ticket) for e in events] == [('G101', SECOND_SEAT, False)]
+        assert watch.polls == 4 and watch.events == 4
+
+    def test_train_names(self):
+        watch = LeftTicketWatch('2019-02-01', 'VNP', 'AOH', train_names=['G103'])
+        events = watch.diff([_train('240000G1010C', 'G101', u'有'), _train('240000G1030C', 'G103', u'有')])
+        assert [e.train_name for e in events] == ['G103']
+
+    def test_interval(self):
+        today = datetime.date(2019, 1, 20)
+        near = LeftTicketWatch('2019-01-21', 'VNP', 'AOH', min_interval=2, max_interval=32)
+        far = LeftTicketWatch('2019-02-10', 'VNP', 'AOH', min_interval=2, max_interval=32)
+        assert near.base_interval(today) == 4
+        assert far.base_interval(today) == 32
+
+        far.next_interval(today=today)
+        assert far.interval == 32
+        far.diff([_train('240000G1010C', 'G101', u'有')])
+        far.next_interval(today=today)
+        assert far.interval < 32
+
+        far.next_interval(error=True, today=today)
+        assert far.interval == 32
+        near.next_interval(today=today)
+        near.next_interval(error=True, today=today)
+        assert near.interval == 8
+        # 连续失败时间隔按基准间隔加倍
+        near.next_interval(error=True, today=today)
+        assert near.interval == 16
+        near.next_interval(error=True, today=today)
+        assert near.interval == 32
+
+
+class TestLeftTicketMonitor(object):
+    """
+    测试余票监控
+    """
+
+    def test_monitor(self):
+        with MockTrainServer(seed=1) as server:
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url))
+            with LeftTicketMonitor(api=api) as monitor:
+                watch = monitor.watch('2019-02-01', 'VNP', 'AOH', seat_types=[SECOND_SEAT],
+                                      min_interval=0.01, max_interval=0.05)
+                events = []
+                for event in monitor.iter_events(timeout=1):
+                    events.append(event)
+                    if len(events) >= 5:
+                        break
+                monitor.unwatch(watch)
+
+        assert len(events) == 5
+        assert all([event.seat_type == SECOND_SEAT for event in events])
+        assert watch.polls > 1 and watch.errors == 0
+        assert server.stats['/otn/leftTicket/query']['requests'] == watch.polls
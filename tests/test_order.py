@@ -7,8 +7,15 @@
 import json
 import copy
 
+import pytest
+
 from hack12306 import constants
-from hack12306.order import TrainOrderAPI
+from hack12306.base import TrainClient
+from hack12306 import exceptions
+from hack12306 import settings
+from hack12306.order import (TrainOrderAPI, BookingPipeline, OrderQueueWatcher,
+                             _parse_confirm_passenger, _parse_js_literal)
+from hack12306.mockserver import MockTrainServer
 from hack12306.query import TrainInfoQueryAPI
 from hack12306.user import TrainUserAPI
 from hack12306.utils import (tomorrow, JSONEncoder,
@@ -105,5 +112,147 @@ def test_order():
         print 'confirm passenger query order result. %s' % json.dumps(query_order_result, ensure_ascii=False, cls=JSONEncoder)
 
 
+INIT_DC_HTML = u"""<html><head><script>
+    var ctx='/otn/';
+    var globalRepeatSubmitToken = '6b3bd4a2c1f0e4d5a8b7c6d5e4f3a2b1';
+    var ticketInfoForPassengerForm={'cardTypes':[{'id':'1','value':'中国居民身份证'}],'isAsync':'1',
+        'key_check_isChange':'B1E9C5D0',leftDetails:['二等座(553.00元)有票'],'maxTicketNum':'5',
+        'queryLeftNewDetailDTO':{'station_train_code':'G1','note':'O\\'Hare \\u4e2d',"tip":"it's"},
+        'tour_flag':'dc','train_location':'P2','limit':null,'open':true,'price':553.0};
+    var orderRequestDTO={'train_no':'24000000G10I','station_train_code':'G1','ticket_num':0};
+</script></head><body>%s</body></html>
+""" % ('<div>filler</div>' * 2000)
+
+
+class TestParseConfirmPassenger(object):
+    """
+    测试 initDc 页面解析
+    """
+
+    def test_parse(self):
+        result = _parse_confirm_passenger(INIT_DC_HTML.encode('utf8'))
+        assert result['token'] == '6b3bd4a2c1f0e4d5a8b7c6d5e4f3a2b1'
+        assert result['ticket_info']['key_check_isChange'] == 'B1E9C5D0'
+        assert result['ticket_info']['leftDetails'] == [u'二等座(553.00元)有票']
+        assert result['ticket_info']['queryLeftNewDetailDTO']['note'] == u"O'Hare \u4e2d"
+        assert result['ticket_info']['queryLeftNewDetailDTO']['tip'] == u"it's"
+        assert result['ticket_info']['limit'] is None and result['ticket_info']['open'] is True
+        assert result['order_request_params'] == {'train_no': '24000000G10I', 'station_train_code': 'G1',
+                                                  'ticket_num': 0}
+
+    def test_chunks(self):
+        content = INIT_DC_HTML.encode('utf8')
+        expected = _parse_confirm_passenger(content)
+        for size in (1, 7, 64, 1000):
+            chunks = [content[i:i + size] for i in range(0, len(content), size)]
+            assert _parse_confirm_passenger(chunks) == expected
+
+    def test_stop_reading(self):
+        content = INIT_DC_HTML.encode('utf8')
+        consumed = []
+
+        def chunks():
+            for i in range(0, len(content), 256):
+                consumed.append(i)
+                yield content[i:i + 256]
+
+        _parse_confirm_passenger(chunks())
+        assert len(consumed) * 256 < content.index('</script>') + 256 * 2
+
+    def test_missing(self):
+        with pytest.raises(exceptions.TrainAPIException):
+            _parse_confirm_passenger(INIT_DC_HTML.encode('utf8').replace('var orderRequestDTO', 'var other'))
+
+    def test_js_literal(self):
+        assert _parse_js_literal(u"[1, -2.5e3, 'a\\nb', {x: \"y\"}]")[0] == [1, -2500.0, u'a\nb', {u'x': u'y'}]
+        with pytest.raises(ValueError):
+            _parse_js_literal(u"{a: foo}")
+
+
+class TestBookingPipeline(object):
+    """
+    测试订票流水线（本地模拟服务）
+    """
+
+    def test_run(self):
+        with MockTrainServer(queue_wait=0.3) as server:
+            client = TrainClient(base_url=server.base_url)
+            cookies = server.login()
+            train = TrainInfoQueryAPI(client=client).info_query_left_tickets('2019-02-01', 'VNP', 'AOH')[1]
+            passengers = TrainUserAPI(client=client).user_passengers(cookies=cookies)
+
+            login_checks = server.stats['/otn/login/conf']['requests']
+            pipeline = BookingPipeline(passengers, seat_type, cookies, api=TrainOrderAPI(client=client))
+            result = pipeline.run(train['secret'], '2019-02-01')
+
+            assert result.order_id == server.sessions[cookies['JSESSIONID']].orders[0]['order_id']
+            assert result.timings.keys() == list(BookingPipeline.steps)
+            assert result.timings['query_order'] >= 0.3
+            assert result.queue_polls >= 2
+            assert sum(result.timings.values()) <= result.elapsed
+            assert server.stats['/otn/login/conf']['requests'] == login_checks
+
+
+class TestOrderQueueWatcher(object):
+    """
+    测试排队等待监控（本地模拟服务）
+    """
+
+    def _submit(self, server, client, accounts):
+        train = TrainInfoQueryAPI(client=client).info_query_left_tickets('2019-02-01', 'VNP', 'AOH')[0]
+        orders = []
+        for i in range(accounts):
+            cookies = server.login()
+            passengers = TrainUserAPI(client=client).user_passengers(cookies=cookies)
+            pipeline = BookingPipeline(passengers, seat_type, cookies, api=TrainOrderAPI(client=client))
+            orders.append((pipeline.submit(train['secret'], '2019-02-01'), cookies))
+        return orders
+
+    def test_watch(self):
+        with MockTrainServer(queue_wait=0.3, seed=1) as server:
+            client = TrainClient(base_url=server.base_url)
+            orders = self._submit(server, client, 3)
+            with OrderQueueWatcher(api=TrainOrderAPI(client=client)) as watcher:
+                fs = [watcher.watch(token, cookies) for token, cookies in orders]
+                results = [f.result(timeout=5) for f in fs]
+
+            for (token, cookies), result in zip(orders, results):
+                assert result.order_id == server.sessions[cookies['JSESSIONID']].orders[0]['order_id']
+                assert result.elapsed > 0 and result.polls >= 1
+            assert watcher.stats()['orders'] == 3
+            assert server.stats['/otn/confirmPassenger/resultOrderForDcQueue']['requests'] == 3
+
+    def test_backoff_under_pressure(self, monkeypatch):
+        monkeypatch.setattr(settings, 'ORDER_QUEUE_MIN_POLL_INTERVAL', 0.05)
+        monkeypatch.setattr(settings, 'ORDER_QUEUE_MAX_BACKOFF', 0.5)
+        with MockTrainServer(queue_wait=0.3, seed=1) as server:
+            client = TrainClient(base_url=server.base_url)
+            orders = self._submit(server, client, 2)
+            server.error_rate = {'/otn/confirmPassenger/queryOrderWaitTime': 0.5}
+            with OrderQueueWatcher(api=TrainOrderAPI(client=client)) as watcher:
+                results = [f.result(timeout=30) for f in [watcher.watch(token, cookies) for token, cookies in orders]]
+            assert all([result.order_id for result in results])
+            assert server.stats['/otn/confirmPassenger/queryOrderWaitTime']['errors'] > 0
+            assert watcher.pressure > 0
+
+    def test_timeout(self):
+        with MockTrainServer(queue_wait=10) as server:
+            client = TrainClient(base_url=server.base_url)
+            token, cookies = self._submit(server, client, 1)[0]
+            with OrderQueueWatcher(api=TrainOrderAPI(client=client), timeout=0.3) as watcher:
+                with pytest.raises(exceptions.TrainAPIException):
+                    watcher.watch(token, cookies).result(timeout=5)
+
+    def test_stop(self):
+        with MockTrainServer(queue_wait=10) as server:
+            client = TrainClient(base_url=server.base_url)
+            token, cookies = self._submit(server, client, 1)[0]
+            with OrderQueueWatcher(api=TrainOrderAPI(client=client)) as watcher:
+                future = watcher.watch(token, cookies)
+            # 停止后未完成的订单不再一直等待
+            with pytest.raises(exceptions.TrainAPIException):
+                future.result(timeout=5)
+
+
 if __name__ == '__main__':
     test_order()
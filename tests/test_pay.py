@@ -7,9 +7,14 @@
 import os
 import json
 import copy
+import base64
 import platform
+
+import pytest
+
 from hack12306 import constants
-from hack12306.pay import TrainPayAPI
+from hack12306 import exceptions
+from hack12306.pay import TrainPayAPI, _parse_tran_data
 from hack12306.utils import tomorrow, JSONEncoder
 
 from config import COOKIES, PUBLIC_IP_ADDR, ORDER_SEQUENCE_NO
@@ -71,5 +76,58 @@ def test_pay():
                 os.remove(pay_filepath)
 
 
+TRAN_DATA_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<Request>
+  <interfaceVersion>1.0</interfaceVersion>
+  <interfaceName>WEBPAY</interfaceName>
+  <orderDate>20190201100000</orderDate>
+  <orderTimeoutDate>20190201103000</orderTimeoutDate>
+  <orderId>E729662637</orderId>
+  <amount>55300</amount>
+  <appId>0001</appId>
+  <curType>156</curType>
+  <merURL>https://kyfw.12306.cn/otn/payOrder/paySuccess</merURL>
+  <appURL>https://kyfw.12306.cn/otn/</appURL>
+  <innerURL>https://kyfw.12306.cn/otn/payOrder/paySuccess</innerURL>
+  <merVAR>http://www.12306.cn</merVAR>
+  <transType>01</transType>
+  <paymentLinkType>1</paymentLinkType>
+</Request>
+'''
+
+
+class TestParseTranData(object):
+    """
+    测试 tranData 解析
+    """
+
+    def test_parse(self):
+        result = _parse_tran_data(base64.b64encode(TRAN_DATA_XML))
+        assert result == {
+            'interface_version': '1.0',
+            'interface_name': 'WEBPAY',
+            'order_date': '20190201100000',
+            'order_timeout_date': '20190201103000',
+            'order_id': 'E729662637',
+            'amount': '55300',
+            'app_id': '0001',
+            'cur_type': '156',
+            'mer_url': 'https://kyfw.12306.cn/otn/payOrder/paySuccess',
+            'app_url': 'https://kyfw.12306.cn/otn/',
+            'inner_url': 'https://kyfw.12306.cn/otn/payOrder/paySuccess',
+            'mer_var': 'http://www.12306.cn',
+            'trans_type': '01',
+        }
+
+    def test_single_line(self):
+        result = _parse_tran_data(base64.b64encode(TRAN_DATA_XML.replace('\n', '')))
+        assert result['mer_url'] == 'https://kyfw.12306.cn/otn/payOrder/paySuccess'
+        assert result['mer_var'] == 'http://www.12306.cn'
+
+    def test_missing_field(self):
+        with pytest.raises(exceptions.TrainAPIException):
+            _parse_tran_data(base64.b64encode(TRAN_DATA_XML.replace('<amount>55300</amount>', '')))
+
+
 if __name__ == '__main__':
     test_pay()
@@ -0,0 +1,116 @@
+# encoding: utf8
+
+"""
+请求重试与对冲测试
+"""
+
+import time
+
+from hack12306 import exceptions
+from hack12306.base import TrainClient
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.policy import RequestPolicy, LatencyTracker
+from hack12306.mockserver import MockTrainServer
+
+
+class TestLatencyTracker(object):
+    """
+    测试耗时分位数
+    """
+
+    def test_quantile(self):
+        latency = LatencyTracker(window=100, min_samples=10)
+        for i in range(5):
+            latency.observe('a', i)
+        assert latency.quantile('a', 0.95) is None
+
+        for i in range(200):
+            latency.observe('a', i)
+        assert latency.quantile('a', 0.95) == 195
+        assert latency.quantile('a', 1) == 199
+
+
+class TestRequestPolicy(object):
+    """
+    测试请求策略
+    """
+
+    def test_retry(self):
+        calls = []
+
+        def func():
+            calls.append(time.time())
+            if len(calls) < 3:
+                raise exceptions.TrainRequestException()
+            return 'ok'
+
+        policy = RequestPolicy(retries=2, backoff=0.01, hedge=False)
+        assert policy.call('a', func) == 'ok'
+        assert len(calls) == 3
+        assert policy.stats()['retries'] == 2
+
+        del calls[:]
+        policy = RequestPolicy(retries=1, backoff=0.01, hedge=False)
+        try:
+            policy.call('a', func)
+            assert False, 'TrainRequestException expected'
+        except exceptions.TrainRequestException:
+            pass
+        assert len(calls) == 2
+
+    def test_no_retry(self):
+        calls = []
+
+        def func():
+            calls.append(time.time())
+            raise exceptions.TrainAPIException()
+
+        policy = RequestPolicy(retries=3, backoff=0.01, hedge=False)
+        try:
+            policy.call('a', func)
+            assert False, 'TrainAPIException expected'
+        except exceptions.TrainAPIException:
+            pass
+        assert len(calls) == 1
+
+    def test_hedge(self):
+        latencies = [0.5]
+
+        def latency(rng):
+            return latencies.pop() if latencies else 0
+
+        policy = RequestPolicy(retries=0, hedge=True, hedge_delay=0.05)
+        with MockTrainServer(latency={'/otn/leftTicket/': latency}) as server:
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), policy=policy)
+            start = time.time()
+            trains = api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            assert time.time() - start < 0.3
+            assert trains[0]['train_name'] == 'G1'
+            assert server.stats['/otn/leftTicket/query']['requests'] == 2
+            assert policy.stats()['hedges'] == 1 and policy.stats()['hedge_wins'] == 1
+
+            # 未超过对冲延迟时不发送对冲请求
+            api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            assert server.stats['/otn/leftTicket/query']['requests'] == 3
+            assert policy.stats()['hedges'] == 1
+        policy.close()
+
+    def test_api_retry(self):
+        policy = RequestPolicy(retries=2, backoff=0.01)
+        with MockTrainServer(error_rate={'/otn/leftTicket/': 1.0}) as server:
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), policy=policy)
+            try:
+                api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+                assert False, 'TrainRequestException expected'
+            except exceptions.TrainRequestException:
+                pass
+            assert server.stats['/otn/leftTicket/query']['errors'] == 3
+
+            # POST 请求不重试
+            server.error_rate = 1.0
+            try:
+                api.info_query_dishonest_getone(u'张三', '110101199001011234')
+                assert False, 'TrainRequestException expected'
+            except exceptions.TrainRequestException:
+                pass
+            assert server.stats['/otn/queryDishonest/getOne']['errors'] == 1
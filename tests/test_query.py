@@ -1,12 +1,15 @@
 # encoding: utf8
 
 import json
+import time
 import pytest
 import urllib
 import datetime
+import threading
 
+from hack12306 import constants
 from hack12306 import exceptions
-from hack12306.query import TrainInfoQueryAPI
+from hack12306.query import TrainInfoQueryAPI, LeftTicket, _parse_left_tickets, _iter_trains
 from hack12306.utils import tomorrow, today
 
 from config import COOKIES
@@ -76,3 +79,125 @@ class TestTrainInfoQueryAPI(object):
         result = train_info_query_api.info_query_trains()
         assert isinstance(result, list)
         print json.dumps(result[0], ensure_ascii=False)
+
+
+class _FakeLeftTicketsAPI(TrainInfoQueryAPI):
+
+    def __init__(self):
+        super(_FakeLeftTicketsAPI, self).__init__()
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def info_query_left_tickets(self, train_date, from_station, to_station, purpose_codes='ADULT', **kwargs):
+        with self.lock:
+            self.calls.append((train_date, from_station, to_station))
+            self.running += 1
+            self.max_running = max(self.running, self.max_running)
+        try:
+            time.sleep(0.05)
+            if to_station == 'ERR':
+                raise exceptions.TrainRequestException('response is not valid json type')
+            return [{'train_name': 'G101', 'train_date': train_date}]
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class TestLeftTicketsBatch(object):
+    """
+    测试批量余票查询
+    """
+
+    def test_dedup_and_concurrency(self):
+        api = _FakeLeftTicketsAPI()
+        queries = [('2019-02-%02d' % (i % 6 + 1), 'VNP', 'SHH') for i in range(12)]
+        results = list(api.info_query_left_tickets_batch(queries, max_concurrency=3))
+
+        assert len(results) == 6
+        assert len(api.calls) == 6
+        assert api.max_running == 3
+        assert all([result.error is None and result.trains[0]['train_date'] == result.train_date
+                    for result in results])
+
+    def test_item_error(self):
+        api = _FakeLeftTicketsAPI()
+        queries = [('2019-02-01', 'VNP', 'SHH'), ('2019-02-01', 'VNP', 'ERR')]
+        results = dict([(result.to_station, result) for result in api.info_query_left_tickets_batch(queries)])
+
+        assert results['SHH'].error is None
+        assert results['ERR'].trains is None
+        assert isinstance(results['ERR'].error, exceptions.TrainRequestException)
+
+
+def _left_ticket_row():
+    row = [u''] * 36
+    row[0], row[1], row[2], row[3] = u'secret-G101', u'预订', u'240000G1010C', u'G101'
+    row[4], row[5], row[8], row[9], row[10] = u'VNP', u'AOH', u'07:00', u'11:29', u'04:29'
+    row[26], row[30], row[31], row[32] = u'无', u'有', u'5', u'无'
+    return u'|'.join(row)
+
+
+class TestLeftTicket(object):
+    """
+    测试余票记录
+    """
+    resp = {
+        'status': True,
+        'data': {
+            'result': [_left_ticket_row()],
+            'map': {'VNP': u'北京南'},
+        }
+    }
+
+    def test_to_dict(self):
+        trains = _parse_left_tickets(self.resp)['trains']
+        compact_trains = _parse_left_tickets(self.resp, compact=True)['trains']
+        assert isinstance(compact_trains[0], LeftTicket)
+        assert compact_trains[0].to_dict() == trains[0]
+
+    def test_lazy_access(self):
+        train = _parse_left_tickets(self.resp, compact=True)['trains'][0]
+        assert train._cols is None
+        assert train.secret == u'secret-G101'
+        assert train._cols is None
+
+        assert train.train_name == 'G101'
+        assert train.departure_time == '07:00'
+        assert train.second_seat == train[constants.SEAT_TYPE_SECONDE_SEAT] == u'有'
+        assert train.have_ticket(constants.SEAT_TYPE_FIRST_SEAT)
+        assert not train.have_ticket(constants.SEAT_TYPE_BUSINESS_SEAT)
+        assert train.get('unknown') is None
+
+
+TRAIN_LIST_JS = (
+    'var train_list ={"2019-02-01":{"D":[{"station_train_code":"D1(北京-沈阳)","train_no":"24000000D10R"},'
+    '{"station_train_code":"D2(沈阳-北京)","train_no":"12000000D20A"}],'
+    '"G":[{"train_no":"24000000G10I","station_train_code":"G1(北京南-上海)"}]},'
+    '"2019-02-02":{"G":[{"station_train_code":"G1(北京南-上海)","train_no":"24000000G10I"}]}}'
+)
+
+
+def _chunks(s, size):
+    return [s[i:i + size] for i in range(0, len(s), size)]
+
+
+class TestTrainListParser(object):
+    """
+    测试车次列表流式解析
+    """
+
+    def test_iter_trains(self):
+        trains = list(_iter_trains(_chunks(TRAIN_LIST_JS, 7)))
+        assert list(_iter_trains([TRAIN_LIST_JS])) == trains
+        assert [(t['train_date'], t['train_class'], t['train_code']) for t in trains] == [
+            ('2019-02-01', 'D', 'D1'), ('2019-02-01', 'D', 'D2'), ('2019-02-01', 'G', 'G1'), ('2019-02-02', 'G', 'G1')]
+        assert trains[0]['from_station_name'] == u'北京'
+        assert trains[0]['to_station_name'] == u'沈阳'
+        assert trains[0]['train_no'] == u'24000000D10R'
+        assert trains[2]['train_no'] == u'24000000G10I'
+
+    def test_filter(self):
+        trains = list(_iter_trains(_chunks(TRAIN_LIST_JS, 16), train_date='2019-02-01', train_class=['G']))
+        assert [(t['train_date'], t['train_code']) for t in trains] == [('2019-02-01', 'G1')]
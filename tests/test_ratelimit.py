@@ -0,0 +1,123 @@
+# encoding: utf8
+
+"""
+接口限流测试
+"""
+
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+from hack12306 import exceptions
+from hack12306.base import TrainClient
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.ratelimit import RateLimiter, MemoryBucketBackend, FileBucketBackend
+from hack12306.mockserver import MockTrainServer
+
+URL = 'https://kyfw.12306.cn/otn/leftTicket/query'
+
+
+def _acquire_many(directory, n, queue):
+    limiter = RateLimiter({'/otn/leftTicket/query': (0.01, 5)}, {}, FileBucketBackend(directory), 'fail')
+    acquired = 0
+    for i in range(n):
+        try:
+            limiter.acquire(URL)
+            acquired += 1
+        except exceptions.TrainRateLimitException:
+            pass
+    queue.put(acquired)
+
+
+class TestRateLimiter(object):
+    """
+    测试令牌桶限流
+    """
+
+    def setup_method(self, method):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.directory)
+
+    def test_wait(self):
+        limiter = RateLimiter({'/otn/leftTicket/query': (20, 2)}, {}, MemoryBucketBackend(), 'wait')
+        start = time.time()
+        assert limiter.acquire(URL) == 0
+        assert limiter.acquire(URL) == 0
+        assert limiter.acquire(URL) > 0
+        assert limiter.acquire(URL) > 0
+        assert 0.09 <= time.time() - start < 0.2
+
+        # 未配置的接口不限流
+        assert limiter.acquire('https://kyfw.12306.cn/otn/login/conf') == 0
+
+    def test_max_wait(self):
+        limiter = RateLimiter({'/otn/leftTicket/query': (1, 1)}, {}, MemoryBucketBackend(), 'wait', max_wait=0.5)
+        limiter.acquire(URL)
+        try:
+            limiter.acquire(URL)
+            assert False, 'TrainRateLimitException expected'
+        except exceptions.TrainRateLimitException:
+            pass
+
+    def test_fail(self):
+        limiter = RateLimiter({'/otn/leftTicket/query': (20, 1)}, {}, MemoryBucketBackend(), 'fail')
+        limiter.acquire(URL)
+        for i in range(3):
+            try:
+                limiter.acquire(URL)
+                assert False, 'TrainRateLimitException expected'
+            except exceptions.TrainRateLimitException:
+                pass
+
+        # 失败时归还令牌，不推迟后续请求
+        time.sleep(0.06)
+        limiter.acquire(URL)
+        assert limiter.acquire(URL, policy='wait') > 0
+
+    def test_account(self):
+        limiter = RateLimiter({}, {'/otn/leftTicket/query': (0.01, 1)}, MemoryBucketBackend(), 'fail')
+        limiter.acquire(URL, cookies={'tk': 'a'})
+        limiter.acquire(URL, cookies={'tk': 'b'})
+        limiter.acquire(URL)
+        limiter.acquire(URL)
+        try:
+            limiter.acquire(URL, cookies={'tk': 'a'})
+            assert False, 'TrainRateLimitException expected'
+        except exceptions.TrainRateLimitException:
+            pass
+
+    def test_file_backend_processes(self):
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_acquire_many, args=(self.directory, 10, queue))
+                     for i in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert sum([queue.get() for i in range(3)]) == 5
+
+        backend = FileBucketBackend(self.directory)
+        limiter = RateLimiter({'/otn/leftTicket/query': (0.01, 5)}, {}, backend, 'fail')
+        try:
+            limiter.acquire(URL)
+            assert False, 'TrainRateLimitException expected'
+        except exceptions.TrainRateLimitException:
+            pass
+        backend.close()
+
+    def test_api(self):
+        limiter = RateLimiter({'/otn/leftTicket/query': (0.01, 2)}, {}, MemoryBucketBackend(), 'fail')
+        with MockTrainServer() as server:
+            api = TrainInfoQueryAPI(client=TrainClient(base_url=server.base_url), rate_limiter=limiter)
+            api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+            try:
+                api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+                assert False, 'TrainRateLimitException expected'
+            except exceptions.TrainRateLimitException:
+                pass
+            assert server.stats['/otn/leftTicket/query']['requests'] == 2
+            assert api.info_query_station_list()
@@ -0,0 +1,107 @@
+# encoding: utf8
+
+"""
+换乘方案测试
+"""
+
+import datetime
+
+from hack12306.base import TrainClient
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.route import RoutePlanner
+from hack12306.timetable import TimetableStore, TimetableCrawler
+from hack12306.mockserver import MockTrainServer
+
+STATION_CODES = {u'北京南': 'VNP', u'天津南': 'TIP', u'济南西': 'JGK', u'南京南': 'NKH', u'上海虹桥': 'AOH',
+                 u'徐州东': 'UUH'}
+
+
+def _save(store, train_code, stops):
+    store.save_train(
+        {'train_no': '%s0X' % train_code, 'train_code': train_code},
+        [{'station_no': '%02d' % (i + 1), 'station_name': name, 'arrive_time': arrive or '----',
+          'start_time': depart or arrive} for i, (name, arrive, depart) in enumerate(stops)],
+        STATION_CODES)
+
+
+def _codes(routes):
+    return [[leg['train_code'] for leg in route['legs']] for route in routes]
+
+
+class TestRoutePlanner(object):
+    """
+    测试换乘方案查询
+    """
+
+    def setup_method(self, method):
+        self.store = TimetableStore(':memory:')
+        _save(self.store, 'T1', [(u'北京南', None, '08:00'), (u'天津南', '09:00', '09:02'), (u'济南西', '10:00', None)])
+        _save(self.store, 'T2', [(u'济南西', '10:30', '10:30'), (u'南京南', '11:30', None)])
+        _save(self.store, 'T3', [(u'南京南', None, '12:00'), (u'上海虹桥', '13:00', None)])
+        _save(self.store, 'T4', [(u'北京南', None, '07:00'), (u'徐州东', '15:00', '15:10'),
+                                 (u'上海虹桥', '23:30', None)])
+        # 天津南换乘时间不足 20 分钟
+        _save(self.store, 'T5', [(u'天津南', None, '09:10'), (u'上海虹桥', '15:00', None)])
+        # 跨天换乘
+        _save(self.store, 'T6', [(u'北京南', None, '22:00'), (u'徐州东', '23:50', None)])
+        _save(self.store, 'T7', [(u'徐州东', None, '00:30'), (u'上海虹桥', '02:00', None)])
+
+    def teardown_method(self, method):
+        self.store.close()
+
+    def test_plan(self):
+        planner = RoutePlanner(self.store)
+        routes = planner.plan(u'北京南', u'上海虹桥')
+        assert _codes(routes) == [['T1', 'T2', 'T3'], ['T4'], ['T6', 'T7']]
+
+        route = routes[0]
+        assert route['transfers'] == 2
+        assert route['transfer_stations'] == [u'济南西', u'南京南']
+        assert route['transfer_waits'] == [30, 30]
+        assert route['start_time'] == '08:00' and route['arrive_time'] == '13:00' and route['duration'] == 300
+        assert route['legs'][0]['from_station_code'] == 'VNP' and route['legs'][0]['to_station_code'] == 'JGK'
+
+        overnight = routes[2]
+        assert overnight['arrive_day'] == 1
+        assert [leg['start_day'] for leg in overnight['legs']] == [0, 1]
+        assert overnight['transfer_waits'] == [40]
+
+        assert planner.plan('VNP', 'AOH') == routes
+        assert _codes(planner.plan(u'北京南', u'上海虹桥', max_transfers=1)) == [['T4'], ['T6', 'T7']]
+        assert _codes(planner.plan(u'北京南', u'上海虹桥', depart_after='07:30', depart_before='12:00')) == \
+            [['T1', 'T2', 'T3']]
+        assert planner.plan(u'上海虹桥', u'北京南') == []
+
+    def test_transfer_time(self):
+        planner = RoutePlanner(self.store, min_transfer=5)
+        assert _codes(planner.plan(u'北京南', u'上海虹桥', max_transfers=1)) == [['T1', 'T5'], ['T4'], ['T6', 'T7']]
+
+        planner = RoutePlanner(self.store, max_transfer_wait=30)
+        assert _codes(planner.plan(u'北京南', u'上海虹桥')) == [['T1', 'T2', 'T3'], ['T4']]
+
+        # 不允许等待时只有直达车次
+        planner = RoutePlanner(self.store, max_transfer_wait=0)
+        assert _codes(planner.plan(u'北京南', u'上海虹桥')) == [['T4']]
+
+
+def test_check_tickets():
+    date = datetime.date.today().strftime('%Y-%m-%d')
+    with MockTrainServer() as server:
+        client = TrainClient(base_url=server.base_url)
+        api = TrainInfoQueryAPI(client=client, cache=False, resource_cache=False, policy=False, edges=False)
+        store = TimetableStore(':memory:')
+        TimetableCrawler(store, api, rate_limiter=False).crawl(date)
+
+        planner = RoutePlanner(store, date)
+        routes = planner.plan(u'北京南', u'武汉', max_transfers=1)
+        assert _codes(routes) == [['G1', 'D3021'], ['G103', 'D3021'], ['G101', 'D3021']]
+        assert routes[0]['legs'][1]['train_date'] == date
+
+        routes = planner.check_tickets(routes, api)
+        # 相同的余票查询只请求一次
+        assert server.stats['/otn/leftTicket/query']['requests'] == 2
+        for route in routes:
+            for leg in route['legs']:
+                assert leg['left_ticket']['train_num'] == leg['train_no']
+            assert route['has_ticket'] == all([leg['has_ticket'] for leg in route['legs']])
+        store.close()
@@ -0,0 +1,57 @@
+# encoding: utf8
+
+"""
+定时任务调度器测试
+"""
+
+import time
+import threading
+
+from hack12306.scheduler import Scheduler
+
+
+class TestScheduler(object):
+    """
+    测试调度器
+    """
+
+    def test_reschedule(self):
+        calls = []
+
+        def task():
+            calls.append(time.time())
+            return 0.05 if len(calls) < 3 else None
+
+        with Scheduler(max_workers=2) as scheduler:
+            t = scheduler.schedule(task)
+            assert t.done.wait(2)
+        assert len(calls) == 3
+        assert calls[2] - calls[0] >= 0.1
+
+    def test_order_and_cancel(self):
+        calls = []
+        lock = threading.Lock()
+
+        def make(name):
+            def task():
+                with lock:
+                    calls.append(name)
+            return task
+
+        with Scheduler(max_workers=1) as scheduler:
+            scheduler.schedule(make('c'), delay=0.15)
+            cancelled = scheduler.schedule(make('x'), delay=0.1)
+            scheduler.schedule(make('a'), delay=0.05)
+            cancelled.cancel()
+            time.sleep(0.3)
+        assert calls == ['a', 'c']
+
+    def test_exception_stops_task(self):
+        def task():
+            raise ValueError('boom')
+
+        with Scheduler() as scheduler:
+            t = scheduler.schedule(task)
+            assert t.done.wait(2)
+        assert isinstance(t.exception, ValueError)
+        assert t.runs == 1
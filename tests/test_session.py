@@ -0,0 +1,144 @@
+# encoding: utf8
+
+"""
+多账号 Session 池测试
+"""
+
+import time
+import shutil
+import tempfile
+import threading
+
+from hack12306 import settings
+from hack12306 import exceptions
+from hack12306.auth import TrainAuthAPI, login_state_cache
+from hack12306.user import TrainUserAPI
+from hack12306.session import SessionPool
+from hack12306.mockserver import MockTrainServer
+
+
+def setup_module(module):
+    module.base_url = settings.BASE_URL
+    module.server = MockTrainServer().start()
+    settings.BASE_URL = module.server.base_url
+
+
+def teardown_module(module):
+    settings.BASE_URL = module.base_url
+    module.server.stop()
+
+
+class TestSessionPool(object):
+    """
+    测试 Session 池
+    """
+
+    def setup_method(self, method):
+        login_state_cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.pool = SessionPool(self.directory)
+
+    def teardown_method(self, method):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_persist(self):
+        cookies = server.login()
+        self.pool.add('alice', '; '.join(['%s=%s' % item for item in cookies.items()]))
+        with self.pool.checkout('alice') as session:
+            assert session.cookies == cookies
+            assert session.api(TrainUserAPI).user_info(cookies=session.cookies)
+
+        # 重启后从磁盘加载 Cookie
+        login_state_cache.clear()
+        pool = SessionPool(self.directory)
+        assert 'alice' in pool and pool.accounts() == ['alice']
+        with pool.checkout() as session:
+            assert session.account == 'alice'
+            assert session.api(TrainUserAPI).user_info(cookies=session.cookies)
+        pool.close()
+
+        self.pool.remove('alice')
+        assert 'alice' not in self.pool
+
+    def test_set_cookie(self):
+        with self.pool.checkout('bob') as session:
+            session.api(TrainAuthAPI).auth_init()
+            assert set(session.cookies.keys()) == set(['route', 'JSESSIONID', 'BIGipServerotn'])
+            session.update(tk='abc', route='')
+            assert set(session.cookies.keys()) == set(['tk', 'JSESSIONID', 'BIGipServerotn'])
+
+    def test_checkout_exclusive(self):
+        self.pool.add('alice', server.login())
+        checked_out = threading.Event()
+
+        def worker():
+            with self.pool.checkout('alice'):
+                checked_out.set()
+                time.sleep(0.1)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        checked_out.wait()
+        try:
+            self.pool.acquire('alice', timeout=0.01)
+            assert False, 'TrainAPIException expected'
+        except exceptions.TrainAPIException:
+            pass
+
+        start = time.time()
+        with self.pool.checkout('alice', timeout=1):
+            assert time.time() - start > 0.05
+        thread.join()
+
+    def test_remove_checked_out(self):
+        self.pool.add('alice', {'tk': 'a'})
+        session = self.pool.acquire('alice')
+        self.pool.remove('alice')
+        # 归还时不再保存，删除不被撤销
+        assert session.cookies == {'tk': 'a'}
+        self.pool.release(session)
+        assert 'alice' not in self.pool and self.pool.accounts() == []
+        assert SessionPool(self.directory).accounts() == []
+        with self.pool.checkout('alice') as session:
+            assert session.cookies == {}
+
+    def test_load_unlocked(self):
+        self.pool.add('alice', {'tk': 'a'})
+        self.pool.add('bob', {'tk': 'b'})
+        pool = SessionPool(self.directory)
+        load = pool._load
+        loading = threading.Event()
+
+        def slow_load(session):
+            loading.set()
+            time.sleep(0.2)
+            load(session)
+
+        pool._load = slow_load
+        thread = threading.Thread(target=pool.acquire, args=('alice',))
+        thread.start()
+        loading.wait()
+        # 读取 alice 的 Cookie 时 bob 的签出不被阻塞
+        pool._load = load
+        start = time.time()
+        with pool.checkout('bob') as session:
+            assert session.cookies == {'tk': 'b'}
+        assert time.time() - start < 0.1
+        thread.join()
+        assert pool._sessions['alice'].cookies == {'tk': 'a'}
+        pool.close()
+
+    def test_evict(self):
+        pool = SessionPool(self.directory, idle_timeout=0.05, max_sessions=2)
+        for account in ('a', 'b', 'c'):
+            pool.add(account, {'tk': account})
+        assert len(pool) == 2
+        assert pool.accounts() == ['a', 'b', 'c']
+
+        time.sleep(0.06)
+        assert pool.evict_idle() == 2
+        assert len(pool) == 0
+        with pool.checkout('a') as session:
+            assert session.cookies == {'tk': 'a'}
+        pool.close()
@@ -0,0 +1,80 @@
+# encoding: utf8
+
+"""
+车站索引测试
+"""
+
+import time
+import threading
+
+from hack12306.query import _parse_stations
+from hack12306.station import StationRegistry
+
+STATION_NAME_JS = (
+    "var station_names ='@bjb|北京北|VAP|beijingbei|bjb|0@bjd|北京东|BOP|beijingdong|bjd|1"
+    "@bji|北京|BJP|beijing|bj|2@bjn|北京南|VNP|beijingnan|bjn|3@shh|上海|SHH|shanghai|sh|4';"
+)
+
+
+class _Loader(object):
+
+    def __init__(self, delay=0):
+        self.versions = []
+        self.delay = delay
+        self.loaded = threading.Event()
+
+    def __call__(self, station_version):
+        time.sleep(self.delay)
+        self.versions.append(station_version)
+        stations = _parse_stations(STATION_NAME_JS)
+        if station_version == '2.0':
+            stations.append(dict(stations[-1], name=u'上海虹桥', code=u'AOH'))
+        self.loaded.set()
+        return stations
+
+
+class TestStationRegistry(object):
+    """
+    测试车站索引
+    """
+
+    def test_lookup(self):
+        loader = _Loader()
+        registry = StationRegistry(loader)
+
+        assert registry.get_by_name(u'北京南')['code'] == u'VNP'
+        assert registry.get_by_name('北京南')['code'] == u'VNP'
+        assert registry.get_by_code('SHH')['name'] == u'上海'
+        assert registry.get_by_short_name('bjd')['code'] == u'BOP'
+        assert registry.get_by_english_name('beijingbei')['code'] == u'VAP'
+        assert registry.get_by_name(u'天津') is None
+        assert loader.versions == [None]
+
+    def test_load_once_per_version(self):
+        loader = _Loader()
+        registry = StationRegistry(loader)
+        threads = [threading.Thread(target=registry.get_by_name, args=(u'北京', '1.0')) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert loader.versions == ['1.0']
+        assert registry.version == '1.0'
+
+    def test_background_refresh(self):
+        loader = _Loader()
+        registry = StationRegistry(loader)
+        registry.get_by_name(u'北京', '1.0')
+
+        loader.loaded.clear()
+        loader.delay = 0.1
+        assert registry.get_by_name(u'上海虹桥', '2.0') is None
+        assert loader.loaded.wait(2)
+        for _ in range(100):
+            if registry.version == '2.0':
+                break
+            time.sleep(0.01)
+
+        assert registry.get_by_name(u'上海虹桥', '2.0')['code'] == u'AOH'
+        assert loader.versions == ['1.0', '2.0']
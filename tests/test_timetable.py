@@ -0,0 +1,82 @@
+# encoding: utf8
+
+"""
+本地时刻表测试
+"""
+
+import datetime
+
+from hack12306.base import TrainClient
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.timetable import TimetableStore, TimetableCrawler, _parse_stops
+from hack12306.mockserver import MockTrainServer
+
+
+def _date(days=0):
+    return (datetime.date.today() + datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def test_parse_stops():
+    stops = _parse_stops([
+        {'station_no': '01', 'station_name': u'北京西', 'arrive_time': '----', 'start_time': '23:50'},
+        {'station_no': '02', 'station_name': u'天津', 'arrive_time': '23:58', 'start_time': '00:05'},
+        {'station_no': '03', 'station_name': u'上海', 'arrive_time': '11:20', 'start_time': '11:20'},
+    ])
+    assert [(s['arrive_time'], s['start_time']) for s in stops] == [
+        (None, '23:50'), ('23:58', '00:05'), ('11:20', None)]
+    assert [(s['arrive_day_offset'], s['start_day_offset']) for s in stops] == [(None, 0), (0, 1), (1, None)]
+
+
+class TestTimetable(object):
+    """
+    测试时刻表爬取及查询
+    """
+
+    def setup_method(self, method):
+        self.server = MockTrainServer().start()
+        client = TrainClient(base_url=self.server.base_url)
+        self.api = TrainInfoQueryAPI(client=client, cache=False, resource_cache=False, policy=False, edges=False)
+        self.store = TimetableStore(':memory:')
+        self.crawler = TimetableCrawler(self.store, self.api, rate_limiter=False)
+
+    def teardown_method(self, method):
+        self.store.close()
+        self.server.stop()
+
+    def test_crawl(self):
+        stats = self.crawler.crawl(_date())
+        assert stats == {'trains': 8, 'fetched': 8, 'reused': 0, 'errors': 0}
+        assert self.server.stats['/otn/czxx/queryByTrainNo']['requests'] == 8
+
+        # 第二天的车次 train_no 相同，直接复用停靠站
+        stats = self.crawler.crawl(_date(1))
+        assert stats == {'trains': 8, 'fetched': 0, 'reused': 8, 'errors': 0}
+        assert self.server.stats['/otn/czxx/queryByTrainNo']['requests'] == 8
+        assert [d['train_date'] for d in self.store.dates()] == [_date(), _date(1)]
+
+        trains = self.store.trains_between(u'北京南', u'上海虹桥', _date())
+        assert [t['train_code'] for t in trains] == ['G101', 'G103', 'G1']
+        assert trains[0]['start_time'] == '06:36' and trains[0]['arrive_time'] == '11:29'
+        assert self.store.trains_between('VNP', 'AOH') == trains
+        assert [t['train_code'] for t in self.store.trains_between('AOH', 'VNP')] == ['G7']
+        assert self.store.trains_between('VNP', 'AOH', _date(2)) == []
+
+        assert [t['train_code'] for t in self.store.station_trains(u'天津')] == ['D1', 'K571']
+        k571 = self.store.stops('240000K5710B')
+        assert k571[-1]['station_code'] == 'SHH' and k571[-1]['arrive_day_offset'] == 1
+
+        assert self.store.prune(_date(1)) == 0
+        assert [d['train_date'] for d in self.store.dates()] == [_date(1)]
+
+    def test_crawl_errors(self):
+        self.server.error_rate = {'/otn/czxx/queryByTrainNo': 1.0}
+        stats = self.crawler.crawl(_date(), train_class='G')
+        assert stats == {'trains': 5, 'fetched': 0, 'reused': 0, 'errors': 5}
+        assert self.store.trains_between('VNP', 'AOH', _date()) == []
+
+        # 失败的车次下次爬取时重新查询
+        self.server.error_rate = {}
+        stats = self.crawler.crawl(_date(), train_class='G')
+        assert stats == {'trains': 5, 'fetched': 5, 'reused': 0, 'errors': 0}
+        assert len(self.store.trains_between('VNP', 'AOH', _date())) == 3
+        assert self.store.prune(_date(1)) == 5
@@ -0,0 +1,119 @@
+# encoding: utf8
+
+"""
+HTTP 传输层测试
+"""
+
+import urlparse
+
+import pytest
+from tornado.ioloop import IOLoop
+
+from hack12306 import settings
+from hack12306 import exceptions
+from hack12306.aio import AsyncTrainClient, AsyncTrainInfoQueryAPI
+from hack12306.base import TrainClient, TrainBaseAPI
+from hack12306.query import TrainInfoQueryAPI
+from hack12306.transport import hyper, FakeTransport, HTTP2Transport, RequestsTransport, TransportResponse
+from hack12306.mockserver import MockTrainServer
+
+COOKIES = {'JSESSIONID': 'A85E3C4D', 'tk': 'hASyOiZR'}
+
+
+def _left_tickets(request):
+    query = dict(urlparse.parse_qsl(urlparse.urlsplit(request.url).query))
+    row = [''] * 36
+    row[0], row[1], row[2], row[3] = 'secret', u'预订', '240000G1010C', 'G101'
+    row[4], row[5] = query['leftTicketDTO.from_station'], query['leftTicketDTO.to_station']
+    return {'status': True, 'data': {'result': [u'|'.join(row)], 'map': {}}}
+
+
+class TestFakeTransport(object):
+    """
+    测试内存中的传输层
+    """
+
+    def test_submit(self):
+        transport = FakeTransport()
+        transport.add('/otn/login/conf', {'status': True, 'data': {'is_login': 'Y'}}, method='POST')
+        api = TrainBaseAPI(client=TrainClient(transport=transport), cache=False, rate_limiter=False)
+        resp = api.submit('https://kyfw.12306.cn/otn/login/conf', {'a': u'北京'}, cookies=COOKIES)
+        assert resp['data']['is_login'] == 'Y'
+
+        request = transport.requests[0]
+        assert request.method == 'POST'
+        assert request.url == 'https://kyfw.12306.cn/otn/login/conf'
+        assert request.body == 'a=%E5%8C%97%E4%BA%AC'
+        assert 'tk=hASyOiZR' in request.headers['Cookie']
+
+        # 未配置的路径返回 404
+        with pytest.raises(exceptions.TrainRequestException):
+            api.submit('https://kyfw.12306.cn/otn/unknown', method='GET')
+        assert transport.pool_stats()['requests'] == 2
+
+    def test_callable(self):
+        transport = FakeTransport()
+        transport.add('/otn/leftTicket/query', _left_tickets)
+        transport.add('/otn/error', lambda request: TransportResponse(502, 'Bad Gateway'))
+        api = TrainInfoQueryAPI(client=TrainClient(transport=transport), cache=False, policy=False, edges=False)
+        trains = api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')
+        assert trains[0]['train_name'] == 'G101'
+        assert trains[0]['from_station'] == 'VNP'
+
+        with pytest.raises(exceptions.TrainRequestException):
+            api.submit('https://kyfw.12306.cn/otn/error', method='GET')
+
+    def test_async(self):
+        transport = FakeTransport()
+        transport.add('/otn/leftTicket/query', _left_tickets)
+        api = AsyncTrainInfoQueryAPI(client=AsyncTrainClient(transport=transport), cache=False)
+        trains = IOLoop.current().run_sync(lambda: api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH'))
+        assert trains[0]['train_name'] == 'G101'
+        assert len(transport.requests) == 1
+
+
+class TestRequestsTransport(object):
+    """
+    测试 requests 传输层
+    """
+
+    def test_resolver(self):
+        resolved = []
+
+        def resolver(host, port):
+            resolved.append(host)
+            return '127.0.0.1', port
+
+        with MockTrainServer() as server:
+            base_url = 'http://train.test:%s' % server.httpd.server_address[1]
+            client = TrainClient(base_url=base_url, transport=RequestsTransport(resolver=resolver))
+            api = TrainInfoQueryAPI(client=client, cache=False, policy=False, edges=False)
+            assert api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH')[0]['train_name'] == 'G1'
+            assert resolved == ['train.test']
+            assert client.pool_stats()['hosts'].keys() == ['http://train.test:%s' % server.httpd.server_address[1]]
+            client.close()
+
+    def test_async_blocking(self):
+        with MockTrainServer() as server:
+            client = AsyncTrainClient(base_url=server.base_url, transport=RequestsTransport())
+            api = AsyncTrainInfoQueryAPI(client=client, cache=False)
+            trains = IOLoop.current().run_sync(lambda: api.info_query_left_tickets('2019-02-01', 'VNP', 'AOH'))
+            assert trains[0]['train_name'] == 'G1'
+            assert client.transport.pool_stats()['requests'] == 1
+            client.close()
+
+    def test_default_transport(self):
+        old = settings.HTTP_TRANSPORT
+        settings.HTTP_TRANSPORT = 'http2'
+        try:
+            # 保存 Cookie 的客户端使用 requests
+            assert isinstance(TrainClient(persist_cookies=True).transport, RequestsTransport)
+        finally:
+            settings.HTTP_TRANSPORT = old
+        assert isinstance(TrainClient().transport, RequestsTransport)
+
+
+@pytest.mark.skipif(hyper is not None, reason='hyper installed')
+def test_http2_requires_hyper():
+    with pytest.raises(ImportError):
+        HTTP2Transport()